@@ -0,0 +1,204 @@
+"""Headless JSON API around recommend_courses_from_vector.
+
+Run with ``uvicorn api:app`` (or ``python api.py``). Set ``USE_FAKE_LLM=true`` to answer with
+fakes.FakeChatModel instead of Gemini, e.g. for load tests.
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from configs.google_generative_ai import GoogleGenerativeAIService
+from configs.resources import resource_registry
+from embedding_backends import embed_queries
+from index_store import filter_key, search_index
+from models import UserInput
+from prompt_assembly import token_meter
+from recommend import (RETRIEVAL_FETCH_K, arecommend_courses_from_vector, env_config, get_response_cache,
+                       query_texts, searched_vectors)
+from recommendation_stream import parse_recommendations
+from telemetry import metrics as telemetry_metrics, span
+
+
+class EmbeddingBatcher:
+    """Groups queries that arrive within ``max_wait_ms`` into one embedding call and one FAISS search per filter."""
+
+    def __init__(self, llm_service, executor, max_batch_size=32, max_wait_ms=5):
+        self.llm_service = llm_service
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.queries = 0
+
+    async def submit(self, texts, search_filter=None):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((texts, search_filter, future))
+        return await future
+
+    def _process(self, batch):
+        vectordb = self.llm_service.get_vector_db('faiss_index')
+        all_texts = [text for texts, _, _ in batch for text in texts]
+        telemetry_metrics.observe('embedding_batch_size', len(batch), buckets=(1, 2, 4, 8, 16, 32, 64))
+        with span('embed_batch'):
+            vectors = embed_queries(vectordb.embeddings, all_texts)
+
+        per_request, offset = [], 0
+        groups = {}
+        for number, (texts, search_filter, _) in enumerate(batch):
+            per_request.append(vectors[offset:offset + len(texts)])
+            offset += len(texts)
+            groups.setdefault(filter_key(search_filter), (search_filter, []))[1].append(number)
+        # The searched vectors (field phrases, or the whole CV) of every request with the same filter
+        # share one FAISS search; each request gets back the rows of its own vectors
+        searches = [None] * len(batch)
+        with span('search_batch'):
+            for search_filter, numbers in groups.values():
+                queries = [searched_vectors(per_request[number]) for number in numbers]
+                distances, positions = search_index(vectordb, np.concatenate(queries), RETRIEVAL_FETCH_K,
+                                                    search_filter)
+                offset = 0
+                for number, rows in zip(numbers, queries):
+                    searches[number] = (distances[offset:offset + len(rows)], positions[offset:offset + len(rows)])
+                    offset += len(rows)
+        return list(zip(per_request, searches))
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            self.batches += 1
+            self.queries += len(batch)
+            try:
+                results = await loop.run_in_executor(self.executor, self._process, batch)
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, _, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Model work is CPU-bound, so it gets a small bounded pool instead of the default executor
+    executor = ThreadPoolExecutor(max_workers=int(env_config.get_env_variable('API_WORKERS') or 4),
+                                  thread_name_prefix='recommend')
+    llm_instance = None
+    if (env_config.get_env_variable('USE_FAKE_LLM') or '').lower() == 'true':
+        from fakes import FakeChatModel
+        from llm_gateway import LLMGateway
+        # Behind the same gateway as Gemini, so load tests exercise coalescing and queueing. The fake has no
+        # quota, so it is only rate limited when LLM_REQUESTS_PER_MINUTE is set explicitly
+        fake_llm = FakeChatModel(latency=float(env_config.get_env_variable('FAKE_LLM_LATENCY') or 1.0))
+        fake_rpm = float(env_config.get_env_variable('LLM_REQUESTS_PER_MINUTE') or 0)
+        llm_instance = LLMGateway(fake_llm, name='fake', requests_per_minute=fake_rpm,
+                                  max_concurrency=int(env_config.get_env_variable('LLM_MAX_CONCURRENCY') or 64))
+    llm_service = GoogleGenerativeAIService(env_config, llm_instance=llm_instance)
+    batcher = EmbeddingBatcher(llm_service, executor,
+                               max_batch_size=int(env_config.get_env_variable('EMBEDDING_BATCH_SIZE') or 32),
+                               max_wait_ms=float(env_config.get_env_variable('BATCH_WAIT_MS') or 5))
+    # Load the model and index before the first request instead of during it
+    await asyncio.get_running_loop().run_in_executor(executor, llm_service.get_vector_db, 'faiss_index')
+    batcher_task = asyncio.create_task(batcher.run())
+
+    app.state.executor = executor
+    app.state.llm_service = llm_service
+    app.state.batcher = batcher
+    yield
+    batcher_task.cancel()
+    executor.shutdown(wait=False)
+
+
+app = FastAPI(title="University and Course Recommendation", lifespan=lifespan)
+
+
+@app.post("/recommend")
+async def recommend(user_input: UserInput):
+    start = time.perf_counter()
+    vectors, search_results = await app.state.batcher.submit(query_texts(user_input.cv), user_input.filter)
+    resp = await arecommend_courses_from_vector(user_input.cv, app.state.llm_service, app.state.executor,
+                                                vectors, search_results, user_input.filter)
+    return {
+        "recommendations": [recommendation.model_dump(mode='json')
+                            for recommendation in parse_recommendations(resp["result"])],
+        "retrieved": resp.get("retrieved", []),
+        "cache": resp.get("cache"),
+        "fast_path": resp.get("fast_path", False),
+        "tokens": resp.get("tokens"),
+        "elapsed_seconds": time.perf_counter() - start,
+    }
+
+
+def _index_store():
+    store = getattr(app.state.llm_service.get_vector_db('faiss_index'), 'store', None)
+    if store is None:
+        raise HTTPException(status_code=503, detail="The index is in the legacy format; run "
+                                                    "`python -m index_store migrate` to enable school lookups")
+    return store
+
+
+# Plain def handlers: get_vector_db may reload the index from disk, so FastAPI runs them in its threadpool
+@app.get("/schools")
+def schools():
+    store = _index_store()
+    return {"schools": store.schools(), "levels": store.levels()}
+
+
+# Every course at one university, straight from the precomputed school -> rows lookup
+@app.get("/schools/{school}/courses")
+def school_courses(school: str):
+    store = _index_store()
+    rows = store.school_rows(school)
+    if not len(rows):
+        raise HTTPException(status_code=404, detail=f"Unknown school {school!r}")
+    return {"school": school, "courses": [{"name": metadata['course'], "level": metadata['level']}
+                                          for metadata in map(store.metadata, rows)]}
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/metrics")
+async def metrics():
+    batcher = app.state.batcher
+    return {
+        "embedding_batches": batcher.batches,
+        "embedding_queries": batcher.queries,
+        "avg_batch_size": batcher.queries / batcher.batches if batcher.batches else 0.0,
+        "response_cache": get_response_cache().get_metrics(),
+        "tokens": token_meter.get_metrics(),
+        "resource_load_timings": resource_registry.get_load_timings(),
+        "llm_gateway": getattr(app.state.llm_service.get_llm_instance(), 'get_metrics', dict)(),
+        "telemetry": telemetry_metrics.to_dict(),
+    }
+
+
+@app.get("/metrics/prometheus", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return telemetry_metrics.to_prometheus()
+
+
+if __name__ == '__main__':
+    uvicorn.run(app, host=os.environ.get('API_HOST', '127.0.0.1'), port=int(os.environ.get('API_PORT', 8000)))
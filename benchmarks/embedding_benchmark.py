@@ -0,0 +1,99 @@
+"""Throughput and retrieval agreement of the embedding backends in embedding_backends.
+
+Run from the repository root, e.g.::
+
+    python -m benchmarks.embedding_benchmark --backends instructor-large,minilm,minilm-onnx-int8
+
+Documents come from the catalog snapshot when one exists, otherwise from synthetic course names.
+Agreement is the overlap of each backend's top-k courses with the reference backend's, per query.
+Each result is printed as one JSON line.
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from catalog_snapshot import DEFAULT_SNAPSHOT_PATH, load_catalog
+from embedding_backends import DEFAULT_EMBEDDING_BACKEND, EMBEDDING_BACKENDS, create_embeddings
+
+FIELDS = ["Engenharia Elétrica", "Ciência da Computação", "Química", "Agronomia", "Economia", "Física",
+          "Biotecnologia", "Direito", "Saúde Pública", "Matemática Aplicada", "Ciências Ambientais", "Educação"]
+QUERIES = ["Chemistry", "machine learning and data science", "electrical engineering", "public health",
+           "I have experience in cyber security, AI, and cloud computing.", "agriculture and soil science",
+           "Studied finance, business administration, and international trade.", "environmental science"]
+
+
+def load_texts(snapshot_path, limit):
+    if os.path.exists(snapshot_path):
+        texts = [f"{school} {course['name']} {course['level']}"
+                 for school, courses in load_catalog(snapshot_path).items() for course in courses]
+    else:
+        texts = [f"Universidade {i % 97} {level} em {FIELDS[i % len(FIELDS)]} {level_en}"
+                 for i, (level, level_en) in enumerate([("Mestrado", "Master's"), ("Doutorado", "PhD")] * 500)]
+    return texts[:limit]
+
+
+def top_k(document_vectors, query_vectors, k):
+    documents = np.asarray(document_vectors, dtype=np.float32)
+    queries = np.asarray(query_vectors, dtype=np.float32)
+    distances = ((queries[:, None, :] - documents[None, :, :]) ** 2).sum(axis=-1)
+    return np.argsort(distances, axis=1)[:, :k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', default=",".join(EMBEDDING_BACKENDS))
+    parser.add_argument('--reference', default=DEFAULT_EMBEDDING_BACKEND)
+    parser.add_argument('--batch-sizes', default="8,32,64")
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--limit', type=int, default=1000, help="Maximum number of documents to embed")
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--snapshot', default=DEFAULT_SNAPSHOT_PATH)
+    args = parser.parse_args()
+
+    texts = load_texts(args.snapshot, args.limit)
+    backends = args.backends.split(',')
+    if args.reference in backends:
+        # Compute the reference ranking first so every other backend can be compared to it
+        backends.remove(args.reference)
+        backends.insert(0, args.reference)
+
+    reference_ranking = None
+    for backend in backends:
+        for batch_size in (int(size) for size in args.batch_sizes.split(',')):
+            start = time.perf_counter()
+            embeddings = create_embeddings(backend, batch_size=batch_size, num_threads=args.threads)
+            load_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            document_vectors = embeddings.embed_documents(texts)
+            document_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            query_vectors = [embeddings.embed_query(query) for query in QUERIES]
+            query_seconds = (time.perf_counter() - start) / len(QUERIES)
+
+            ranking = top_k(document_vectors, query_vectors, args.k)
+            if backend == args.reference and reference_ranking is None:
+                reference_ranking = ranking
+            agreement = (float(np.mean([len(set(ranking[i]) & set(reference_ranking[i])) / args.k
+                                        for i in range(len(QUERIES))]))
+                         if reference_ranking is not None else None)
+
+            print(json.dumps({
+                'backend': backend,
+                'batch_size': batch_size,
+                'documents': len(texts),
+                'dim': len(document_vectors[0]) if document_vectors else 0,
+                'load_seconds': load_seconds,
+                'documents_per_second': len(texts) / document_seconds if document_seconds else None,
+                'query_ms': query_seconds * 1000,
+                f'agreement@{args.k}': agreement,
+                'reference': args.reference,
+            }), flush=True)
+
+
+if __name__ == '__main__':
+    main()
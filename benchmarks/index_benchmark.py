@@ -0,0 +1,95 @@
+"""Recall/latency/memory tradeoff of the FAISS index types in vector_index.
+
+Run from the repository root, e.g.::
+
+    python -m benchmarks.index_benchmark --sizes 10000,100000 --types flat,hnsw,ivfpq,sq8,fp16
+
+Each result is printed as one JSON line.
+"""
+import argparse
+import json
+import os
+import time
+
+import faiss
+import numpy as np
+import psutil
+
+from vector_index import build_index
+
+
+def synthetic_catalog(count, dim, clusters=256, seed=0):
+    # Course embeddings cluster by field, so sample around random centroids and normalize like the model does
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((clusters, dim), dtype=np.float32)
+    vectors = centroids[rng.integers(0, clusters, count)] + 0.5 * rng.standard_normal((count, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def synthetic_queries(vectors, count, seed=1):
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.integers(0, len(vectors), count)] + 0.1 * rng.standard_normal(
+        (count, vectors.shape[1]), dtype=np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def rss_bytes():
+    return psutil.Process(os.getpid()).memory_info().rss
+
+
+def benchmark_index(index_type, vectors, queries, ground_truth, k):
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    index, built_type = build_index(vectors, index_type)
+    index.add(vectors)
+    build_seconds = time.perf_counter() - start
+    rss_after = rss_bytes()
+
+    latencies = []
+    found = np.empty((len(queries), k), dtype=np.int64)
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - start)
+        found[i] = ids[0]
+
+    recall = np.mean([len(set(found[i]) & set(ground_truth[i])) / k for i in range(len(queries))])
+    return {
+        'index_type': built_type,
+        'count': len(vectors),
+        'dim': vectors.shape[1],
+        'k': k,
+        f'recall@{k}': float(recall),
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p99_ms': float(np.percentile(latencies, 99) * 1000),
+        'build_seconds': build_seconds,
+        'index_bytes': int(faiss.serialize_index(index).nbytes),
+        'rss_delta_bytes': rss_after - rss_before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default="10000,100000", help="Comma-separated catalog sizes, up to 1000000")
+    parser.add_argument('--types', default="flat,hnsw,ivfpq,sq8,fp16", help="Comma-separated index types")
+    parser.add_argument('--dim', type=int, default=768, help="Embedding dimension (instructor-large is 768)")
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args()
+
+    for size in (int(size) for size in args.sizes.split(',')):
+        vectors = synthetic_catalog(size, args.dim)
+        queries = synthetic_queries(vectors, args.queries)
+        # Exact neighbours from a flat index are the recall baseline
+        baseline = faiss.IndexFlatL2(args.dim)
+        baseline.add(vectors)
+        _, ground_truth = baseline.search(queries, args.k)
+        del baseline
+
+        for index_type in args.types.split(','):
+            print(json.dumps(benchmark_index(index_type, vectors, queries, ground_truth, args.k)), flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Calls to a local fake chat server, straight from the client and through llm_gateway.LLMGateway.
+
+The server (fakes.FakeChatServer) adds latency with a slow tail and answers HTTP 429 beyond its
+requests-per-minute quota. Run from the repository root, e.g.::
+
+    python -m benchmarks.llm_gateway_benchmark --requests 200 --distinct 50 --concurrency 32
+    python -m benchmarks.llm_gateway_benchmark --slow-rate 0.1 --hedge-percentile 90
+
+Each mode prints one JSON line: caller latency percentiles, errors by type, requests that reached
+the server and, for the gateway, mean queueing delay and model latency reported separately.
+"""
+import argparse
+import json
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from fakes import FakeChatClient, FakeChatServer
+from llm_gateway import LLMGateway
+from telemetry import metrics
+
+
+def run(llm, prompts, concurrency):
+    latencies, errors = [], Counter()
+
+    def call(prompt):
+        start = time.perf_counter()
+        try:
+            llm.invoke(prompt)
+        except Exception as e:
+            errors[type(e).__name__] += 1
+            return
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(call, prompts))
+    elapsed = time.perf_counter() - start
+    result = {'seconds': elapsed, 'answered': len(latencies), 'errors': dict(errors)}
+    if latencies:
+        result.update({f'p{p}_ms': float(np.percentile(latencies, p) * 1000) for p in (50, 95, 99)})
+    return result
+
+
+def histogram_mean(name, model):
+    return next((histogram['mean'] for histogram in metrics.to_dict()['histograms']
+                 if histogram['name'] == name and histogram['labels'].get('model') == model), None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--distinct', type=int, default=50, help="Distinct prompts; the rest are repeats")
+    parser.add_argument('--concurrency', type=int, default=32, help="Concurrent callers")
+    parser.add_argument('--latency', type=float, default=0.5, help="Primary model latency in seconds")
+    parser.add_argument('--fast-latency', type=float, default=0.1, help="Hedge model latency in seconds")
+    parser.add_argument('--slow-rate', type=float, default=0.05, help="Share of calls that get --slow-latency extra")
+    parser.add_argument('--slow-latency', type=float, default=3.0)
+    parser.add_argument('--server-rpm', type=int, default=300, help="Server quota before it answers 429")
+    parser.add_argument('--gateway-rpm', type=float, default=240, help="Gateway request limit")
+    parser.add_argument('--max-concurrency', type=int, default=8, help="Gateway slots for distinct prompts")
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--hedge-percentile', type=float, default=95, help="0 disables hedging")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    prompts = [f"Recommend courses for applicant {i}." for i in rng.integers(0, args.distinct, args.requests)]
+
+    for mode in ('direct', 'gateway'):
+        # A fresh server per mode, so the first mode's calls do not eat the second one's quota
+        server = FakeChatServer(latency=args.latency, model_latency={'fake-flash': args.fast_latency},
+                                slow_rate=args.slow_rate, slow_latency=args.slow_latency,
+                                requests_per_minute=args.server_rpm).start()
+        primary = FakeChatClient(server.url, 'fake-pro')
+        llm, gateway = primary, None
+        if mode == 'gateway':
+            hedge = FakeChatClient(server.url, 'fake-flash') if args.hedge_percentile else None
+            llm = gateway = LLMGateway(primary, hedge, name='benchmark', requests_per_minute=args.gateway_rpm,
+                                       max_concurrency=args.max_concurrency, timeout=args.timeout,
+                                       hedge_percentile=args.hedge_percentile, backoff=0.5)
+        try:
+            result = {'mode': mode, 'requests': args.requests, 'distinct': args.distinct,
+                      **run(llm, prompts, args.concurrency),
+                      'server_requests': server.requests, 'server_429s': server.rate_limited,
+                      'server_peak_concurrency': server.peak_active}
+            if gateway is not None:
+                result.update({
+                    'queue_mean_ms': (histogram_mean('llm_queue_seconds', 'benchmark') or 0) * 1000,
+                    'model_mean_ms': (histogram_mean('llm_model_seconds', 'benchmark') or 0) * 1000,
+                    'gateway': gateway.get_metrics(),
+                })
+                gateway.close()
+        finally:
+            server.stop()
+        print(json.dumps(result), flush=True)
+
+
+if __name__ == '__main__':
+    main()
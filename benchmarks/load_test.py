@@ -0,0 +1,82 @@
+"""Concurrent load test for the recommendation API in api.py.
+
+Start the API with the fake LLM, then fire requests at it, e.g.::
+
+    USE_FAKE_LLM=true FAKE_LLM_LATENCY=1.0 uvicorn api:app
+    python -m benchmarks.load_test --requests 500 --concurrency 50
+
+Prints one JSON line with throughput, latency percentiles, errors and the server's batching metrics.
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import aiohttp
+import numpy as np
+
+QUERIES = [
+    "I have experience in cyber security, AI, and cloud computing.",
+    "With a background in data science, machine learning, and bioinformatics.",
+    "I have studied environmental science, renewable energy, and sustainable agriculture.",
+    "Experience in mechanical engineering, automotive design, and robotics.",
+    "Studied finance, business administration, and international trade.",
+    "Chemistry",
+    "public health",
+]
+
+
+async def run(url, total, concurrency, unique):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(session, i):
+        nonlocal errors
+        cv = QUERIES[i % len(QUERIES)]
+        if unique:
+            # Defeat the response cache so every request does the full embed/search/LLM work
+            cv = f"{cv} ({uuid.uuid4().hex[:8]})"
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                async with session.post(f"{url}/recommend", json={"cv": cv}) as response:
+                    await response.read()
+                    if response.status != 200:
+                        errors += 1
+            except aiohttp.ClientError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=300)) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*[one(session, i) for i in range(total)])
+        elapsed = time.perf_counter() - start
+        async with session.get(f"{url}/metrics") as response:
+            server_metrics = await response.json()
+
+    return {
+        'requests': total,
+        'concurrency': concurrency,
+        'errors': errors,
+        'elapsed_seconds': elapsed,
+        'requests_per_second': total / elapsed,
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p95_ms': float(np.percentile(latencies, 95) * 1000),
+        'p99_ms': float(np.percentile(latencies, 99) * 1000),
+        'server': server_metrics,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default="http://127.0.0.1:8000")
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--cached', action='store_true', help="Repeat identical queries so the cache can answer")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.url.rstrip('/'), args.requests, args.concurrency, not args.cached))))
+
+
+if __name__ == '__main__':
+    main()
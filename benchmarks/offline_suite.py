@@ -0,0 +1,284 @@
+"""Offline benchmarks of the recommendation and ingestion hot paths on synthetic catalogs.
+
+No model download, Gemini, Firebase or GCUB access is needed: embeddings come from
+hash_embeddings.HashEmbeddings (the ``hash`` embedding backend), prompt tokens are counted with
+prompt_assembly.ApproxTokenizer instead of tiktoken's downloaded BPE, the LLMs are fakes.FakeChatModel and
+fakes.FakeTranslationLLM and Firestore is fakes.FakeFirestore. Run from the repository root, e.g.::
+
+    python -m benchmarks.offline_suite --sizes 1000,10000,100000 --output before.jsonl
+    python -m benchmarks.offline_suite --sizes 1000,10000,100000 --baseline before.jsonl
+
+Each result is printed as one JSON line tagged with the current commit. With ``--baseline`` every
+result is compared to the matching one from an earlier run and the exit status is 1 when any of
+them got slower by more than ``--tolerance``.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Portuguese field names, as the GCUB form lists them before translation
+FIELDS = ["Engenharia Elétrica", "Ciência da Computação", "Química", "Agronomia", "Economia", "Física",
+          "Biotecnologia", "Direito", "Saúde Pública", "Matemática Aplicada", "Ciências Ambientais", "Educação",
+          "Engenharia Mecânica", "Administração", "Letras", "Medicina Veterinária", "Geografia", "Farmácia"]
+FIELDS_EN = ["Electrical Engineering", "Computer Science", "Chemistry", "Agronomy", "Economics", "Physics",
+             "Biotechnology", "Law", "Public Health", "Applied Mathematics", "Environmental Sciences", "Education",
+             "Mechanical Engineering", "Business Administration", "Linguistics", "Veterinary Medicine", "Geography",
+             "Pharmacy"]
+COURSES_PER_SCHOOL = 20
+
+
+def synthetic_catalog(count, seed=0):
+    """Return ``(raw, catalog)`` with about ``count`` courses.
+
+    ``raw`` is scraper output (Portuguese course strings per school) and ``catalog`` is the
+    translated ``{school: [{'name', 'level'}]}`` shape that recommend.generate_documents takes.
+    """
+    rng = np.random.default_rng(seed)
+    raw, catalog = [], {}
+    for school_index in range(max(1, count // COURSES_PER_SCHOOL)):
+        school = f"Universidade Federal {school_index}"
+        courses, translated = [], []
+        for field_index in rng.choice(len(FIELDS), COURSES_PER_SCHOOL):
+            phd = bool(rng.integers(2))
+            courses.append(f"{'Doutorado' if phd else 'Mestrado'} em {FIELDS[field_index]}")
+            translated.append({'name': FIELDS_EN[field_index], 'level': 'PhD' if phd else "Master's"})
+        raw.append({'school': school, 'courses': courses})
+        catalog[school] = translated
+    return raw, catalog
+
+
+def synthetic_queries(count, seed=1):
+    # Unique CV-style queries, so the response cache never answers them
+    rng = np.random.default_rng(seed)
+    return [f"I have experience in {FIELDS_EN[a]} and {FIELDS_EN[b]}, applicant {i}."
+            for i, (a, b) in enumerate(rng.integers(0, len(FIELDS_EN), (count, 2)))]
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@contextlib.contextmanager
+def quiet():
+    # The code under test prints progress; keep stdout for the JSON results
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    with quiet():
+        result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def latency_stats(latencies):
+    return {
+        'calls': len(latencies),
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p95_ms': float(np.percentile(latencies, 95) * 1000),
+        'p99_ms': float(np.percentile(latencies, 99) * 1000),
+    }
+
+
+def benchmark_recommend(size, catalog, args):
+    import recommend
+    from configs.google_generative_ai import GoogleGenerativeAIService
+    from embedding_backends import embed_queries
+    from langchain_core.documents import Document
+
+    from fakes import FakeChatModel
+    from models import SearchFilter
+    from prompt_assembly import assemble_prompt
+    from recommendation_stream import RecommendationStreamParser, parse_recommendations
+
+    results = []
+    generate_documents = getattr(recommend.generate_documents, '__wrapped__', recommend.generate_documents)
+    (documents, texts), seconds = timed(generate_documents, catalog)
+    results.append({'benchmark': 'generate_documents', 'seconds': seconds})
+
+    _, seconds = timed(recommend.create_vector_db, documents, texts, incremental=False,
+                       index_type=args.index_type)
+    results.append({'benchmark': 'create_vector_db', 'index_type': args.index_type, 'seconds': seconds})
+    _, seconds = timed(recommend.create_vector_db, documents, texts, index_type=args.index_type)
+    results.append({'benchmark': 'create_vector_db_unchanged', 'index_type': args.index_type, 'seconds': seconds})
+
+    llm = FakeChatModel(latency=args.llm_latency)
+    llm_service = GoogleGenerativeAIService(recommend.env_config, llm_instance=llm)
+    vectordb = llm_service.get_vector_db('faiss_index')
+    queries = synthetic_queries(args.queries, seed=size)
+
+    latencies, retrieved = [], []
+    for query in queries:
+        resp, seconds = timed(recommend.recommend_courses_from_vector, query, llm_service)
+        latencies.append(seconds)
+        retrieved.append(len(resp['retrieved']))
+    # An empty context would only time the prompt template and the fake LLM
+    if not sum(retrieved):
+        raise SystemExit("recommend_single retrieved no documents; check RETRIEVAL_SCORE_THRESHOLD")
+    results.append({'benchmark': 'recommend_single', 'llm_latency': args.llm_latency,
+                    'avg_retrieved': sum(retrieved) / len(retrieved), **latency_stats(latencies)})
+
+    # What api.EmbeddingBatcher does per batch: one embedding pass and one FAISS search
+    latencies = []
+    for start in range(0, len(queries), args.batch_size):
+        batch = queries[start:start + args.batch_size]
+        begin = time.perf_counter()
+        recommend.search_batch(vectordb, embed_queries(vectordb.embeddings, batch))
+        latencies.append((time.perf_counter() - begin) / len(batch))
+    results.append({'benchmark': 'search_batched_per_query', 'batch_size': args.batch_size,
+                    **latency_stats(latencies)})
+
+    # Filtered searches only scan the selected (level, school) partitions
+    schools = sorted(catalog)
+    for name, search_filter in (('level', SearchFilter(levels=['PhD'])),
+                                ('schools', SearchFilter(schools=schools[:max(1, len(schools) // 100)]))):
+        latencies = []
+        for start in range(0, len(queries), args.batch_size):
+            batch = queries[start:start + args.batch_size]
+            begin = time.perf_counter()
+            recommend.search_batch(vectordb, embed_queries(vectordb.embeddings, batch), search_filter=search_filter)
+            latencies.append((time.perf_counter() - begin) / len(batch))
+        results.append({'benchmark': f'search_batched_filtered_{name}', 'batch_size': args.batch_size,
+                        **latency_stats(latencies)})
+
+    # Known courses rather than a retrieval, so every size packs the same 30 hits
+    hits = [(Document(page_content=document['prompt'], metadata=document['metadata']), score)
+            for document, score in zip(documents[:30], np.linspace(0.9, 0.5, 30))]
+    latencies, prompt_text = [], None
+    for query in queries:
+        begin = time.perf_counter()
+        prompt_text, _ = assemble_prompt(query, hits, token_budget=recommend.PROMPT_TOKEN_BUDGET)
+        latencies.append(time.perf_counter() - begin)
+    results.append({'benchmark': 'assemble_prompt', 'hits': len(hits), **latency_stats(latencies)})
+
+    answer = FakeChatModel()._answer(prompt_text)
+    latencies = []
+    for _ in queries:
+        begin = time.perf_counter()
+        parse_recommendations(answer)
+        latencies.append(time.perf_counter() - begin)
+    results.append({'benchmark': 'parse_recommendations', 'answer_chars': len(answer), **latency_stats(latencies)})
+
+    latencies = []
+    for _ in queries:
+        begin = time.perf_counter()
+        parser = RecommendationStreamParser()
+        for start in range(0, len(answer), llm.chunk_size):
+            list(parser.feed(answer[start:start + llm.chunk_size]))
+        latencies.append(time.perf_counter() - begin)
+    results.append({'benchmark': 'stream_parse', 'answer_chars': len(answer), **latency_stats(latencies)})
+    return results
+
+
+def benchmark_ingestion(raw, args):
+    import script
+    from fakes import FakeFirestore, FakeTranslationLLM
+
+    results = []
+    llm = FakeTranslationLLM(latency=args.llm_latency)
+    translated, seconds = timed(script.translate, raw, llm, requests_per_minute=10 ** 9, memory_path=None)
+    results.append({'benchmark': 'translate', 'llm_latency': args.llm_latency, 'llm_calls': llm.calls,
+                    'seconds': seconds})
+
+    db = FakeFirestore(latency=args.firestore_latency)
+    _, seconds = timed(script.save_to_firebase, translated, db)
+    results.append({'benchmark': 'save_to_firebase', 'writes': db.writes, 'commits': db.commits,
+                    'seconds': seconds})
+    writes = db.writes
+    _, seconds = timed(script.save_to_firebase, translated, db)
+    results.append({'benchmark': 'save_to_firebase_unchanged', 'writes': db.writes - writes, 'seconds': seconds})
+    return results
+
+
+# Metrics where a larger value is a regression
+TIMING_KEYS = ('seconds', 'p50_ms', 'p95_ms', 'p99_ms')
+
+
+def compare(results, baseline_path, tolerance):
+    with open(baseline_path) as f:
+        baseline = {(r['benchmark'], r['size']): r for r in map(json.loads, f) if r.get('benchmark')}
+    regressions = []
+    for result in results:
+        before = baseline.get((result['benchmark'], result['size']))
+        if before is None:
+            continue
+        for key in TIMING_KEYS:
+            if key in result and before.get(key):
+                ratio = result[key] / before[key]
+                comparison = {'benchmark': result['benchmark'], 'size': result['size'], 'metric': key,
+                              'baseline': before[key], 'current': result[key], 'ratio': ratio,
+                              'baseline_commit': before.get('commit'), 'regression': ratio > tolerance}
+                print(json.dumps(comparison), flush=True)
+                if comparison['regression']:
+                    regressions.append(comparison)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default="1000,10000", help="Comma-separated course counts, up to 1000000")
+    parser.add_argument('--suites', default="recommend,ingestion")
+    parser.add_argument('--queries', type=int, default=200, help="Queries per latency benchmark")
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--index-type', default='flat', help="See vector_index.INDEX_TYPES")
+    parser.add_argument('--llm-latency', type=float, default=0.0, help="Seconds per fake LLM call")
+    parser.add_argument('--firestore-latency', type=float, default=0.0, help="Seconds per fake batch commit")
+    parser.add_argument('--output', help="Also write the results to this JSON lines file")
+    parser.add_argument('--baseline', help="Results file of an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=1.25, help="Slowdown ratio that counts as a regression")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    # Everything the code under test writes (index, caches) goes to a scratch folder per size, and
+    # recommend reads its settings at import time, so configure it before importing
+    sys.path.insert(0, os.getcwd())
+    workdir = tempfile.mkdtemp(prefix="offline_benchmark_")
+    os.environ.update({
+        'EMBEDDING_BACKEND': 'hash',
+        'TOKENIZER': 'approx',
+        'RESPONSE_CACHE_PATH': os.path.join(workdir, "response_cache.sqlite3"),
+        'RESPONSE_CACHE_THRESHOLD': "1.01",
+        # Hash vectors of a query and a course naming the same field are only loosely aligned
+        'RETRIEVAL_SCORE_THRESHOLD': "0.1",
+    })
+
+    results = []
+    for size in (int(size) for size in args.sizes.split(',')):
+        os.makedirs(os.path.join(workdir, str(size)))
+        os.chdir(os.path.join(workdir, str(size)))
+        raw, catalog = synthetic_catalog(size)
+        size_results = []
+        if 'recommend' in args.suites:
+            size_results += benchmark_recommend(size, catalog, args)
+        if 'ingestion' in args.suites:
+            size_results += benchmark_ingestion(raw, args)
+        for result in size_results:
+            result = {**result, 'size': size, 'commit': commit}
+            results.append(result)
+            print(json.dumps(result), flush=True)
+
+    if output:
+        with open(output, 'w') as f:
+            f.writelines(json.dumps(result) + "\n" for result in results)
+    if baseline and compare(results, baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Cold-start import cost of the entry points, measured with ``python -X importtime``.
+
+Run from the repository root, e.g.::
+
+    python -m benchmarks.startup_benchmark
+    python -m benchmarks.startup_benchmark --entries main,script --budget main=600,script=400
+
+Each entry module is imported in a fresh interpreter ``--repeat`` times and the fastest run is
+reported, together with its slowest direct imports. The exit status is 1 when an entry point
+imports one of the heavy libraries that must only load lazily, or exceeds its ``--budget`` (ms).
+Each result is printed as one JSON line.
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+# main is the Streamlit UI, script the ingestion CLI, api the HTTP service
+ENTRY_POINTS = ('main', 'recommend', 'api', 'script')
+# Loaded on first use or by the warm-up thread, never at import time
+LAZY_MODULES = (
+    'torch', 'transformers', 'sentence_transformers', 'InstructorEmbedding', 'onnxruntime',
+    'langchain_community', 'langchain_google_genai', 'google.generativeai', 'faiss', 'tiktoken',
+    'streamlit', 'firebase_admin', 'google.cloud.firestore', 'selenium', 'aiohttp', 'bs4', 'requests',
+)
+
+
+def parse_importtime(stderr, module):
+    """Return (cumulative microseconds of ``module``, its direct imports, every imported module)."""
+    imported, children, pending = set(), [], []
+    total = None
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split('|')
+        # One separating space, then two more per nesting level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        imported.add(name)
+        if depth == 1:
+            pending.append((name, int(cumulative_us)))
+        elif depth == 0:
+            if name == module:
+                total, children = int(cumulative_us), pending
+            pending = []
+    return total, children, imported
+
+
+def lazy_violations(imported):
+    return sorted(lazy for lazy in LAZY_MODULES
+                  if lazy in imported or any(name.startswith(lazy + '.') for name in imported))
+
+
+def measure(module, repeat):
+    best = None
+    for _ in range(repeat):
+        completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                                   capture_output=True, text=True)
+        if completed.returncode != 0:
+            return {'module': module, 'error': completed.stderr.strip().splitlines()[-1]}
+        total, children, imported = parse_importtime(completed.stderr, module)
+        if best is None or total < best[0]:
+            best = (total, children, imported)
+
+    total, children, imported = best
+    return {
+        'module': module,
+        'import_ms': total / 1000,
+        'runs': repeat,
+        'modules_imported': len(imported),
+        'slowest_imports': [{'module': name, 'ms': us / 1000}
+                            for name, us in sorted(children, key=lambda child: child[1], reverse=True)[:10]],
+        'lazy_violations': lazy_violations(imported),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', default=",".join(ENTRY_POINTS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget', default="", help="Comma-separated module=milliseconds limits, e.g. main=600")
+    args = parser.parse_args()
+    budgets = {module: float(ms) for module, ms in (item.split('=') for item in args.budget.split(',') if item)}
+
+    failed = False
+    for module in args.entries.split(','):
+        result = measure(module, args.repeat)
+        if 'error' not in result:
+            result['budget_ms'] = budgets.get(module)
+            result['over_budget'] = module in budgets and result['import_ms'] > budgets[module]
+        failed |= bool('error' in result or result['lazy_violations'] or result['over_budget'])
+        print(json.dumps(result), flush=True)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from firestore_sync import read_state
+
+DEFAULT_SNAPSHOT_PATH = "catalog_snapshot.sqlite3"
+
+_cache_lock = threading.Lock()
+_cache = {}
+
+
+def export_snapshot(db, path=DEFAULT_SNAPSHOT_PATH, collection='university'):
+    """Export the whole school/course catalog from Firestore into a packed local SQLite file.
+
+    The catalog is read in two bulk queries and written to a temporary file that atomically
+    replaces ``path``, so readers never see a half-written snapshot.
+    """
+    start = time.perf_counter()
+    schools, courses = read_state(db, collection)
+
+    rows = sorted(
+        (schools[school_id]['name'], course['name'], course['level'])
+        for (school_id, _), course in courses.items() if school_id in schools
+    )
+    # Schools without courses still belong in the catalog
+    with_courses = {school_id for school_id, _ in courses}
+    empty_schools = sorted(data['name'] for school_id, data in schools.items() if school_id not in with_courses)
+    version = hashlib.sha1(json.dumps([rows, empty_schools], ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(
+            "CREATE TABLE schools (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);"
+            "CREATE TABLE courses (school_id INTEGER NOT NULL, name TEXT NOT NULL, level TEXT NOT NULL);"
+            "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+        )
+        school_names = sorted({name for name, _, _ in rows} | set(empty_schools))
+        school_ids = {name: school_id for school_id, name in enumerate(school_names)}
+        conn.executemany("INSERT INTO schools VALUES (?, ?)", [(i, name) for name, i in school_ids.items()])
+        conn.executemany("INSERT INTO courses VALUES (?, ?, ?)",
+                         [(school_ids[school], name, level) for school, name, level in rows])
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ('version', version), ('exported_at', str(time.time())), ('collection', collection),
+            ('schools', str(len(school_names))), ('courses', str(len(rows))),
+        ])
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+
+    return {'version': version, 'schools': len(school_names), 'courses': len(rows),
+            'elapsed_seconds': time.perf_counter() - start}
+
+
+def snapshot_version(path=DEFAULT_SNAPSHOT_PATH):
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def load_catalog(path=DEFAULT_SNAPSHOT_PATH):
+    """Return ``{school name: [{'name', 'level'}, ...]}`` from the snapshot, cached until the file changes."""
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        catalog = {name: [] for (name,) in conn.execute("SELECT name FROM schools ORDER BY id")}
+        for school, course, level in conn.execute(
+                "SELECT schools.name, courses.name, courses.level FROM courses "
+                "JOIN schools ON schools.id = courses.school_id ORDER BY courses.rowid"):
+            catalog[school].append({'name': course, 'level': level})
+    finally:
+        conn.close()
+
+    with _cache_lock:
+        _cache[path] = (signature, catalog)
+    return catalog
@@ -14,5 +14,4 @@ class EnvironmentConfig:
 
     def get_env_variable(self, key):
         self.load_env()
-        print(f'loading {key=}')
         return os.getenv(key)
@@ -1,21 +1,26 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_community.embeddings import HuggingFaceInstructEmbeddings
-
 from configs.env_config import EnvironmentConfig
+from configs.resources import resource_registry
+from embedding_backends import DEFAULT_EMBEDDING_BACKEND
 
 
 class GoogleGenerativeAIService:
-    def __init__(self, env_config: EnvironmentConfig):
+    def __init__(self, env_config: EnvironmentConfig, llm_instance=None):
         self.env_config = env_config
         self.google_api_key = None
-        self.llm_instance = None
+        # An explicit LLM (e.g. fakes.FakeChatModel) replaces the shared Gemini client
+        self.llm_instance = llm_instance
         self.huggingface_embeddings = None
+        self.embedding_backend = None
         self.initialize()
 
     def initialize(self):
-        self.huggingface_embeddings = HuggingFaceInstructEmbeddings(model_name="hkunlp/instructor-large")
+        # The registry loads the model and LLM client once per process, so building
+        # a service per request is cheap
+        self.embedding_backend = self.env_config.get_env_variable('EMBEDDING_BACKEND') or DEFAULT_EMBEDDING_BACKEND
+        self.huggingface_embeddings = resource_registry.get_embeddings(self.embedding_backend)
         self.google_api_key = self.env_config.get_env_variable('GEMINI_API_KEY')
-        self.llm_instance = ChatGoogleGenerativeAI(model="gemini-1.5-pro", google_api_key=self.google_api_key)
+        if self.llm_instance is None:
+            self.llm_instance = resource_registry.get_llm(self.google_api_key)
 
     def get_llm_instance(self):
         if not self.llm_instance:
@@ -26,3 +31,6 @@ class GoogleGenerativeAIService:
         if not self.huggingface_embeddings:
             self.initialize()
         return self.huggingface_embeddings
+
+    def get_vector_db(self, file_path="faiss_index"):
+        return resource_registry.get_vector_db(self.get_huggingface_embeddings(), file_path, self.embedding_backend)
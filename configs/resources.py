@@ -0,0 +1,151 @@
+import hashlib
+import os
+import threading
+import time
+
+from embedding_backends import DEFAULT_EMBEDDING_BACKEND, check_index_backend, create_embeddings
+from telemetry import log_event, metrics
+from index_store import has_store, load_vector_db
+from llm_gateway import HEDGE_MODEL, LLMGateway, chat_model
+from vector_index import MANIFEST_FILE, configure_search, read_index_meta
+
+DEFAULT_LLM_MODEL = "gemini-1.5-pro"
+DEFAULT_INDEX_PATH = "faiss_index"
+LEGACY_INDEX_FILES = ("index.faiss", "index.pkl")
+
+
+class ResourceRegistry:
+    """Process-wide, thread-safe holder for the expensive model, index and LLM objects.
+
+    Each resource is loaded once per process. The FAISS index is reloaded only when
+    the files under its folder change on disk. Client libraries are imported by the
+    loaders, so importing this module stays cheap.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._resources = {}
+        self._index_signatures = {}
+        self._timings = {}
+        self._warm_up_thread = None
+
+    def _record_timing(self, name, kind, seconds):
+        stats = self._timings.setdefault(name, {'cold_count': 0, 'cold_seconds': 0.0,
+                                                'warm_count': 0, 'warm_seconds': 0.0})
+        stats[f'{kind}_count'] += 1
+        stats[f'{kind}_seconds'] += seconds
+
+    def _get_or_load(self, key, name, loader, is_stale=None):
+        start = time.perf_counter()
+        resource = self._resources.get(key)
+        if resource is not None and not (is_stale and is_stale()):
+            with self._lock:
+                self._record_timing(name, 'warm', time.perf_counter() - start)
+            return resource
+
+        with self._lock:
+            # Another thread may have loaded it while we were waiting for the lock
+            resource = self._resources.get(key)
+            if resource is None or (is_stale and is_stale()):
+                start = time.perf_counter()
+                resource = loader()
+                self._resources[key] = resource
+                elapsed = time.perf_counter() - start
+                self._record_timing(name, 'cold', elapsed)
+                metrics.observe('resource_load_seconds', elapsed, resource=name)
+                log_event('resource_loaded', resource=name, seconds=elapsed)
+            else:
+                self._record_timing(name, 'warm', time.perf_counter() - start)
+        return resource
+
+    def get_embeddings(self, backend=DEFAULT_EMBEDDING_BACKEND):
+        return self._get_or_load(('embeddings', backend), f'embeddings/{backend}',
+                                 lambda: create_embeddings(backend))
+
+    def get_llm(self, google_api_key, model=DEFAULT_LLM_MODEL):
+        def loader():
+            # One gateway per model, so its rate limits and in-flight coalescing cover the whole process
+            fallback = chat_model(HEDGE_MODEL, google_api_key) if HEDGE_MODEL else None
+            return LLMGateway(chat_model(model, google_api_key), fallback, name=model)
+
+        return self._get_or_load(('llm', model, google_api_key), f'llm/{model}', loader)
+
+    def get_response_cache(self, db_path, similarity_threshold=0.95):
+        def loader():
+            from response_cache import ResponseCache
+            return ResponseCache(db_path=db_path, similarity_threshold=similarity_threshold)
+
+        return self._get_or_load(('response_cache', os.path.abspath(db_path), similarity_threshold),
+                                 'response_cache', loader)
+
+    @staticmethod
+    def _index_signature(file_path):
+        # The manifest is replaced atomically on every write, so it alone identifies the version
+        file_names = (MANIFEST_FILE,) if has_store(file_path) else LEGACY_INDEX_FILES
+        signature = []
+        for file_name in file_names:
+            stat = os.stat(os.path.join(file_path, file_name))
+            signature.append((file_name, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def get_vector_db(self, embeddings, file_path=DEFAULT_INDEX_PATH, backend=DEFAULT_EMBEDDING_BACKEND):
+        key = ('faiss_index', os.path.abspath(file_path), backend)
+
+        def is_stale():
+            return self._index_signatures.get(key) != self._index_signature(file_path)
+
+        def loader():
+            # Take the signature before loading so a concurrent rebuild triggers another reload
+            self._index_signatures[key] = self._index_signature(file_path)
+            index_meta = read_index_meta(file_path)
+            # Vectors from a different model live in a different space; refuse instead of returning junk
+            check_index_backend(index_meta, backend)
+            if has_store(file_path):
+                return load_vector_db(file_path, embeddings)
+
+            from langchain_community.vectorstores import FAISS
+            log_event('legacy_index_format', path=file_path, hint=f"python -m index_store migrate {file_path}")
+            vectordb = FAISS.load_local(file_path, embeddings, allow_dangerous_deserialization=True)
+            configure_search(vectordb.index, index_meta['index_type'])
+            return vectordb
+
+        return self._get_or_load(key, f'faiss_index/{file_path}', loader, is_stale)
+
+    def get_index_version(self, file_path=DEFAULT_INDEX_PATH):
+        # Changes whenever the index files are rewritten, e.g. by create_vector_db
+        return hashlib.sha1(repr(self._index_signature(file_path)).encode('utf-8')).hexdigest()[:16]
+
+    def invalidate(self, kind=None):
+        with self._lock:
+            for key in list(self._resources):
+                if kind is None or key[0] == kind:
+                    del self._resources[key]
+                    self._index_signatures.pop(key, None)
+
+    def warm_up(self, google_api_key, file_path=DEFAULT_INDEX_PATH, background=True,
+                backend=DEFAULT_EMBEDDING_BACKEND):
+        def load_all():
+            try:
+                embeddings = self.get_embeddings(backend)
+                self.get_vector_db(embeddings, file_path, backend)
+                self.get_llm(google_api_key)
+            except Exception as e:
+                metrics.inc('warm_up_failures_total')
+                log_event('warm_up_failed', error=repr(e))
+
+        if not background:
+            load_all()
+            return None
+
+        with self._lock:
+            if self._warm_up_thread is None:
+                self._warm_up_thread = threading.Thread(target=load_all, name='resource-warm-up', daemon=True)
+                self._warm_up_thread.start()
+        return self._warm_up_thread
+
+    def get_load_timings(self):
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._timings.items()}
+
+
+resource_registry = ResourceRegistry()
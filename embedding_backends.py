@@ -0,0 +1,108 @@
+import numpy as np
+
+from configs.env_config import EnvironmentConfig
+
+env_config = EnvironmentConfig(".env")
+
+DEFAULT_EMBEDDING_BACKEND = "instructor-large"
+
+# Known embedding backends. Instruction-tuned models get separate document and query instructions;
+# the instructor defaults match what LangChain used to build the shipped faiss_index.
+EMBEDDING_BACKENDS = {
+    'instructor-large': {
+        'kind': 'instructor',
+        'model_name': "hkunlp/instructor-large",
+        'embed_instruction': "Represent the document for retrieval: ",
+        'query_instruction': "Represent the question for retrieving supporting documents: ",
+    },
+    'instructor-base': {
+        'kind': 'instructor',
+        'model_name': "hkunlp/instructor-base",
+        'embed_instruction': "Represent the document for retrieval: ",
+        'query_instruction': "Represent the question for retrieving supporting documents: ",
+    },
+    'minilm': {
+        'kind': 'sentence-transformers',
+        'model_name': "sentence-transformers/all-MiniLM-L6-v2",
+    },
+    'multilingual-minilm': {
+        'kind': 'sentence-transformers',
+        'model_name': "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+    },
+    'minilm-onnx-int8': {
+        'kind': 'onnx',
+        'model_name': "sentence-transformers/all-MiniLM-L6-v2",
+        'file_name': "onnx/model_qint8_avx512_vnni.onnx",
+    },
+    # Offline stand-in for benchmarks and tests; see hash_embeddings.HashEmbeddings
+    'hash': {
+        'kind': 'hash',
+        'model_name': "hash-768",
+        'dim': 768,
+    },
+}
+
+
+def configure_threads(num_threads):
+    # Intra-op parallelism for torch-backed models; ONNX sessions take it per session
+    if num_threads:
+        import torch
+        torch.set_num_threads(num_threads)
+
+
+def create_embeddings(backend=DEFAULT_EMBEDDING_BACKEND, batch_size=None, num_threads=None):
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {sorted(EMBEDDING_BACKENDS)}")
+    spec = EMBEDDING_BACKENDS[backend]
+    batch_size = batch_size or int(env_config.get_env_variable('EMBEDDING_BATCH_SIZE') or 32)
+    num_threads = num_threads or int(env_config.get_env_variable('EMBEDDING_THREADS') or 0) or None
+
+    if spec['kind'] == 'onnx':
+        from onnx_embeddings import OnnxEmbeddings
+        return OnnxEmbeddings(spec['model_name'], spec['file_name'], batch_size, num_threads)
+    if spec['kind'] == 'hash':
+        from hash_embeddings import HashEmbeddings
+        return HashEmbeddings(spec['dim'])
+
+    # The torch-backed models are only imported once one is actually created
+    from langchain_community.embeddings import HuggingFaceEmbeddings, HuggingFaceInstructEmbeddings
+
+    configure_threads(num_threads)
+    if spec['kind'] == 'instructor':
+        return HuggingFaceInstructEmbeddings(model_name=spec['model_name'],
+                                             embed_instruction=spec['embed_instruction'],
+                                             query_instruction=spec['query_instruction'],
+                                             encode_kwargs={'batch_size': batch_size})
+
+    return HuggingFaceEmbeddings(model_name=spec['model_name'],
+                                 encode_kwargs={'batch_size': batch_size, 'normalize_embeddings': True})
+
+
+class EmbeddingBackendMismatch(ValueError):
+    pass
+
+
+def check_index_backend(index_meta, backend):
+    # Indexes from before backends were recorded were all built with instructor-large
+    index_backend = index_meta.get('embedding_backend', DEFAULT_EMBEDDING_BACKEND)
+    if index_backend != backend:
+        raise EmbeddingBackendMismatch(
+            f"Index was built with the {index_backend!r} embedding backend but queries use {backend!r}; "
+            f"rebuild the index or set EMBEDDING_BACKEND={index_backend}"
+        )
+
+
+def embed_queries(embeddings, texts):
+    """Embed several queries in one batched forward pass.
+
+    ``embed_query`` handles one text at a time and ``embed_documents`` would apply the document
+    instruction, so instruction-tuned models are called with the query instruction directly.
+    """
+    from langchain_community.embeddings import HuggingFaceInstructEmbeddings
+
+    if isinstance(embeddings, HuggingFaceInstructEmbeddings):
+        vectors = embeddings.client.encode([[embeddings.query_instruction, text] for text in texts],
+                                           **embeddings.encode_kwargs)
+        return np.asarray(vectors, dtype=np.float32)
+    # Symmetric models embed queries and documents the same way
+    return np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
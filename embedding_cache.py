@@ -0,0 +1,76 @@
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+
+def embedding_namespace(embeddings):
+    # Vectors depend on the model and on the instruction prepended to each document
+    model_name = getattr(embeddings, 'model_name', type(embeddings).__name__)
+    instruction = getattr(embeddings, 'embed_instruction', '')
+    return f"{model_name}|{instruction}"
+
+
+def text_key(namespace, text):
+    return hashlib.sha256(f"{namespace}\n{text}".encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """Content-addressed on-disk cache of document embeddings.
+
+    Vectors are stored as a single float32 ``vectors.npy`` matrix with a ``keys.json``
+    row index, one folder per model namespace.
+    """
+
+    def __init__(self, embeddings, cache_dir="embedding_cache"):
+        self.embeddings = embeddings
+        self.namespace = embedding_namespace(embeddings)
+        self.cache_dir = os.path.join(cache_dir, hashlib.sha1(self.namespace.encode('utf-8')).hexdigest()[:16])
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._vectors = None
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        keys_path = os.path.join(self.cache_dir, "keys.json")
+        vectors_path = os.path.join(self.cache_dir, "vectors.npy")
+        if os.path.exists(keys_path) and os.path.exists(vectors_path):
+            with open(keys_path) as f:
+                keys = json.load(f)['keys']
+            self._vectors = np.load(vectors_path)
+            self._rows = {key: row for row, key in enumerate(keys)}
+
+    def save(self):
+        with self._lock:
+            if self._vectors is None:
+                return
+            os.makedirs(self.cache_dir, exist_ok=True)
+            keys = sorted(self._rows, key=self._rows.get)
+            # Write to temporary files first so a crash never leaves a half-written cache
+            np.save(os.path.join(self.cache_dir, "vectors.tmp.npy"), self._vectors)
+            with open(os.path.join(self.cache_dir, "keys.tmp.json"), 'w') as f:
+                json.dump({'namespace': self.namespace, 'keys': keys}, f)
+            os.replace(os.path.join(self.cache_dir, "vectors.tmp.npy"), os.path.join(self.cache_dir, "vectors.npy"))
+            os.replace(os.path.join(self.cache_dir, "keys.tmp.json"), os.path.join(self.cache_dir, "keys.json"))
+
+    def embed_documents(self, texts):
+        keys = [text_key(self.namespace, text) for text in texts]
+        with self._lock:
+            missing = list(dict.fromkeys(key_text for key_text in zip(keys, texts) if key_text[0] not in self._rows))
+
+        if missing:
+            new_vectors = np.asarray(self.embeddings.embed_documents([text for _, text in missing]), dtype=np.float32)
+            with self._lock:
+                start = 0 if self._vectors is None else len(self._vectors)
+                self._vectors = new_vectors if self._vectors is None else np.vstack([self._vectors, new_vectors])
+                for offset, (key, _) in enumerate(missing):
+                    self._rows[key] = start + offset
+
+        with self._lock:
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+            return self._vectors[[self._rows[key] for key in keys]] if texts else np.empty((0, 0), np.float32)
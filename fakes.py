@@ -0,0 +1,401 @@
+import asyncio
+import html
+import json
+import random
+import threading
+import time
+import urllib.parse
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+
+class FakeTranslationLLM:
+    """Deterministic stand-in for Gemini in the translation stage.
+
+    It echoes the schools found in the prompt back as ``SchoolBatch`` JSON, with their ids and
+    course sources, deriving the level from the Portuguese course prefix, after sleeping
+    ``latency`` seconds. ``reverse=True`` answers with schools and courses in reverse order.
+    """
+
+    def __init__(self, latency=0.0, reverse=False):
+        self.latency = latency
+        self.reverse = reverse
+        self.calls = 0
+
+    def invoke(self, prompt_text):
+        self.calls += 1
+        time.sleep(self.latency)
+        entries = next(json.loads(line.strip()) for line in prompt_text.splitlines()
+                       if line.strip().startswith('['))
+        order = reversed if self.reverse else list
+        schools = [{
+            'id': entry['id'],
+            'school': entry['school'],
+            'courses': [{'title': course, 'source': course,
+                         'level': 'PhD' if course.lower().startswith('doutorado') else "Master's"}
+                        for course in order(entry['courses'])]
+        } for entry in order(entries)]
+        return AIMessage(content=json.dumps({'schools': schools}, ensure_ascii=False))
+
+
+class FakeChatModel:
+    """Deterministic stand-in for Gemini in the recommendation path.
+
+    It recommends every course listed in the prompt's context block, in the recommendations JSON
+    shape, after ``latency`` seconds; a fixed ``answer`` replaces that. ``stream`` yields the answer
+    in ``chunk_size`` pieces.
+    """
+
+    def __init__(self, latency=0.0, chunk_size=20, answer=None):
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.answer = answer
+        self.calls = 0
+
+    def _answer(self, prompt_text):
+        self.calls += 1
+        if self.answer is not None:
+            return self.answer
+        context = prompt_text.split("following list of universities and courses:\n", 1)[-1]
+        context = context.split("\nResponse Format:", 1)[0]
+        recommendations = []
+        for line in context.splitlines():
+            school, _, courses = line.partition(": ")
+            if not courses:
+                continue
+            recommendations.append({'school': school, 'courses': [
+                {'name': name, 'level': level.rstrip(')')}
+                for name, _, level in (course.rpartition(" (") for course in courses.split("; "))
+            ]})
+        return json.dumps({'recommendations': recommendations}, ensure_ascii=False)
+
+    def invoke(self, prompt_text):
+        time.sleep(self.latency)
+        return AIMessage(content=self._answer(prompt_text))
+
+    async def ainvoke(self, prompt_text):
+        await asyncio.sleep(self.latency)
+        return AIMessage(content=self._answer(prompt_text))
+
+    def stream(self, prompt_text):
+        time.sleep(self.latency)
+        answer = self._answer(prompt_text)
+        for start in range(0, len(answer), self.chunk_size):
+            yield AIMessageChunk(content=answer[start:start + self.chunk_size])
+
+
+class FakeChatServer:
+    """Local HTTP chat endpoint for exercising llm_gateway against latency and rate limits.
+
+    ``POST /chat`` with ``{"model", "prompt"}`` answers like FakeChatModel after ``latency``
+    seconds (per model via ``model_latency``), plus ``slow_latency`` for a ``slow_rate`` share of
+    calls. Calls beyond ``requests_per_minute`` in the last minute, and an ``error_rate`` share of
+    the rest, get HTTP 429 at once.
+    """
+
+    def __init__(self, latency=0.5, model_latency=None, slow_rate=0.05, slow_latency=5.0, requests_per_minute=0,
+                 error_rate=0.0, seed=0, port=0):
+        self.latency = latency
+        self.model_latency = model_latency or {}
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.requests_per_minute = requests_per_minute
+        self.error_rate = error_rate
+        self.port = port
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recent = []
+        self._server = None
+        self.requests = 0
+        self.rate_limited = 0
+        self.active = 0
+        self.peak_active = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def _admit(self):
+        # Returns the simulated latency, or None for a 429
+        with self._lock:
+            self.requests += 1
+            now = time.monotonic()
+            self._recent = [at for at in self._recent if now - at < 60]
+            if ((self.requests_per_minute and len(self._recent) >= self.requests_per_minute)
+                    or self._random.random() < self.error_rate):
+                self.rate_limited += 1
+                return None
+            self._recent.append(now)
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+            return self.slow_latency if self._random.random() < self.slow_rate else 0.0
+
+    def _handle(self, handler):
+        body = json.loads(handler.rfile.read(int(handler.headers.get('Content-Length', 0))))
+        extra = self._admit()
+        if extra is None:
+            handler.send_error(429, "Resource exhausted")
+            return
+        try:
+            time.sleep(self.model_latency.get(body.get('model'), self.latency) + extra)
+            answer = FakeChatModel()._answer(body['prompt'])
+        finally:
+            with self._lock:
+                self.active -= 1
+        payload = json.dumps({'content': answer}, ensure_ascii=False).encode('utf-8')
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(payload)))
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                server._handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='fake-chat-server', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class FakeGCUBServer:
+    """Local stand-in for the GCUB application form, for http_scraper and selenium_scraper.
+
+    ``GET /bsp/application-form.php`` serves ``form_html``; ``POST /bsp/busca-programas.php`` answers
+    the ``universidade`` field with the ``<option>`` list the real endpoint returns, built from
+    ``programs`` (university value -> course titles) after ``latency`` seconds. Values in
+    ``failing`` get HTTP 500 every time.
+    """
+
+    def __init__(self, form_html, programs, failing=(), latency=0.0, port=0):
+        self.form_html = form_html
+        self.programs = programs
+        self.failing = set(failing)
+        self.latency = latency
+        self.port = port
+        self._lock = threading.Lock()
+        self._server = None
+        self.requests = 0
+
+    @property
+    def form_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/bsp/application-form.php"
+
+    @property
+    def programs_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/bsp/busca-programas.php"
+
+    @staticmethod
+    def _send(handler, status, body, content_type='text/html; charset=utf-8'):
+        payload = body.encode('utf-8')
+        handler.send_response(status)
+        handler.send_header('Content-Type', content_type)
+        handler.send_header('Content-Length', str(len(payload)))
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    def _handle_get(self, handler):
+        if not handler.path.startswith('/bsp/application-form.php'):
+            handler.send_error(404)
+            return
+        self._send(handler, 200, self.form_html)
+
+    def _handle_post(self, handler):
+        if not handler.path.startswith('/bsp/busca-programas.php'):
+            handler.send_error(404)
+            return
+        body = handler.rfile.read(int(handler.headers.get('Content-Length', 0))).decode('utf-8')
+        value = urllib.parse.parse_qs(body).get('universidade', [''])[0]
+        with self._lock:
+            self.requests += 1
+        time.sleep(self.latency)
+        if value in self.failing:
+            handler.send_error(500)
+            return
+        options = ['<option value="">Selecione</option>'] + [
+            f'<option value="{value}{index:02d}">{html.escape(title)}</option>'
+            for index, title in enumerate(self.programs.get(value, []))
+        ]
+        self._send(handler, 200, '\n'.join(options))
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server._handle_get(self)
+
+            def do_POST(self):
+                server._handle_post(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='fake-gcub-server', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class FakeChatClient:
+    """Chat-model client for FakeChatServer; a 429 surfaces as urllib's HTTPError with ``code`` 429."""
+
+    def __init__(self, url, model='fake-pro', timeout=120, chunk_size=20):
+        self.url = url.rstrip('/')
+        self.model = model
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.calls = 0
+
+    def invoke(self, prompt_text):
+        self.calls += 1
+        request = urllib.request.Request(
+            f"{self.url}/chat", data=json.dumps({'model': self.model, 'prompt': prompt_text}).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return AIMessage(content=json.loads(response.read())['content'])
+
+    async def ainvoke(self, prompt_text):
+        return await asyncio.to_thread(self.invoke, prompt_text)
+
+    def stream(self, prompt_text):
+        answer = self.invoke(prompt_text).content
+        for start in range(0, len(answer), self.chunk_size):
+            yield AIMessageChunk(content=answer[start:start + self.chunk_size])
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeDocumentReference:
+    def __init__(self, db, path):
+        self._db = db
+        self.path = path
+        self.id = path[-1]
+
+    @property
+    def parent(self):
+        return FakeCollectionReference(self._db, self.path[:-1])
+
+    def collection(self, name):
+        return FakeCollectionReference(self._db, self.path + (name,))
+
+    def get(self):
+        self._db.reads += 1
+        return FakeDocumentSnapshot(self, self._db.documents.get(self.path))
+
+    def set(self, data, merge=False):
+        self._db.writes += 1
+        current = self._db.documents.get(self.path, {}) if merge else {}
+        self._db.documents[self.path] = {**current, **data}
+
+    def delete(self):
+        self._db.writes += 1
+        self._db.documents.pop(self.path, None)
+
+
+class FakeCollectionReference:
+    def __init__(self, db, path):
+        self._db = db
+        self.path = path
+        self.id = path[-1]
+
+    @property
+    def parent(self):
+        return FakeDocumentReference(self._db, self.path[:-1]) if len(self.path) > 1 else None
+
+    def document(self, document_id=None):
+        return FakeDocumentReference(self._db, self.path + (document_id or uuid.uuid4().hex[:20],))
+
+    def add(self, data):
+        ref = self.document()
+        ref.set(data)
+        return None, ref
+
+    def stream(self):
+        self._db.reads += 1
+        return [FakeDocumentSnapshot(FakeDocumentReference(self._db, path), data)
+                for path, data in list(self._db.documents.items()) if path[:-1] == self.path]
+
+
+class FakeCollectionGroup:
+    def __init__(self, db, collection_id):
+        self._db = db
+        self.collection_id = collection_id
+
+    def stream(self):
+        self._db.reads += 1
+        return [FakeDocumentSnapshot(FakeDocumentReference(self._db, path), data)
+                for path, data in list(self._db.documents.items()) if path[-2] == self.collection_id]
+
+
+class FakeWriteBatch:
+    def __init__(self, db):
+        self._db = db
+        self._operations = []
+
+    def set(self, reference, data, merge=False):
+        self._operations.append(lambda: reference.set(data, merge))
+
+    def delete(self, reference):
+        self._operations.append(reference.delete)
+
+    def commit(self):
+        if len(self._operations) > 500:
+            raise ValueError("A write batch can contain at most 500 operations")
+        time.sleep(self._db.latency)
+        with self._db.lock:
+            for operation in self._operations:
+                operation()
+            self._db.commits += 1
+
+
+class FakeFirestore:
+    """In-memory stand-in for the Firestore client, keyed by document path.
+
+    It counts reads, writes and batch commits so sync runs can be measured offline.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.documents = {}
+        self.lock = threading.Lock()
+        self.reads = 0
+        self.writes = 0
+        self.commits = 0
+
+    def collection(self, name):
+        return FakeCollectionReference(self, (name,))
+
+    def collection_group(self, collection_id):
+        return FakeCollectionGroup(self, collection_id)
+
+    def batch(self):
+        return FakeWriteBatch(self)
@@ -0,0 +1,93 @@
+import re
+
+import numpy as np
+
+from index_store import search_index
+
+# Lead-ins people put before the list of their fields
+LEAD_IN_PATTERN = re.compile(
+    r"^(i have|i've|with|having|i am|i'm)?\s*(experience|a background|background|studied|studies|worked|"
+    r"knowledge|interested|expertise|a degree)?\s*(in|on|with)?\s+", re.IGNORECASE
+)
+# Conjunctions only split between whitespace, so hyphenated words like "e-commerce" stay whole
+SPLIT_PATTERN = re.compile(r"[,;/\n]|(?<!\S)(?:and|or|e|ou)(?!\S)|\.\s", re.IGNORECASE)
+
+
+def split_fields(cv_text, max_fields=6, max_words=6):
+    """Split a CV into short field phrases, e.g. "cyber security, AI, and cloud computing" into three."""
+    fields = []
+    for sentence in re.split(r"(?<=[.!?])\s+", cv_text.strip()):
+        for part in SPLIT_PATTERN.split(sentence):
+            phrase = LEAD_IN_PATTERN.sub("", part.strip(" .!?:-\t")).strip(" .!?:-\t")
+            if phrase and len(phrase.split()) <= max_words and phrase.lower() not in (f.lower() for f in fields):
+                fields.append(phrase)
+    return fields[:max_fields]
+
+
+def _document_vectors(index, positions):
+    # MMR needs the stored vectors; indexes that cannot reconstruct fall back to plain de-duplication
+    try:
+        return np.vstack([index.reconstruct(int(position)) for position in positions])
+    except RuntimeError:
+        return None
+
+
+def _mmr_order(query_vector, candidate_vectors, lambda_mult):
+    order, remaining = [], list(range(len(candidate_vectors)))
+    query_similarity = candidate_vectors @ query_vector
+    while remaining:
+        if order:
+            redundancy = (candidate_vectors[remaining] @ candidate_vectors[order].T).max(axis=1)
+        else:
+            redundancy = np.zeros(len(remaining), dtype=np.float32)
+        mmr = lambda_mult * query_similarity[remaining] - (1 - lambda_mult) * redundancy
+        order.append(remaining.pop(int(np.argmax(mmr))))
+    return order
+
+
+def retrieve_by_field(vectordb, fields, field_embeddings, per_field_k=5, fetch_k=20, total_k=30,
+                      score_threshold=0.7, lambda_mult=0.5, search_filter=None, search_results=None):
+    """One batched FAISS search for all field phrases, merged with per-field quotas and MMR.
+
+    Returns ``(document, relevance score, field)`` triples; a course found by several fields is
+    kept once, under the field that ranked it first. ``search_filter`` (a models.SearchFilter)
+    restricts the search to matching levels and schools. ``search_results`` are the
+    ``(distances, positions)`` of an earlier search of the same field embeddings with at least
+    ``fetch_k`` neighbours, such as api.EmbeddingBatcher's shared search.
+    """
+    queries = np.ascontiguousarray(field_embeddings, dtype=np.float32)
+    if search_results is None:
+        distances, positions = search_index(vectordb, queries, fetch_k, search_filter)
+    else:
+        distances, positions = (np.asarray(result)[:, :fetch_k] for result in search_results)
+    relevance_score_fn = vectordb._select_relevance_score_fn()
+
+    per_field = []
+    for field_number, field in enumerate(fields):
+        candidates = [(int(position), relevance_score_fn(float(distance)))
+                      for distance, position in zip(distances[field_number], positions[field_number])
+                      if position != -1]
+        candidates = [(position, score) for position, score in candidates if score >= score_threshold]
+        vectors = _document_vectors(vectordb.index, [position for position, _ in candidates]) if candidates else None
+        if vectors is not None:
+            order = _mmr_order(queries[field_number], vectors, lambda_mult)
+            candidates = [candidates[i] for i in order]
+        per_field.append(candidates)
+
+    # Round-robin across fields so every field gets a share before any field fills its quota
+    selected, seen = [], set()
+    quotas = [0] * len(fields)
+    for rank in range(fetch_k):
+        for field_number, candidates in enumerate(per_field):
+            if len(selected) >= total_k:
+                return selected
+            if rank >= len(candidates) or quotas[field_number] >= per_field_k:
+                continue
+            position, score = candidates[rank]
+            if position in seen:
+                continue
+            seen.add(position)
+            quotas[field_number] += 1
+            doc = vectordb.docstore.search(vectordb.index_to_docstore_id[position])
+            selected.append((doc, score, fields[field_number]))
+    return selected
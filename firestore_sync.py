@@ -0,0 +1,132 @@
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from translation_memory import normalize_source
+
+# Firestore rejects write batches with more than 500 operations
+MAX_BATCH_OPERATIONS = 500
+
+
+def school_doc_id(school_name):
+    return hashlib.sha1(normalize_source(school_name).encode('utf-8')).hexdigest()[:20]
+
+
+def course_doc_id(school_name, course_title, level):
+    key = f"{normalize_source(school_name)}\n{normalize_source(course_title)}\n{level}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+
+
+def desired_state(data):
+    schools, courses = {}, {}
+    for entry in data:
+        school_id = school_doc_id(entry.school)
+        schools[school_id] = {'name': entry.school}
+        for course in entry.courses or []:
+            course_id = course_doc_id(entry.school, course.title, course.level.value)
+            courses[(school_id, course_id)] = {'name': course.title, 'level': course.level.value}
+    return schools, courses
+
+
+def read_state(db, collection='university'):
+    # Two bulk reads instead of one subcollection stream per school
+    schools = {doc.id: doc.to_dict() for doc in db.collection(collection).stream()}
+    courses = {}
+    for doc in db.collection_group('courses').stream():
+        school_ref = doc.reference.parent.parent
+        if school_ref is not None and school_ref.parent.id == collection:
+            courses[(school_ref.id, doc.id)] = doc.to_dict()
+    return schools, courses
+
+
+def read_schools_state(db, school_ids, collection='university'):
+    schools_ref = db.collection(collection)
+    schools, courses = {}, {}
+    for school_id in school_ids:
+        snapshot = schools_ref.document(school_id).get()
+        if snapshot.exists:
+            schools[school_id] = snapshot.to_dict()
+        for doc in schools_ref.document(school_id).collection('courses').stream():
+            courses[(school_id, doc.id)] = doc.to_dict()
+    return schools, courses
+
+
+def plan_operations(db, existing, desired, collection='university', keep=frozenset()):
+    """Writes that turn ``existing`` into ``desired``; documents of the school IDs in ``keep`` are never deleted."""
+    existing_schools, existing_courses = existing
+    desired_schools, desired_courses = desired
+    schools_ref = db.collection(collection)
+    operations = []
+    counts = {'inserts': 0, 'updates': 0, 'deletes': 0, 'unchanged': 0, 'kept': 0}
+
+    def plan(existing_docs, desired_docs, ref_for, school_of):
+        for key, data in desired_docs.items():
+            current = existing_docs.get(key)
+            if current == data:
+                counts['unchanged'] += 1
+                continue
+            counts['inserts' if current is None else 'updates'] += 1
+            operations.append(('set', ref_for(key), data))
+        for key in existing_docs.keys() - desired_docs.keys():
+            if school_of(key) in keep:
+                counts['kept'] += 1
+                continue
+            counts['deletes'] += 1
+            operations.append(('delete', ref_for(key), None))
+
+    plan(existing_schools, desired_schools, schools_ref.document, lambda key: key)
+    plan(existing_courses, desired_courses,
+         lambda key: schools_ref.document(key[0]).collection('courses').document(key[1]), lambda key: key[0])
+    return operations, counts
+
+
+def _commit_batch(db, operations):
+    batch = db.batch()
+    for operation, ref, data in operations:
+        if operation == 'set':
+            batch.set(ref, data)
+        else:
+            batch.delete(ref)
+    batch.commit()
+
+
+def sync_catalog(db, data, collection='university', workers=4, keep_schools=()):
+    """Make ``collection`` match the translated schools with the fewest writes.
+
+    Document IDs are derived from the school and course, so reruns update documents in place
+    instead of duplicating the catalog. Schools missing from ``data`` are pruned, except those
+    named in ``keep_schools``: schools that are still listed but failed to scrape or translate in
+    this run keep their existing documents.
+    """
+    start = time.perf_counter()
+    existing = read_state(db, collection)
+    read_seconds = time.perf_counter() - start
+
+    keep = {school_doc_id(name) for name in keep_schools}
+    operations, counts = plan_operations(db, existing, desired_state(data), collection, keep)
+    chunks = [operations[i:i + MAX_BATCH_OPERATIONS] for i in range(0, len(operations), MAX_BATCH_OPERATIONS)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(lambda chunk: _commit_batch(db, chunk), chunks))
+
+    return {
+        **counts,
+        'batches': len(chunks),
+        'read_seconds': read_seconds,
+        'elapsed_seconds': time.perf_counter() - start,
+    }
+
+
+def sync_schools(db, data, collection='university'):
+    """Upsert only the given schools, e.g. as they stream out of the pipeline.
+
+    Stale courses of those schools are deleted, but other schools are left alone; use
+    ``sync_catalog`` to prune schools that disappeared from the catalog.
+    """
+    start = time.perf_counter()
+    desired = desired_state(data)
+    existing = read_schools_state(db, desired[0].keys(), collection)
+    operations, counts = plan_operations(db, existing, desired, collection)
+    chunks = [operations[i:i + MAX_BATCH_OPERATIONS] for i in range(0, len(operations), MAX_BATCH_OPERATIONS)]
+    for chunk in chunks:
+        _commit_batch(db, chunk)
+    return {**counts, 'batches': len(chunks), 'elapsed_seconds': time.perf_counter() - start}
@@ -0,0 +1,40 @@
+import functools
+import hashlib
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Its own module, like onnx_embeddings: subclassing Embeddings loads langchain_core (and with it
+# langsmith and requests), so embedding_backends imports it only when the hash backend is created
+
+
+@functools.lru_cache(maxsize=100_000)
+def _word_feature(word, dim):
+    digest = hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest[:4], 'little') % dim, 1.0 if digest[4] & 1 else -1.0
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic stand-in for the sentence embedding models.
+
+    Each word is hashed into one of ``dim`` signed buckets, so texts that share words end up close
+    together and retrieval behaves plausibly without downloading a model.
+    """
+
+    def __init__(self, dim=768):
+        self.dim = dim
+        self.model_name = f"hash-{dim}"
+
+    def _embed(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in text.lower().split():
+            bucket, sign = _word_feature(word, self.dim)
+            vector[bucket] += sign
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_documents(self, texts):
+        return [self._embed(text).tolist() for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text).tolist()
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import queue
+import threading
+
+from configs.env_config import EnvironmentConfig
+from telemetry import metrics
+
+# aiohttp and BeautifulSoup are imported on first use; script.py imports this module for the URLs
+# below even when it drives the Selenium backend
+
+env_config = EnvironmentConfig(".env")
+
+GCUB_FORM_URL = "https://www.gcub.org.br/bsp/application-form.php"
+# Endpoint the form calls to fill select#programa001 once a university is picked. The path and the
+# field name are guesses, not taken from the live form (see tests/fixtures/gcub/README.md), so the
+# URL can be overridden with GCUB_PROGRAMS_URL or --programs-url.
+GCUB_PROGRAMS_URL = (env_config.get_env_variable('GCUB_PROGRAMS_URL')
+                     or "https://www.gcub.org.br/bsp/busca-programas.php")
+UNIVERSITY_FIELD = "universidade"
+
+
+def parse_options(html, select_id=None):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "lxml")
+    root = soup.select_one(f"select#{select_id}") if select_id else soup
+    if root is None:
+        return []
+    # The first option of each dropdown is a "Selecione" placeholder without a value
+    return [(option.get('value', '').strip(), option.get_text(strip=True))
+            for option in root.find_all('option') if option.get('value', '').strip()]
+
+
+def parse_programs(body, content_type=""):
+    if 'json' in content_type:
+        programs = json.loads(body)
+        return [program if isinstance(program, str) else program.get('nome') or program.get('name')
+                for program in programs]
+    return [text for _, text in parse_options(body)]
+
+
+async def _fetch_programs(session, semaphore, programs_url, university_value, retries, backoff):
+    import aiohttp
+    for attempt in range(retries):
+        try:
+            async with semaphore:
+                async with session.post(programs_url, data={UNIVERSITY_FIELD: university_value}) as response:
+                    response.raise_for_status()
+                    body = await response.text()
+                    return parse_programs(body, response.headers.get('Content-Type', ''))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"Exception occurred for {university_value}: {str(e)}")
+            metrics.inc('scrape_retries_total', backend='http')
+            await asyncio.sleep(min(backoff * 2 ** attempt, 10))
+    return None
+
+
+async def _fetch_universities(session, url):
+    async with session.get(url) as response:
+        response.raise_for_status()
+        return parse_options(await response.text(), "universidade001")
+
+
+async def _scrape_each(emit, url, programs_url, concurrency, retries, backoff, timeout, school_names=None, skip=(),
+                       stop=None):
+    # Calls emit(record) for each university as soon as its course list arrives; returns the dropdown order
+    import aiohttp
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        universities = await _fetch_universities(session, url)
+        if school_names is not None:
+            # Only these universities, e.g. a sample probed for changes
+            wanted = set(school_names)
+            universities = [(value, name) for value, name in universities if name in wanted]
+        universities = [(value, name) for value, name in universities if name not in skip]
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def scrape_one(value, school_name):
+            if stop is not None and stop.is_set():
+                return
+            courses = await _fetch_programs(session, semaphore, programs_url, value, retries, backoff)
+            if courses:
+                emit({
+                    'school': school_name,
+                    'courses': courses
+                })
+            else:
+                print(f"Failed to scrape data for {school_name} after retries")
+                metrics.inc('scrape_failures_total', backend='http')
+
+        await asyncio.gather(*[scrape_one(value, name) for value, name in universities])
+    return [name for _, name in universities]
+
+
+async def scrape_async(url=GCUB_FORM_URL, programs_url=GCUB_PROGRAMS_URL, concurrency=8, retries=3, backoff=0.5,
+                       timeout=30, school_names=None):
+    results = {}
+    order = await _scrape_each(lambda data: results.__setitem__(data['school'], data), url, programs_url,
+                               concurrency, retries, backoff, timeout, school_names)
+    # Keep the order of the university dropdown regardless of which request finished first
+    return [results[name] for name in order if name in results]
+
+
+def scrape_http(url=GCUB_FORM_URL, programs_url=GCUB_PROGRAMS_URL, concurrency=8, retries=3, backoff=0.5,
+                school_names=None) -> list:
+    """Browser-free equivalent of selenium_scraper.scrape, returning the same {'school', 'courses'} records."""
+    return asyncio.run(scrape_async(url, programs_url, concurrency, retries, backoff, school_names=school_names))
+
+
+def iter_scrape_http(url=GCUB_FORM_URL, programs_url=GCUB_PROGRAMS_URL, concurrency=8, retries=3, backoff=0.5,
+                     timeout=30, school_names=None, skip=()):
+    """Yield each university's record as soon as its course list arrives, like selenium_scraper.iter_scrape.
+
+    The requests run on an event loop in a background thread; closing the generator stops it from
+    starting requests for the universities that are left.
+    """
+    records, stop, done = queue.Queue(), threading.Event(), object()
+
+    def run():
+        try:
+            asyncio.run(_scrape_each(records.put, url, programs_url, concurrency, retries, backoff, timeout,
+                                     school_names, skip, stop))
+        except Exception as e:
+            records.put(e)
+        finally:
+            records.put(done)
+
+    thread = threading.Thread(target=run, name='http-scrape', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = records.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+async def _list_universities_async(url, timeout):
+    import aiohttp
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        return [name for _, name in await _fetch_universities(session, url)]
+
+
+def list_universities_http(url=GCUB_FORM_URL, timeout=30):
+    """Names in the university dropdown, from a single page load."""
+    return asyncio.run(_list_universities_async(url, timeout))
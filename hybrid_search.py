@@ -0,0 +1,151 @@
+import json
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from index_store import filter_matches
+
+STOPWORDS = {
+    # English
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'i', 'in', 'into', 'is', 'it', 'me', 'my',
+    'of', 'on', 'or', 'the', 'to', 'with', 'want', 'interested', 'study', 'studies', 'course', 'courses',
+    # Portuguese
+    'o', 'os', 'as', 'um', 'uma', 'e', 'em', 'no', 'na', 'nos', 'nas', 'de', 'do', 'da', 'dos', 'das', 'para',
+    'por', 'com', 'ao', 'aos', 'eu', 'meu', 'minha', 'que', 'se', 'curso', 'cursos',
+}
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def fold_accents(text):
+    return "".join(char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    tokens = []
+    for token in WORD_PATTERN.findall(fold_accents(text).lower()):
+        if token in STOPWORDS:
+            continue
+        # Light plural folding shared by English and Portuguese ("sciences", "ciencias")
+        if len(token) > 4 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def is_keyword_query(text, max_words=6):
+    # Short field names like "Chemistry" or "machine learning" rather than a free-form CV
+    words = text.split()
+    return 0 < len(words) <= max_words and not re.search(r"[.!?;\n]", text.strip().rstrip('.'))
+
+
+class BM25Index:
+    def __init__(self, texts, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)
+        self.lengths = np.zeros(len(texts), dtype=np.float32)
+        for doc_id, text in enumerate(texts):
+            terms = Counter(tokenize(text))
+            self.lengths[doc_id] = sum(terms.values())
+            for term, frequency in terms.items():
+                self.postings[term].append((doc_id, frequency))
+        self.average_length = float(self.lengths.mean()) if len(texts) else 0.0
+        self.count = len(texts)
+
+    def scores(self, query):
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (self.count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / self.average_length)
+                scores[doc_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return scores
+
+
+def _document_key(doc):
+    return doc.page_content, doc.metadata.get('school'), doc.metadata.get('course'), doc.metadata.get('level')
+
+
+class HybridRanker:
+    """BM25 over the indexed school/course/level strings fused with FAISS similarity."""
+
+    def __init__(self, vectordb, alpha=0.5):
+        self.vectordb = vectordb
+        self.alpha = alpha
+        self.positions = sorted(vectordb.index_to_docstore_id)
+        self.documents = [vectordb.docstore.search(vectordb.index_to_docstore_id[position])
+                          for position in self.positions]
+        self.document_ids = {_document_key(doc): doc_id for doc_id, doc in enumerate(self.documents)}
+        self.bm25 = BM25Index([doc.page_content for doc in self.documents])
+        self.relevance_score_fn = vectordb._select_relevance_score_fn()
+
+    def _vector_score(self, doc_id, query_embedding):
+        # Score lexical-only candidates too, when the index can hand back stored vectors
+        try:
+            vector = self.vectordb.index.reconstruct(self.positions[doc_id])
+        except RuntimeError:
+            return 0.0
+        distance = float(np.sum((np.asarray(query_embedding, dtype=np.float32) - vector) ** 2))
+        return max(0.0, self.relevance_score_fn(distance))
+
+    def rank(self, query, vector_hits, query_embedding=None, k=10, lexical_candidates=50, search_filter=None):
+        lexical = self.bm25.scores(query)
+        if search_filter is not None:
+            # Vector hits are already filtered; lexical matches must pass the same filter
+            lexical = {doc_id: score for doc_id, score in lexical.items()
+                       if filter_matches(search_filter, self.documents[doc_id].metadata)}
+        best_lexical = max(lexical.values(), default=0.0)
+
+        vector_scores = {}
+        for doc, score in vector_hits:
+            doc_id = self.document_ids.get(_document_key(doc))
+            if doc_id is not None:
+                vector_scores[doc_id] = float(score)
+        candidates = set(vector_scores) | set(sorted(lexical, key=lexical.get, reverse=True)[:lexical_candidates])
+
+        ranked = []
+        for doc_id in candidates:
+            if doc_id not in vector_scores:
+                vector_scores[doc_id] = (self._vector_score(doc_id, query_embedding)
+                                          if query_embedding is not None else 0.0)
+            lexical_score = lexical.get(doc_id, 0.0) / best_lexical if best_lexical else 0.0
+            fused = self.alpha * vector_scores[doc_id] + (1 - self.alpha) * lexical_score
+            ranked.append((self.documents[doc_id], fused, lexical_score))
+
+        # A keyword query only counts as answered when some course matches it lexically
+        if not any(lexical_score for _, _, lexical_score in ranked):
+            return []
+        ranked.sort(key=lambda hit: hit[1], reverse=True)
+        return [(doc, fused) for doc, fused, _ in ranked[:k]]
+
+
+_rankers = {}
+_rankers_lock = threading.Lock()
+
+
+def get_ranker(vectordb, index_version):
+    with _rankers_lock:
+        ranker = _rankers.get(index_version)
+        if ranker is None or ranker.vectordb is not vectordb:
+            ranker = HybridRanker(vectordb)
+            _rankers.clear()
+            _rankers[index_version] = ranker
+        return ranker
+
+
+def recommendations_json(hits):
+    """Render ranked hits in the same ``{"recommendations": [...]}`` shape the LLM returns."""
+    schools = {}
+    for doc, _ in hits:
+        schools.setdefault(doc.metadata['school'], []).append(
+            {"name": doc.metadata['course'], "level": doc.metadata['level']}
+        )
+    return json.dumps({"recommendations": [{"school": school, "courses": courses}
+                                           for school, courses in schools.items()]}, ensure_ascii=False)
@@ -0,0 +1,474 @@
+"""Pickle-free, memory-mapped storage for the course index.
+
+Layout under the index folder::
+
+    manifest.json                       current version, index type, embedding backend, counts
+    versions/<version>/vectors.npy      float32 (count, dim) document vectors
+    versions/<version>/norms.npy        float32 squared norm of each vector
+    versions/<version>/strings.bin      UTF-8 string table shared by every text column
+    versions/<version>/offsets.npy      int64 start of each string in strings.bin, plus the end
+    versions/<version>/columns.npy      int32 (count, 4) string ids of text, school, course, level
+    versions/<version>/partitions.npy   int64 (level id, school id, start row, end row) of each partition
+    versions/<version>/index.faiss      native FAISS index, for index types other than flat
+
+Nothing is unpickled and every file is opened read-only with mmap, so all serving processes on a
+host share one page-cache copy and loading takes milliseconds. Writers build a complete version
+folder and then atomically replace manifest.json, so readers see either the old or the new version.
+
+Rows are sorted by (level, school), so every level and every school's courses at one level are a
+contiguous run of rows: a partition. Filtered searches only scan the partitions they select.
+"""
+import argparse
+import json
+import mmap
+import os
+import shutil
+import time
+import uuid
+import weakref
+from collections.abc import Mapping
+from functools import cached_property
+
+import numpy as np
+
+from embedding_backends import DEFAULT_EMBEDDING_BACKEND
+from vector_index import MANIFEST_FILE, build_index, configure_search, read_index_meta, search_parameters
+
+# Version 2 added the (level, school) partitions
+FORMAT_VERSION = 2
+VERSIONS_DIR = "versions"
+COLUMNS = ('text', 'school', 'course', 'level')
+# Filtered searches over at most this many rows scan the memory-mapped vectors exactly, even when
+# the index type is approximate; larger ones search the FAISS index with an ID selector
+EXACT_FILTER_ROWS = 50000
+
+
+def has_store(file_path):
+    return os.path.exists(os.path.join(file_path, MANIFEST_FILE))
+
+
+def read_manifest(file_path):
+    with open(os.path.join(file_path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported index format {manifest.get('format')!r} in {file_path}; "
+                         f"rebuild it with recommend.build_index_from_snapshot")
+    return manifest
+
+
+def _string_table(texts, metadatas):
+    ids, chunks, offsets = {}, [], [0]
+
+    def intern(value):
+        string_id = ids.get(value)
+        if string_id is None:
+            string_id = ids[value] = len(ids)
+            data = value.encode('utf-8')
+            chunks.append(data)
+            offsets.append(offsets[-1] + len(data))
+        return string_id
+
+    columns = np.array([[intern(text)] + [intern(metadata.get(column, '')) for column in COLUMNS[1:]]
+                        for text, metadata in zip(texts, metadatas)], dtype=np.int32).reshape(-1, len(COLUMNS))
+    return b"".join(chunks), np.array(offsets, dtype=np.int64), columns
+
+
+def _partitions(columns):
+    # Start of every run of equal (level, school) string ids; rows are already sorted by them
+    keys = columns[:, [3, 1]].astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, np.any(keys[1:] != keys[:-1], axis=1)]) if len(keys) else np.empty(0, np.int64)
+    ends = np.r_[starts[1:], len(keys)]
+    return np.column_stack([keys[starts], starts, ends]).astype(np.int64).reshape(-1, 4)
+
+
+def _prune_versions(file_path, keep_versions, current):
+    # Keep the previous version too: a reader may have read the old manifest just before the swap
+    versions_dir = os.path.join(file_path, VERSIONS_DIR)
+    versions = sorted(name for name in os.listdir(versions_dir) if not name.startswith('.'))
+    for name in versions[:-keep_versions]:
+        if name != current:
+            shutil.rmtree(os.path.join(versions_dir, name), ignore_errors=True)
+
+
+def write_store(file_path, texts, metadatas, vectors, index_type, index=None, keep_versions=2, **extra):
+    """Write a new index version and atomically make it current; returns the manifest.
+
+    Rows must already be in partition order (see ``partition_order``); ``build_store`` takes care of that.
+    """
+    import faiss
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    # Sortable by creation time, unique across concurrent writers
+    version = f"{int(time.time() * 1000):013d}-{uuid.uuid4().hex[:8]}"
+    versions_dir = os.path.join(file_path, VERSIONS_DIR)
+    tmp_dir = os.path.join(versions_dir, f".{version}.tmp")
+    os.makedirs(tmp_dir)
+
+    strings, offsets, columns = _string_table(texts, metadatas)
+    np.save(os.path.join(tmp_dir, "vectors.npy"), vectors)
+    np.save(os.path.join(tmp_dir, "norms.npy"), np.einsum('ij,ij->i', vectors, vectors).astype(np.float32))
+    np.save(os.path.join(tmp_dir, "offsets.npy"), offsets)
+    np.save(os.path.join(tmp_dir, "columns.npy"), columns)
+    np.save(os.path.join(tmp_dir, "partitions.npy"), _partitions(columns))
+    with open(os.path.join(tmp_dir, "strings.bin"), 'wb') as f:
+        f.write(strings)
+    if index is not None:
+        faiss.write_index(index, os.path.join(tmp_dir, "index.faiss"))
+    os.rename(tmp_dir, os.path.join(versions_dir, version))
+
+    manifest = {
+        'format': FORMAT_VERSION,
+        'version': version,
+        'index_type': index_type,
+        'dim': int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+        'count': len(vectors),
+        'strings': len(offsets) - 1,
+        'created_at': time.time(),
+        **extra,
+    }
+    tmp_manifest = os.path.join(file_path, f".{MANIFEST_FILE}.{version}.tmp")
+    with open(tmp_manifest, 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_manifest, os.path.join(file_path, MANIFEST_FILE))
+    _prune_versions(file_path, keep_versions, version)
+    return manifest
+
+
+def _map_file(path):
+    if os.path.getsize(path) == 0:
+        return b""
+    with open(path, 'rb') as f:
+        # The mapping stays valid after the file is closed (and even after the version is pruned)
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class IndexStore:
+    """Read-only view of the current index version; every array is memory-mapped."""
+
+    def __init__(self, file_path):
+        self.manifest = read_manifest(file_path)
+        self.path = os.path.join(file_path, VERSIONS_DIR, self.manifest['version'])
+        self.vectors = np.load(os.path.join(self.path, "vectors.npy"), mmap_mode='r')
+        self.norms = np.load(os.path.join(self.path, "norms.npy"), mmap_mode='r')
+        self.offsets = np.load(os.path.join(self.path, "offsets.npy"), mmap_mode='r')
+        self.columns = np.load(os.path.join(self.path, "columns.npy"), mmap_mode='r')
+        self.partitions = np.load(os.path.join(self.path, "partitions.npy"), mmap_mode='r')
+        self._strings = _map_file(os.path.join(self.path, "strings.bin"))
+
+    def __len__(self):
+        return len(self.columns)
+
+    def string(self, string_id):
+        return self._strings[int(self.offsets[string_id]):int(self.offsets[string_id + 1])].decode('utf-8')
+
+    def text(self, row):
+        return self.string(self.columns[row, 0])
+
+    def metadata(self, row):
+        return {column: self.string(string_id) for column, string_id in zip(COLUMNS[1:], self.columns[row, 1:])}
+
+    def document(self, row):
+        # Imported here: langchain_core loads langsmith and requests, which the entry points defer
+        from langchain_core.documents import Document
+        return Document(page_content=self.text(row), metadata=self.metadata(row))
+
+    @cached_property
+    def _level_partitions(self):
+        # level -> (first, last + 1) partition; partitions are sorted by level first
+        levels = {}
+        for number, level_id in enumerate(self.partitions[:, 0]):
+            first, _ = levels.get(level_id, (number, number))
+            levels[level_id] = (first, number + 1)
+        return {self.string(level_id): span for level_id, span in levels.items()}
+
+    @cached_property
+    def _school_partitions(self):
+        # The precomputed school -> partitions lookup behind school filters and school_rows
+        schools = {}
+        for number, school_id in enumerate(self.partitions[:, 1]):
+            schools.setdefault(school_id, []).append(number)
+        return {self.string(school_id): numbers for school_id, numbers in schools.items()}
+
+    @cached_property
+    def _level_ids(self):
+        return {self.string(level_id): level_id for level_id in np.unique(self.partitions[:, 0])}
+
+    def levels(self):
+        return sorted(self._level_partitions)
+
+    def schools(self):
+        return sorted(self._school_partitions)
+
+    def ranges(self, search_filter):
+        """Sorted, merged ``(start, end)`` row ranges selected by ``search_filter``; ``None`` selects everything."""
+        levels, schools = filter_values(search_filter)
+        if levels is None and schools is None:
+            return [(0, len(self))]
+        if schools is None:
+            numbers = [number for level in levels if level in self._level_partitions
+                       for number in range(*self._level_partitions[level])]
+        else:
+            numbers = [number for school in schools for number in self._school_partitions.get(school, ())]
+            if levels is not None:
+                level_ids = {self._level_ids[level] for level in levels if level in self._level_ids}
+                numbers = [number for number in numbers if self.partitions[number, 0] in level_ids]
+
+        merged = []
+        for start, end in sorted((int(self.partitions[number, 2]), int(self.partitions[number, 3]))
+                                 for number in numbers):
+            if merged and merged[-1][1] == start:
+                merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((start, end))
+        return merged
+
+    def school_rows(self, school):
+        """Rows of every course at ``school``, without searching."""
+        numbers = self._school_partitions.get(school, ())
+        return np.concatenate([np.arange(self.partitions[number, 2], self.partitions[number, 3])
+                               for number in numbers]) if numbers else np.empty(0, dtype=np.int64)
+
+
+class ColumnarDocstore:
+    """Docstore interface over an IndexStore; document ids are row positions as strings."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def search(self, search):
+        try:
+            row = int(search)
+        except (TypeError, ValueError):
+            row = -1
+        if not 0 <= row < len(self.store):
+            return f"ID {search} not found."
+        return self.store.document(row)
+
+
+class PositionIds(Mapping):
+    """The ``index_to_docstore_id`` mapping of a stored index, without materializing a dict."""
+
+    def __init__(self, count):
+        self.count = count
+
+    def __getitem__(self, position):
+        position = int(position)
+        if not 0 <= position < self.count:
+            raise KeyError(position)
+        return str(position)
+
+    def __iter__(self):
+        return iter(range(self.count))
+
+    def __len__(self):
+        return self.count
+
+
+class MmapFlatIndex:
+    """Exact L2 search over the memory-mapped vectors; a read-only stand-in for faiss.IndexFlatL2.
+
+    faiss.IndexFlat copies its vectors into private memory, while this index reads them from the
+    shared page cache.
+    """
+
+    is_trained = True
+
+    def __init__(self, vectors, norms, block_size=65536):
+        self.vectors = vectors
+        self.norms = norms
+        self.d = vectors.shape[1]
+        self.ntotal = len(vectors)
+        self.block_size = block_size
+
+    def _blocks(self, ranges):
+        for start, end in ranges:
+            for block_start in range(start, end, self.block_size):
+                yield block_start, min(end, block_start + self.block_size)
+
+    def search(self, queries, k, ranges=None):
+        """Like faiss ``Index.search``; ``ranges`` limits the search to those ``(start, end)`` rows."""
+        queries = np.ascontiguousarray(queries, dtype=np.float32).reshape(-1, self.d)
+        query_norms = np.einsum('ij,ij->i', queries, queries)
+        best_distances = np.empty((len(queries), 0), dtype=np.float32)
+        best_labels = np.empty((len(queries), 0), dtype=np.int64)
+        for start, end in self._blocks([(0, self.ntotal)] if ranges is None else ranges):
+            block = self.vectors[start:end]
+            distances = query_norms[:, None] - 2 * (queries @ block.T) + self.norms[start:end][None, :]
+            labels = np.broadcast_to(np.arange(start, end, dtype=np.int64), distances.shape)
+            distances = np.concatenate([best_distances, distances], axis=1)
+            labels = np.concatenate([best_labels, labels], axis=1)
+            if distances.shape[1] > k:
+                keep = np.argpartition(distances, k - 1, axis=1)[:, :k]
+                distances = np.take_along_axis(distances, keep, axis=1)
+                labels = np.take_along_axis(labels, keep, axis=1)
+            best_distances, best_labels = distances, labels
+
+        order = np.argsort(best_distances, axis=1, kind='stable')
+        distances = np.maximum(np.take_along_axis(best_distances, order, axis=1), 0).astype(np.float32)
+        labels = np.take_along_axis(best_labels, order, axis=1)
+        if labels.shape[1] < k:
+            # Like FAISS, pad missing neighbours with label -1
+            missing = k - labels.shape[1]
+            distances = np.pad(distances, ((0, 0), (0, missing)), constant_values=np.finfo(np.float32).max)
+            labels = np.pad(labels, ((0, 0), (0, missing)), constant_values=-1)
+        return distances, labels
+
+    def reconstruct(self, key):
+        return np.array(self.vectors[int(key)], dtype=np.float32)
+
+
+def load_vector_db(file_path, embeddings):
+    """Open the current stored index as a LangChain FAISS vector store, without unpickling anything."""
+    import faiss
+    from langchain_community.vectorstores import FAISS
+
+    store = IndexStore(file_path)
+    index_type = store.manifest['index_type']
+    if index_type == 'flat':
+        index = MmapFlatIndex(store.vectors, store.norms)
+    else:
+        # Where FAISS supports it (IVF lists) the codes stay on disk and are paged in on demand
+        index = faiss.read_index(os.path.join(store.path, "index.faiss"), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        configure_search(index, index_type)
+    vectordb = FAISS(embedding_function=embeddings, index=index, docstore=ColumnarDocstore(store),
+                     index_to_docstore_id=PositionIds(len(store)))
+    vectordb.store = store
+    return vectordb
+
+
+def filter_values(search_filter):
+    """``(levels, schools)`` of a models.SearchFilter as sets of strings; ``None`` where it does not filter."""
+    if search_filter is None:
+        return None, None
+    levels = {getattr(level, 'value', level) for level in search_filter.levels or ()} or None
+    return levels, set(search_filter.schools or ()) or None
+
+
+def filter_key(search_filter):
+    """Stable text form of a filter, e.g. to scope cached answers; empty when nothing is filtered."""
+    levels, schools = filter_values(search_filter)
+    if levels is None and schools is None:
+        return ""
+    return json.dumps([sorted(levels or ()), sorted(schools or ())], ensure_ascii=False)
+
+
+def filter_matches(search_filter, metadata):
+    levels, schools = filter_values(search_filter)
+    return ((levels is None or metadata.get('level') in levels)
+            and (schools is None or metadata.get('school') in schools))
+
+
+# Legacy LangChain index -> {filter_key: FAISS ids of its matching documents}
+_legacy_selections = weakref.WeakKeyDictionary()
+
+
+def _legacy_search(vectordb, queries, k, search_filter):
+    # Legacy indexes have no partitions, so the matching ids come from the docstore metadata, once per filter
+    selections = _legacy_selections.setdefault(vectordb, {})
+    key = filter_key(search_filter)
+    if key not in selections:
+        selections[key] = np.array(sorted(
+            position for position, doc_id in vectordb.index_to_docstore_id.items()
+            if filter_matches(search_filter, vectordb.docstore.search(doc_id).metadata)
+        ), dtype=np.int64)
+    ids = selections[key]
+    if not len(ids):
+        return np.full((len(queries), k), np.inf, dtype=np.float32), np.full((len(queries), k), -1, dtype=np.int64)
+
+    import faiss
+    # Plain SearchParameters keep the index's own nprobe / efSearch
+    params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(len(ids), faiss.swig_ptr(ids)))
+    return vectordb.index.search(queries, k, params=params)
+
+
+def search_index(vectordb, queries, k, search_filter=None):
+    """Search the index of ``vectordb`` for ``queries``, restricted to the rows ``search_filter`` selects.
+
+    Returns faiss-style ``(distances, labels)``. The cost of a filtered search grows with the rows
+    it selects, not with the catalog: small selections are scanned exactly from the memory-mapped
+    vectors, larger ones are searched in the FAISS index with an ID selector.
+    """
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    if not filter_key(search_filter):
+        return vectordb.index.search(queries, k)
+    store = getattr(vectordb, 'store', None)
+    if store is None:
+        # Still exact, but it scans the whole index; `python -m index_store migrate` makes it partitioned
+        return _legacy_search(vectordb, queries, k, search_filter)
+
+    ranges = store.ranges(search_filter)
+    rows = sum(end - start for start, end in ranges)
+    if isinstance(vectordb.index, MmapFlatIndex) or rows <= EXACT_FILTER_ROWS:
+        return MmapFlatIndex(store.vectors, store.norms).search(queries, k, ranges)
+
+    import faiss
+    if len(ranges) == 1:
+        selector = faiss.IDSelectorRange(*ranges[0])
+    else:
+        ids = np.concatenate([np.arange(start, end, dtype=np.int64) for start, end in ranges])
+        selector = faiss.IDSelectorBatch(len(ids), faiss.swig_ptr(ids))
+    params = search_parameters(store.manifest['index_type'], selector)
+    return vectordb.index.search(queries, k, params=params)
+
+
+def partition_order(metadatas):
+    """Row order that groups documents into (level, school) partitions, keeping their order inside each."""
+    return sorted(range(len(metadatas)), key=lambda row: (metadatas[row].get('level', ''),
+                                                          metadatas[row].get('school', '')))
+
+
+def build_store(file_path, texts, metadatas, vectors, index_type='flat', **extra):
+    """Build the search index for ``vectors`` and write it as a new version; returns the manifest."""
+    order = partition_order(metadatas)
+    texts, metadatas = [texts[row] for row in order], [metadatas[row] for row in order]
+    vectors = np.asarray(vectors, dtype=np.float32)[order]
+    index, built_type = None, 'flat'
+    if index_type != 'flat':
+        index, built_type = build_index(vectors, index_type)
+        if built_type == 'flat':
+            # Flat search is served straight from vectors.npy
+            index = None
+        else:
+            index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+    return write_store(file_path, texts, metadatas, vectors, built_type, index, requested_type=index_type, **extra)
+
+
+def migrate_legacy(file_path):
+    """Convert a LangChain ``index.faiss`` + ``index.pkl`` folder into the stored format.
+
+    This is the one place that still unpickles; only run it on an index you built yourself.
+    """
+    from langchain_community.vectorstores import FAISS
+
+    meta = read_index_meta(file_path)
+    legacy = FAISS.load_local(file_path, None, allow_dangerous_deserialization=True)
+    positions = sorted(legacy.index_to_docstore_id)
+    documents = [legacy.docstore.search(legacy.index_to_docstore_id[position]) for position in positions]
+    try:
+        vectors = legacy.index.reconstruct_n(0, legacy.index.ntotal)[positions]
+    except RuntimeError as e:
+        raise ValueError(f"The {meta['index_type']} index in {file_path} cannot hand back its vectors; "
+                         f"rebuild it with recommend.build_index_from_snapshot instead") from e
+    return build_store(file_path, [doc.page_content for doc in documents], [doc.metadata for doc in documents],
+                       vectors, meta.get('requested_type', meta['index_type']),
+                       embedding_backend=meta.get('embedding_backend', DEFAULT_EMBEDDING_BACKEND))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or migrate a stored course index")
+    parser.add_argument('command', choices=['info', 'migrate'])
+    parser.add_argument('path', nargs='?', default="faiss_index")
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        manifest = migrate_legacy(args.path)
+        print(f"Wrote version {manifest['version']} ({manifest['count']} documents); "
+              f"index.faiss and index.pkl are no longer read and can be deleted")
+    else:
+        print(json.dumps(read_manifest(args.path), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,425 @@
+"""Shared gateway in front of the chat models: rate limits, coalescing, deadlines, hedging and a circuit breaker.
+
+Configured from the environment or ``.env``:
+
+- ``LLM_REQUESTS_PER_MINUTE`` (default 60) and ``LLM_TOKENS_PER_MINUTE`` (default 0, unlimited) size
+  the token buckets every call waits on. Prompt tokens are estimated up front and completion
+  tokens are charged when the answer arrives.
+- ``LLM_MAX_CONCURRENCY`` (default 8) caps distinct prompts in flight; identical prompts that
+  arrive while one is in flight share its call.
+- ``LLM_TIMEOUT`` (default 60) is the deadline of a call in seconds, queueing and retries included.
+  ``chat_model`` also uses it as the Gemini client's request timeout.
+- ``LLM_HEDGE_MODEL`` (e.g. ``gemini-1.5-flash``) is raced against the primary model once the
+  primary takes longer than its ``LLM_HEDGE_PERCENTILE`` (default 95) latency, and answers alone
+  while the circuit is open.
+- ``LLM_BREAKER_FAILURES`` (default 5) consecutive failures open the circuit for
+  ``LLM_BREAKER_RESET_SECONDS`` (default 30); then one trial call decides whether it closes.
+
+Queueing delay (waiting for a slot, the rate limits and 429 backoff) and model latency are
+recorded separately, in the ``llm_queue_seconds`` and ``llm_model_seconds`` histograms.
+"""
+import asyncio
+import collections
+import contextvars
+import hashlib
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from configs.env_config import EnvironmentConfig
+from telemetry import annotate, metrics
+
+# Read through EnvironmentConfig so values from .env apply even when this module is imported first
+env_config = EnvironmentConfig(".env")
+REQUESTS_PER_MINUTE = float(env_config.get_env_variable('LLM_REQUESTS_PER_MINUTE') or 60)
+TOKENS_PER_MINUTE = float(env_config.get_env_variable('LLM_TOKENS_PER_MINUTE') or 0)
+MAX_CONCURRENCY = int(env_config.get_env_variable('LLM_MAX_CONCURRENCY') or 8)
+TIMEOUT = float(env_config.get_env_variable('LLM_TIMEOUT') or 60)
+HEDGE_MODEL = env_config.get_env_variable('LLM_HEDGE_MODEL') or None
+HEDGE_PERCENTILE = float(env_config.get_env_variable('LLM_HEDGE_PERCENTILE') or 95)
+BREAKER_FAILURES = int(env_config.get_env_variable('LLM_BREAKER_FAILURES') or 5)
+BREAKER_RESET_SECONDS = float(env_config.get_env_variable('LLM_BREAKER_RESET_SECONDS') or 30)
+
+
+def chat_model(model, google_api_key):
+    """A Gemini chat model to put behind LLMGateway.
+
+    The gateway does the retrying, so the client's own retries are off, and the client gives up at
+    the gateway's deadline, so a request abandoned at its deadline frees its thread soon after.
+    """
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model=model, google_api_key=google_api_key, max_retries=0, timeout=TIMEOUT)
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+def estimate_tokens(text):
+    # Same rough ratio as translation.estimate_tokens; rate limits only need the order of magnitude
+    return len(text) // 4 + 1
+
+
+def is_rate_limited(e):
+    # Gemini raises google.api_core's ResourceExhausted; HTTP clients carry the status code
+    names = {cls.__name__ for cls in type(e).__mro__}
+    return ('ResourceExhausted' in names or 'RateLimitError' in names
+            or getattr(e, 'code', None) == 429 or getattr(e, 'status_code', None) == 429)
+
+
+def _response_text(response):
+    return response.content if hasattr(response, 'content') else str(response)
+
+
+class TokenBucket:
+    """Refills ``per_minute`` units a minute, holding at most ``burst_seconds`` worth.
+
+    A small burst keeps a per-minute quota from being spent in the first second and then
+    exceeded over the following rolling minute.
+    """
+
+    def __init__(self, per_minute, burst_seconds=10):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount):
+        """Take ``amount`` now, overdrawing if needed; returns the seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= min(amount, self.capacity)
+            return max(0.0, -self.tokens / self.rate)
+
+    def refund(self, amount):
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + min(amount, self.capacity))
+
+    def drain(self):
+        # After a 429 the provider's quota is spent whatever our estimate says; make every caller wait
+        with self._lock:
+            self.tokens = min(self.tokens, 0.0)
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures; after ``reset_seconds`` one trial call may pass.
+
+    ``allow`` returns None while the circuit is open, otherwise a permit ('closed' or 'trial') that
+    goes back through ``release`` once the call is over, whatever its outcome.
+    """
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURES, reset_seconds=BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return 'closed'
+            return 'half_open' if self._trial else 'open'
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return 'closed'
+            if not self._trial and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self._trial = True
+                return 'trial'
+            return None
+
+    def release(self, permit):
+        # A trial that ended without a verdict (a 429, a deadline in the queue, an abandoned stream)
+        # must not keep the circuit half open; the next call becomes the trial instead
+        if permit == 'trial':
+            with self._lock:
+                self._trial = False
+
+    def record(self, ok):
+        with self._lock:
+            if ok:
+                self.failures, self.opened_at, self._trial = 0, None, False
+                return
+            self.failures += 1
+            if self._trial or (self.opened_at is None and self.failures >= self.failure_threshold):
+                self.opened_at, self._trial = time.monotonic(), False
+                metrics.inc('llm_circuit_opened_total', model=self.name)
+
+
+class LatencyWindow:
+    """Latencies of the most recent primary-model calls, for the hedging threshold."""
+
+    def __init__(self, size=200):
+        self._samples = collections.deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, percentile, min_samples=20):
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+
+class LLMGateway:
+    """Stands in for a LangChain chat model (``invoke``, ``ainvoke``, ``stream``) and guards every call to it.
+
+    ``llm`` and the optional ``fallback_llm`` are anything with ``invoke(prompt)`` (and ``stream``
+    for streaming). A call that misses its deadline raises DeadlineExceeded, but the model request
+    itself cannot be interrupted: it keeps one of the ``2 * max_concurrency`` call threads until the
+    model answers or its client times out (see ``chat_model``), as does a primary that lost to a
+    hedge. ``get_metrics()['abandoned_calls']`` counts the requests still holding a thread that way.
+    """
+
+    def __init__(self, llm, fallback_llm=None, name='llm', requests_per_minute=REQUESTS_PER_MINUTE,
+                 tokens_per_minute=TOKENS_PER_MINUTE, max_concurrency=MAX_CONCURRENCY, timeout=TIMEOUT,
+                 hedge_percentile=HEDGE_PERCENTILE, hedge_min_samples=20, retries=3, backoff=1.0,
+                 breaker_failures=BREAKER_FAILURES, breaker_reset_seconds=BREAKER_RESET_SECONDS):
+        self.llm = llm
+        self.fallback_llm = fallback_llm
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.timeout = timeout
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = CircuitBreaker(name, breaker_failures, breaker_reset_seconds)
+        self.latencies = LatencyWindow()
+        self._workers = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=f'{name}-gateway')
+        # Model calls get their own threads so a worker can give up at the deadline or start a hedge
+        self._calls = ThreadPoolExecutor(max_workers=2 * max_concurrency, thread_name_prefix=f'{name}-call')
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._abandoned = 0
+        self.stats = collections.Counter()
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _submit(self, prompt_text, timeout):
+        key = hashlib.sha256(prompt_text.encode('utf-8')).hexdigest()
+        with self._lock:
+            self.stats['requests'] += 1
+            future = self._inflight.get(key)
+            if future is not None:
+                self.stats['coalesced'] += 1
+                metrics.inc('llm_coalesced_total', model=self.name)
+                return future
+            future = Future()
+            # A running future cannot be cancelled, so a caller that gives up never cancels the shared call
+            future.set_running_or_notify_cancel()
+            self._inflight[key] = future
+        submitted = time.monotonic()
+        deadline = submitted + (timeout or self.timeout)
+        self._workers.submit(contextvars.copy_context().run, self._run, key, prompt_text, submitted, deadline, future)
+        return future
+
+    def _run(self, key, prompt_text, submitted, deadline, future):
+        try:
+            result = self._call(prompt_text, submitted, deadline)
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+        else:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_result(result)
+
+    def _wait_for_limits(self, prompt_tokens, deadline):
+        reserved, delay = [], 0.0
+        for bucket, amount in ((self.requests, 1), (self.tokens, prompt_tokens)):
+            if bucket is not None:
+                delay = max(delay, bucket.reserve(amount))
+                reserved.append((bucket, amount))
+        if time.monotonic() + delay > deadline:
+            for bucket, amount in reserved:
+                bucket.refund(amount)
+            metrics.inc('llm_calls_total', model=self.name, outcome='deadline')
+            raise DeadlineExceeded(f"{self.name}: the rate limits would delay the call past its deadline")
+        if delay:
+            time.sleep(delay)
+
+    def _abandon(self, calls):
+        # Nobody waits for these any more, but they hold a call thread until they finish
+        with self._lock:
+            self._abandoned += len(calls)
+        for call in calls:
+            call.add_done_callback(self._release_abandoned)
+
+    def _release_abandoned(self, call):
+        with self._lock:
+            self._abandoned -= 1
+
+    def _reserve_now(self):
+        if self.requests is None:
+            return True
+        if self.requests.reserve(1) > 0:
+            self.requests.refund(1)
+            return False
+        return True
+
+    def _invoke(self, llm, hedge_llm, prompt_text, deadline):
+        # Returns (response, which model answered, model seconds)
+        start = time.monotonic()
+        primary = self._calls.submit(llm.invoke, prompt_text)
+        if llm is self.llm:
+            def record_latency(call):
+                # Recorded when it completes, so calls that lost to a hedge still count
+                if call.exception() is None:
+                    self.latencies.add(time.monotonic() - start)
+
+            primary.add_done_callback(record_latency)
+        pending = {primary}
+
+        threshold = self.latencies.percentile(self.hedge_percentile, self.hedge_min_samples) if hedge_llm else None
+        if threshold is not None:
+            done, _ = wait(pending, timeout=max(0.0, min(threshold, deadline - time.monotonic())))
+            # A hedge is an extra request, so it only goes out when the request limit has room right now
+            if not done and time.monotonic() < deadline and self._reserve_now():
+                self._count('hedged')
+                metrics.inc('llm_hedges_total', model=self.name)
+                pending.add(self._calls.submit(hedge_llm.invoke, prompt_text))
+
+        failed = []
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._abandon(pending)
+                raise DeadlineExceeded(f"{self.name}: no answer within the deadline")
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for call in done:
+                if call.exception() is None:
+                    self._abandon(pending)
+                    return call.result(), 'primary' if call is primary else 'hedge', time.monotonic() - start
+                failed.append(call)
+        raise failed[0].exception()
+
+    def _choose_models(self):
+        # Returns (model, hedge model, breaker permit)
+        permit = self.breaker.allow()
+        if permit:
+            return self.llm, self.fallback_llm, permit
+        if self.fallback_llm is None:
+            metrics.inc('llm_calls_total', model=self.name, outcome='circuit_open')
+            raise CircuitOpenError(f"{self.name}: too many recent failures, not calling the model")
+        # Degrade to the fallback model while the primary's circuit is open
+        return self.fallback_llm, None, None
+
+    def _call(self, prompt_text, submitted, deadline):
+        prompt_tokens = estimate_tokens(prompt_text)
+        queue_seconds = 0.0
+        waiting_since = submitted
+        for attempt in range(self.retries + 1):
+            llm, hedge_llm, permit = self._choose_models()
+            retry_delay = None
+            try:
+                self._wait_for_limits(prompt_tokens, deadline)
+                queue_seconds += time.monotonic() - waiting_since
+                try:
+                    response, winner, model_seconds = self._invoke(llm, hedge_llm, prompt_text, deadline)
+                except DeadlineExceeded:
+                    self.breaker.record(False)
+                    metrics.inc('llm_calls_total', model=self.name, outcome='deadline')
+                    raise
+                except Exception as e:
+                    rate_limited = is_rate_limited(e)
+                    # A 429 means slow down, not that the model is failing, so it does not trip the breaker
+                    if llm is self.llm and not rate_limited:
+                        self.breaker.record(False)
+                    if not rate_limited or attempt == self.retries:
+                        metrics.inc('llm_calls_total', model=self.name, outcome='error')
+                        raise
+                    self._count('rate_limited')
+                    metrics.inc('llm_rate_limited_total', model=self.name)
+                    if self.requests is not None:
+                        self.requests.drain()
+                    retry_delay = min(self.backoff * 2 ** attempt, 30)
+                    if time.monotonic() + retry_delay > deadline:
+                        metrics.inc('llm_calls_total', model=self.name, outcome='deadline')
+                        raise DeadlineExceeded(f"{self.name}: still rate limited at the deadline") from e
+                else:
+                    if llm is self.llm:
+                        self.breaker.record(True)
+            finally:
+                # Every exit releases the permit, so a trial without a verdict cannot wedge the breaker
+                self.breaker.release(permit)
+            if retry_delay is not None:
+                waiting_since = time.monotonic()
+                time.sleep(retry_delay)
+                continue
+
+            if self.tokens is not None:
+                self.tokens.reserve(estimate_tokens(_response_text(response)))
+            self._count(f'answered_by_{winner}' if llm is self.llm else 'answered_by_fallback')
+            metrics.inc('llm_calls_total', model=self.name, outcome='ok')
+            metrics.observe('llm_queue_seconds', queue_seconds, model=self.name)
+            metrics.observe('llm_model_seconds', model_seconds, model=self.name)
+            annotate(llm_queue_seconds=queue_seconds, llm_model_seconds=model_seconds, llm_winner=winner)
+            return response
+
+    def invoke(self, prompt_text, timeout=None):
+        return self._submit(prompt_text, timeout).result()
+
+    async def ainvoke(self, prompt_text, timeout=None):
+        return await asyncio.wrap_future(self._submit(prompt_text, timeout))
+
+    def stream(self, prompt_text, timeout=None):
+        # Streams are neither shared nor hedged; they go through the circuit breaker and the rate limits
+        llm, _, permit = self._choose_models()
+        try:
+            submitted = time.monotonic()
+            deadline = submitted + (timeout or self.timeout)
+            self._wait_for_limits(estimate_tokens(prompt_text), deadline)
+            metrics.observe('llm_queue_seconds', time.monotonic() - submitted, model=self.name)
+            start, completion_tokens = time.monotonic(), 0
+            try:
+                for chunk in llm.stream(prompt_text):
+                    if time.monotonic() > deadline:
+                        raise DeadlineExceeded(f"{self.name}: the stream ran past its deadline")
+                    completion_tokens += estimate_tokens(_response_text(chunk))
+                    yield chunk
+            except Exception as e:
+                if llm is self.llm and not is_rate_limited(e):
+                    self.breaker.record(False)
+                metrics.inc('llm_calls_total', model=self.name, outcome='error')
+                raise
+            if llm is self.llm:
+                self.breaker.record(True)
+            if self.tokens is not None:
+                self.tokens.reserve(completion_tokens)
+            metrics.inc('llm_calls_total', model=self.name, outcome='ok')
+            metrics.observe('llm_model_seconds', time.monotonic() - start, model=self.name)
+        finally:
+            # Also runs when the consumer closes the stream early (GeneratorExit)
+            self.breaker.release(permit)
+
+    def get_metrics(self):
+        with self._lock:
+            stats = {**self.stats, 'in_flight': len(self._inflight), 'abandoned_calls': self._abandoned}
+        return {**stats, 'circuit': self.breaker.state,
+                'p50_seconds': self.latencies.percentile(50, 1),
+                'hedge_threshold_seconds': self.latencies.percentile(self.hedge_percentile, self.hedge_min_samples)}
+
+    def close(self):
+        self._workers.shutdown(wait=False)
+        self._calls.shutdown(wait=False)
@@ -1,4 +1,4 @@
-retrieve_prompt = """
+retrieve_prompt_header = """
 Based on the following CV or experience provided by the user:
 {question}
 
@@ -10,10 +10,11 @@ If a perfect match is not found, recommend courses that are related or in a simi
 
 Please ensure all recommendations are translated to English before returning.
 
-Here are some examples:
-Example 1:
+"""
 
-Input: "I have experience in cyber security, AI, and cloud computing."
+# Few-shot examples, included in order as the token budget allows
+retrieve_prompt_examples = [
+    """Input: "I have experience in cyber security, AI, and cloud computing."
 
 Output: 
 {{
@@ -42,9 +43,8 @@ Output:
     ]
 }}
 
-Example 2:
-
-Input: "With a background in data science, machine learning, and bioinformatics."
+""",
+    """Input: "With a background in data science, machine learning, and bioinformatics."
 
 Output: 
 {{
@@ -73,9 +73,8 @@ Output:
     ]
 }}
 
-Example 3:
-
-Input: "I have studied environmental science, renewable energy, and sustainable agriculture."
+""",
+    """Input: "I have studied environmental science, renewable energy, and sustainable agriculture."
 
 Output: 
 {{
@@ -104,9 +103,8 @@ Output:
     ]
 }}
 
-Example 4:
-
-Input: "Experience in mechanical engineering, automotive design, and robotics."
+""",
+    """Input: "Experience in mechanical engineering, automotive design, and robotics."
 
 Output: 
 {{
@@ -135,9 +133,8 @@ Output:
     ]
 }}
 
-Example 5:
-
-Input: "Studied finance, business administration, and international trade."
+""",
+    """Input: "Studied finance, business administration, and international trade."
 
 Output: 
 {{
@@ -166,7 +163,10 @@ Output:
     ]
 }}
 
-Task: For each field or opportunity, recommend universities and their courses that match or are 
+""",
+]
+
+retrieve_prompt_task = """Task: For each field or opportunity, recommend universities and their courses that match or are 
 closely related to the user's interests and qualifications specified in their CV from the 
 following list of universities and courses:
 {context}
@@ -185,9 +185,22 @@ Response Format:
 Ensure all the schools and courses are translated to English language
 """
 
+
+def build_retrieve_prompt(examples=retrieve_prompt_examples):
+    if not examples:
+        return retrieve_prompt_header + retrieve_prompt_task
+    return (retrieve_prompt_header + "Here are some examples:\n"
+            + "".join(f"Example {i}:\n\n{example}" for i, example in enumerate(examples, 1))
+            + retrieve_prompt_task)
+
+
+retrieve_prompt = build_retrieve_prompt()
+
 load_prompt = """
         Translate the following universities and their courses into English. Specify whether each course is a 
-        Master's or a PhD program. Ensure all school names and their courses are translated completely:
+        Master's or a PhD program. Ensure all school names and their courses are translated completely.
+        Return each university with its "id" unchanged, and give each translated course its original,
+        untranslated title in "source", copied exactly:
 
         Universities and Courses:
         {universities_and_courses}
@@ -1,4 +1,3 @@
-from generate_cred_file import save_credentials_to_file, env_config
 from recommend import start_app
 
 
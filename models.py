@@ -18,5 +18,42 @@ class School(BaseModel):
     courses: Optional[list[CourseType]]
 
 
+class SearchFilter(BaseModel):
+    # Empty or missing lists do not filter
+    levels: Optional[List[ProgramEnum]] = None
+    schools: Optional[List[str]] = None
+
+
 class UserInput(BaseModel):
     cv: str
+    filter: Optional[SearchFilter] = None
+
+
+class TranslatedCourse(CourseType):
+    # The untranslated title, echoed back so each translation is matched to its source, not by position
+    source: str
+
+
+class TranslatedSchool(BaseModel):
+    id: int
+    school: str
+    courses: Optional[list[TranslatedCourse]]
+
+
+class SchoolBatch(BaseModel):
+    schools: List[TranslatedSchool]
+
+
+class RecommendedCourse(BaseModel):
+    name: str
+    level: ProgramEnum
+
+
+class Recommendation(BaseModel):
+    school: str
+    courses: List[RecommendedCourse]
+
+
+class RecommendationResponse(BaseModel):
+    recommendations: List[Recommendation]
+
@@ -0,0 +1,53 @@
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Its own module because subclassing Embeddings loads langchain_core (and with it langsmith and
+# requests); embedding_backends imports it only when an ONNX backend is created
+
+
+class OnnxEmbeddings(Embeddings):
+    """Mean-pooled sentence embeddings from an ONNX Runtime export, e.g. an int8-quantized model.
+
+    Needs the optional ``onnxruntime`` package.
+    """
+
+    def __init__(self, repo_id, file_name, batch_size=32, num_threads=None, max_length=256):
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise ImportError("The ONNX embedding backends need `pip install onnxruntime`") from e
+        from huggingface_hub import hf_hub_download
+        from tokenizers import Tokenizer
+
+        self.model_name = f"{repo_id}:{file_name}"
+        self.batch_size = batch_size
+        self.tokenizer = Tokenizer.from_pretrained(repo_id)
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(hf_hub_download(repo_id, file_name), options,
+                                                    providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def _embed(self, texts):
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + self.batch_size])
+            inputs = {
+                'input_ids': np.array([e.ids for e in encodings], dtype=np.int64),
+                'attention_mask': np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                'token_type_ids': np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            token_embeddings = self.session.run(None, {k: v for k, v in inputs.items() if k in self.input_names})[0]
+            mask = inputs['attention_mask'][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            vectors.append(pooled / np.linalg.norm(pooled, axis=1, keepdims=True))
+        return np.vstack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+
+    def embed_documents(self, texts):
+        return self._embed(list(texts)).tolist()
+
+    def embed_query(self, text):
+        return self._embed([text])[0].tolist()
@@ -0,0 +1,203 @@
+import json
+import os
+import queue
+import statistics
+import threading
+import time
+
+from models import School
+
+_DONE = object()
+
+
+class PipelineJournal:
+    """Append-only JSONL checkpoint of every school that finished a stage.
+
+    A rerun with the same journal skips schools that were already scraped, translated or
+    persisted and resumes each one at the stage where it stopped. Once a run completes,
+    ``complete`` moves the journal aside so the next run scrapes everything again.
+    """
+
+    def __init__(self, path="pipeline_journal.jsonl"):
+        self.path = path
+        self._lock = threading.Lock()
+        self.scraped = {}
+        self.translated = {}
+        self.persisted = set()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        self._apply(json.loads(line))
+
+    def _apply(self, record):
+        if record['stage'] == 'scraped':
+            self.scraped[record['school']] = record['data']
+        elif record['stage'] == 'translated':
+            self.translated[record['school']] = School.model_validate(record['data'])
+        elif record['stage'] == 'persisted':
+            self.persisted.add(record['school'])
+
+    def record(self, stage, school, data=None):
+        record = {'stage': stage, 'school': school, 'data': data, 'at': time.time()}
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if stage != 'failed':
+                self._apply(record)
+
+    def complete(self):
+        # Kept as <path>.last for inspection until the next completed run replaces it
+        with self._lock:
+            if os.path.exists(self.path):
+                os.replace(self.path, f"{self.path}.last")
+            self.scraped, self.translated, self.persisted = {}, {}, set()
+
+    def pending_translation(self):
+        return [data for school, data in self.scraped.items()
+                if school not in self.translated and school not in self.persisted]
+
+    def pending_persistence(self):
+        return [(school, data) for school, data in self.translated.items() if school not in self.persisted]
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.failures = 0
+        self.latencies = []
+
+    def observe(self, items, seconds):
+        self.items += items
+        self.latencies.append(seconds)
+
+    def summary(self):
+        busy = sum(self.latencies)
+        return {
+            'stage': self.name,
+            'items': self.items,
+            'failures': self.failures,
+            'busy_seconds': busy,
+            'items_per_second': self.items / busy if busy else 0.0,
+            'p50_seconds': statistics.median(self.latencies) if self.latencies else 0.0,
+            'max_seconds': max(self.latencies, default=0.0),
+        }
+
+
+def _take_batch(source_queue, batch_size):
+    # Block for the first item, then take whatever else is already waiting
+    batch = [source_queue.get()]
+    while len(batch) < batch_size and batch[-1] is not _DONE:
+        try:
+            batch.append(source_queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+def run_pipeline(scrape_iter, translate, persist, journal, queue_size=16, batch_size=5):
+    """Stream schools through scrape → translate → persist, each stage in its own thread.
+
+    ``scrape_iter(skip)`` yields scraped ``{'school', 'courses'}`` records, ``translate(records)``
+    returns ``(schools, report)`` like ``BatchTranslator.translate`` and ``persist(schools)``
+    writes them. Stages are connected by bounded queues so memory stays flat. The report lists
+    stage ``errors`` and the schools that ``failed`` to translate.
+    """
+    translate_queue = queue.Queue(maxsize=queue_size)
+    persist_queue = queue.Queue(maxsize=queue_size)
+    stats = {name: StageStats(name) for name in ('scrape', 'translate', 'persist')}
+    errors = []
+    # Schools the translator gave up on; they stay pending in the journal
+    failures = []
+    stop = threading.Event()
+    # Taken before any stage starts, or the scrape thread's fresh journal records would be processed twice
+    skip = set(journal.scraped) | journal.persisted
+    translate_backlog = journal.pending_translation()
+    persist_backlog = journal.pending_persistence()
+
+    def scrape_stage():
+        try:
+            iterator = iter(scrape_iter(skip))
+            while not stop.is_set():
+                start = time.perf_counter()
+                data = next(iterator, None)
+                if data is None:
+                    break
+                stats['scrape'].observe(1, time.perf_counter() - start)
+                journal.record('scraped', data['school'], data)
+                translate_queue.put(data)
+        except Exception as e:
+            errors.append(('scrape', e))
+            stop.set()
+        finally:
+            translate_queue.put(_DONE)
+
+    def translate_stage():
+        backlog = translate_backlog
+        done = False
+        while not done:
+            if backlog:
+                batch, backlog = backlog[:batch_size], backlog[batch_size:]
+            else:
+                batch = _take_batch(translate_queue, batch_size)
+                done = batch[-1] is _DONE
+                batch = [data for data in batch if data is not _DONE]
+            if not batch or stop.is_set():
+                continue
+            try:
+                start = time.perf_counter()
+                schools, report = translate(batch)
+                stats['translate'].observe(len(schools), time.perf_counter() - start)
+                failed = {failure['school'] for failure in report['failed']}
+                stats['translate'].failures += len(failed)
+                failures.extend(report['failed'])
+                for failure in report['failed']:
+                    journal.record('failed', failure['school'], failure['error'])
+                # Translated schools come back in input order, minus the failures
+                for data, school in zip([data for data in batch if data['school'] not in failed], schools):
+                    journal.record('translated', data['school'], school.model_dump(mode='json'))
+                    persist_queue.put((data['school'], school))
+            except Exception as e:
+                errors.append(('translate', e))
+                stop.set()
+        persist_queue.put(_DONE)
+
+    def persist_stage():
+        backlog = persist_backlog
+        done = False
+        while not done:
+            if backlog:
+                batch, backlog = backlog[:batch_size], backlog[batch_size:]
+            else:
+                batch = _take_batch(persist_queue, batch_size)
+                done = batch[-1] is _DONE
+                batch = [item for item in batch if item is not _DONE]
+            if not batch or stop.is_set():
+                continue
+            try:
+                start = time.perf_counter()
+                persist([school for _, school in batch])
+                stats['persist'].observe(len(batch), time.perf_counter() - start)
+                for source_name, _ in batch:
+                    journal.record('persisted', source_name)
+            except Exception as e:
+                errors.append(('persist', e))
+                stop.set()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=stage, name=f'pipeline-{stage.__name__}')
+               for stage in (scrape_stage, translate_stage, persist_stage)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    report = {
+        'elapsed_seconds': time.perf_counter() - start,
+        'stages': [stage.summary() for stage in stats.values()],
+        'errors': [f"{stage}: {type(e).__name__}: {e}" for stage, e in errors],
+        'failed': failures,
+    }
+    # Completed work is already in the journal, so after an error a rerun resumes where it stopped
+    return report
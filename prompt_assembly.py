@@ -0,0 +1,143 @@
+import functools
+import re
+import threading
+
+from configs.env_config import EnvironmentConfig
+from llm_prompts import build_retrieve_prompt, retrieve_prompt_examples
+
+env_config = EnvironmentConfig(".env")
+DEFAULT_TOKENIZER = "cl100k_base"
+
+
+class ApproxTokenizer:
+    """Offline stand-in for a tiktoken encoding (``TOKENIZER=approx``).
+
+    Counts a token per punctuation mark and per run of up to four word characters, which is close
+    to what a BPE vocabulary gives for English text, without downloading the BPE file.
+    """
+
+    _pattern = re.compile(r"\w{1,4}|[^\w\s]")
+
+    def encode(self, text, disallowed_special=()):
+        return self._pattern.findall(text)
+
+
+def get_tokenizer(encoding_name=None):
+    # TOKENIZER is a tiktoken encoding, or "approx" for ApproxTokenizer where tiktoken cannot
+    # download its BPE file. Read on each call, after .env is loaded, rather than at import
+    return _load_tokenizer(encoding_name or env_config.get_env_variable('TOKENIZER') or DEFAULT_TOKENIZER)
+
+
+@functools.lru_cache(maxsize=None)
+def _load_tokenizer(encoding_name):
+    # Gemini's tokenizer is only reachable through an API call, so budget with a local BPE as an estimate.
+    # Imported here so startup does not pay for tiktoken before the first prompt
+    if encoding_name == 'approx':
+        return ApproxTokenizer()
+    import tiktoken
+    return tiktoken.get_encoding(encoding_name)
+
+
+def count_tokens(text):
+    return len(get_tokenizer().encode(text, disallowed_special=()))
+
+
+def format_context(hits, compact=True):
+    """Render retrieved (document, score) hits for the {context} slot.
+
+    The compact format names each school once and lists its courses after it.
+    """
+    if not compact:
+        return "\n".join(
+            f"{doc.metadata['school']}: {doc.metadata['course']} ({doc.metadata['level']})" for doc, _ in hits
+        )
+    schools = {}
+    for doc, _ in hits:
+        schools.setdefault(doc.metadata['school'], []).append(f"{doc.metadata['course']} ({doc.metadata['level']})")
+    return "\n".join(f"{school}: {'; '.join(courses)}" for school, courses in schools.items())
+
+
+def assemble_prompt(question, hits, token_budget=2000, min_examples=1, max_examples=len(retrieve_prompt_examples),
+                    compact=True, presorted=False):
+    """Build the recommendation prompt within ``token_budget`` tokens.
+
+    ``min_examples`` few-shot examples are always kept, then the retrieved courses are packed in
+    order of relevance (or in the given order when ``presorted``), then further examples use
+    whatever budget is left.
+    """
+    if not presorted:
+        hits = sorted(hits, key=lambda hit: hit[1], reverse=True)
+    examples = list(retrieve_prompt_examples[:min_examples])
+
+    def render(selected_hits, selected_examples):
+        return build_retrieve_prompt(selected_examples).format(
+            question=question, context=format_context(selected_hits, compact))
+
+    # Per-course cost estimates let us pack greedily without re-tokenizing the whole prompt each time
+    used = count_tokens(render([], examples))
+    seen_schools = set()
+    included = []
+    for doc, score in hits:
+        school = doc.metadata['school']
+        cost = count_tokens(f"{doc.metadata['course']} ({doc.metadata['level']}); ")
+        if not compact or school not in seen_schools:
+            cost += count_tokens(f"{school}: \n")
+        if used + cost > token_budget:
+            continue
+        used += cost
+        seen_schools.add(school)
+        included.append((doc, score))
+
+    for example in retrieve_prompt_examples[len(examples):max_examples]:
+        cost = count_tokens(f"Example {len(examples) + 1}:\n\n{example}")
+        if used + cost > token_budget:
+            break
+        used += cost
+        examples.append(example)
+
+    prompt_text = render(included, examples)
+    return prompt_text, {
+        'prompt_tokens': count_tokens(prompt_text),
+        'token_budget': token_budget,
+        'examples': len(examples),
+        'courses_included': len(included),
+        'courses_dropped': len(hits) - len(included),
+        'hits': included,
+    }
+
+
+class TokenMeter:
+    """Running prompt/completion token totals across LLM calls."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def record(self, prompt_tokens, completion_tokens):
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+
+    def get_metrics(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'prompt_tokens': self.prompt_tokens,
+                'completion_tokens': self.completion_tokens,
+                'avg_prompt_tokens': self.prompt_tokens / self.calls if self.calls else 0.0,
+                'avg_completion_tokens': self.completion_tokens / self.calls if self.calls else 0.0,
+            }
+
+
+token_meter = TokenMeter()
+
+
+def usage_tokens(message, prompt_text, completion_text):
+    # Prefer the provider's own counts when the message carries them
+    usage = getattr(message, 'usage_metadata', None) if message is not None else None
+    if usage:
+        return usage['input_tokens'], usage['output_tokens']
+    return count_tokens(prompt_text), count_tokens(completion_text)
@@ -1,52 +1,72 @@
-import json
+import asyncio
+import contextvars
+import functools
+import time
 
-import tiktoken
-import streamlit as st
+import numpy as np
 from pydantic import BaseModel, ValidationError
-from langchain_core.prompts import PromptTemplate
-from langchain.chains.retrieval_qa.base import RetrievalQA
-from langchain_community.vectorstores import FAISS
 
 from configs.env_config import EnvironmentConfig
 # from configs.firebase import FirebaseService
 from configs.google_generative_ai import GoogleGenerativeAIService
-from llm_prompts import retrieve_prompt
-from models import UserInput
+from configs.resources import resource_registry
+from catalog_snapshot import DEFAULT_SNAPSHOT_PATH, load_catalog
+from embedding_backends import DEFAULT_EMBEDDING_BACKEND, embed_queries
+from embedding_cache import EmbeddingCache
+from field_retrieval import retrieve_by_field, split_fields
+from index_store import FORMAT_VERSION, IndexStore, build_store, filter_key, has_store, search_index
+from hybrid_search import get_ranker, is_keyword_query, recommendations_json
+from models import ProgramEnum, RecommendationResponse, SearchFilter, UserInput
+from prompt_assembly import assemble_prompt, token_meter, usage_tokens
+from recommendation_stream import RecommendationStreamParser, parse_recommendations
+from telemetry import TOKEN_BUCKETS, annotate, log_event, metrics, span, trace
+from vector_index import read_index_meta
 
 # Load environment variables
 env_config = EnvironmentConfig(".env")
 
+# Total prompt size in tokens: few-shot examples plus retrieved courses
+PROMPT_TOKEN_BUDGET = int(env_config.get_env_variable('PROMPT_TOKEN_BUDGET') or 2000)
+
+# Lowest relevance score (0 to 1) a retrieved course needs. The offline hash backend shares few
+# dimensions between related texts, so its scores sit far below a real model's
+SCORE_THRESHOLD = float(env_config.get_env_variable('RETRIEVAL_SCORE_THRESHOLD') or 0.7)
+
+# Neighbours fetched per searched vector before thresholding and per-field quotas
+RETRIEVAL_FETCH_K = 30
+
+# Answer short keyword queries from the local ranking instead of the LLM
+FAST_PATH_ENABLED = (env_config.get_env_variable('FAST_PATH') or 'true').lower() != 'false'
+
+# Split CVs that list several fields into one search per field
+MULTI_FIELD_RETRIEVAL = (env_config.get_env_variable('MULTI_FIELD_RETRIEVAL') or 'true').lower() != 'false'
+
+
+# Cache of LLM answers keyed on exact and near-duplicate queries. Opened on first use, so importing
+# this module does not create the SQLite file in the working directory
+def get_response_cache():
+    return resource_registry.get_response_cache(
+        env_config.get_env_variable('RESPONSE_CACHE_PATH') or "response_cache.sqlite3",
+        float(env_config.get_env_variable('RESPONSE_CACHE_THRESHOLD') or 0.95),
+    )
+
 
 # Initialize Firebase service
 # firebase_service = FirebaseService(env_config.get_env_variable('CREDENTIALS_JSON_PATH'))
 
 
-# Fetch all data from Firebase
-@st.cache_data
-# def load_data_from_db():
-#     try:
-#         db = firebase_service.get_firestore_client()
-#         universities_ref = db.collection('universities')
-#         university_with_courses = {}
-#
-#         for university_doc in universities_ref.stream():
-#             university_data = university_doc.to_dict()
-#             university_name = university_data['name']
-#
-#             courses_ref = university_doc.reference.collection('courses')
-#             courses = []
-#             for course_doc in courses_ref.stream():
-#                 course_data = course_doc.to_dict()
-#                 courses.append(course_data)
-#
-#             university_with_courses[university_name] = courses
-#
-#         return university_with_courses
-#     except Exception as e:
-#         print("Error:", e)  # Debug statement
-#         return None
-
-# Generate documents for vector database
+# Load all schools and courses from the local catalog snapshot exported by catalog_snapshot.export_snapshot,
+# so serving never walks Firestore
+def load_data_from_db(snapshot_path=DEFAULT_SNAPSHOT_PATH):
+    try:
+        return load_catalog(snapshot_path)
+    except Exception as e:
+        log_event('catalog_load_failed', path=snapshot_path, error=repr(e))
+        return None
+
+
+# Generate documents for vector database. Not st.cache_data: it only runs while (re)building the index,
+# and load_catalog already caches the catalog until the snapshot changes
 def generate_documents(universities_and_courses):
     documents = []
     texts_to_embed = []
@@ -65,98 +85,362 @@ def generate_documents(universities_and_courses):
     return documents, texts_to_embed
 
 
-# Create vector database with FAISS
-def create_vector_db(documents, texts_to_embed, file_path="faiss_index"):
-    service = GoogleGenerativeAIService(env_config)
-    huggingface_embeddings = service.get_huggingface_embeddings()
+def _document_key(text, metadata):
+    return text, tuple(sorted(metadata.items()))
+
+
+# Create the vector database as a new version in the pickle-free index store (see index_store)
+def create_vector_db(documents, texts_to_embed, file_path="faiss_index", incremental=True, index_type=None):
+    # flat, hnsw, ivfpq, sq8 or fp16; see vector_index.INDEX_TYPES
+    index_type = index_type or env_config.get_env_variable('INDEX_TYPE') or 'flat'
+    # Building only needs the embedding model, not the LLM client
+    embedding_backend = env_config.get_env_variable('EMBEDDING_BACKEND') or DEFAULT_EMBEDDING_BACKEND
+    huggingface_embeddings = resource_registry.get_embeddings(embedding_backend)
+    embedding_cache = EmbeddingCache(huggingface_embeddings)
+
+    # One entry per distinct document, in catalog order
+    wanted = {}
+    for text, doc in zip(texts_to_embed, documents):
+        wanted.setdefault(_document_key(text, doc['metadata']), (text, doc['metadata']))
+    if not wanted:
+        print("No documents to index")
+        return
+
+    # Vectors of documents already in the stored index are reused; only new documents are embedded
+    store, existing = None, {}
+    meta = read_index_meta(file_path)
+    if (incremental and has_store(file_path) and meta.get('format') == FORMAT_VERSION
+            and meta.get('embedding_backend') == embedding_backend):
+        store = IndexStore(file_path)
+        existing = {_document_key(store.text(row), store.metadata(row)): row for row in range(len(store))}
+        added = sum(key not in existing for key in wanted)
+        removed = sum(key not in wanted for key in existing)
+        print(f"Index diff: {added} added, {removed} removed")
+        if not added and not removed and meta.get('requested_type') == index_type:
+            # Leave the files untouched so the index version and cached responses stay valid
+            print('DONE')
+            return
 
-    vectordb = FAISS.from_texts(texts=texts_to_embed, embedding=huggingface_embeddings,
-                                metadatas=[doc['metadata'] for doc in documents])
-    vectordb.save_local(file_path)
+    fresh = [row for row, key in enumerate(wanted) if key not in existing]
+    fresh_vectors = embedding_cache.embed_documents([entry[0] for key, entry in wanted.items()
+                                                     if key not in existing]) if fresh else None
+    dim = store.manifest['dim'] if store is not None else fresh_vectors.shape[1]
+    vectors = np.empty((len(wanted), dim), dtype=np.float32)
+    kept = [(row, existing[key]) for row, key in enumerate(wanted) if key in existing]
+    if kept:
+        vectors[[row for row, _ in kept]] = store.vectors[[old_row for _, old_row in kept]]
+    if fresh:
+        vectors[fresh] = fresh_vectors
+
+    embedding_cache.save()
+    print(f"Embedding cache: {embedding_cache.hits} hits, {embedding_cache.misses} misses")
+    manifest = build_store(file_path, [text for text, _ in wanted.values()],
+                           [metadata for _, metadata in wanted.values()], vectors, index_type,
+                           embedding_backend=embedding_backend)
+    print(f"Index version {manifest['version']}: {manifest['count']} documents, {manifest['index_type']}")
     print('DONE')
 
 
-# Recommend courses based on CV using vector database
-def recommend_courses_from_vector(cv_text, llm_service):
-    # Load HuggingFace embeddings
-    service = GoogleGenerativeAIService(env_config)
-    huggingface_embeddings = service.get_huggingface_embeddings()
+# Rebuild the vector database from the catalog snapshot
+def build_index_from_snapshot(snapshot_path=DEFAULT_SNAPSHOT_PATH, file_path="faiss_index"):
+    documents, texts_to_embed = generate_documents(load_catalog(snapshot_path))
+    create_vector_db(documents, texts_to_embed, file_path)
+
+
+# Embed the query once and search FAISS once, returning (document, relevance score) pairs
+def retrieve_courses(cv_text, vectordb, k=10, fetch_k=30, score_threshold=0.7, query_embedding=None,
+                     docs_and_distances=None, search_filter=None):
+    if docs_and_distances is None:
+        if query_embedding is None:
+            query_embedding = vectordb.embeddings.embed_query(cv_text)
+        # Over-fetch so the threshold can drop weak hits and still leave up to k results
+        if filter_key(search_filter):
+            docs_and_distances = search_batch(vectordb, [query_embedding], fetch_k, search_filter)[0]
+        else:
+            docs_and_distances = vectordb.similarity_search_with_score_by_vector(query_embedding, k=fetch_k)
+
+    # Convert raw L2 distances into [0, 1] relevance scores so the threshold is meaningful
+    relevance_score_fn = vectordb._select_relevance_score_fn()
+    hits = [(doc, relevance_score_fn(distance)) for doc, distance in docs_and_distances]
+    hits = [(doc, score) for doc, score in hits if score >= score_threshold]
+    hits.sort(key=lambda hit: hit[1], reverse=True)
+    return hits[:k]
+
+
+# Texts to embed for a query: the whole CV, plus its field phrases when it lists several fields
+def query_texts(cv_text):
+    fields = split_fields(cv_text) if MULTI_FIELD_RETRIEVAL else []
+    return [cv_text] + fields if len(fields) > 1 else [cv_text]
+
+
+# Rows of vectors for query_texts(cv_text) that retrieval searches: the field phrases when the CV
+# lists several fields, otherwise the whole CV
+def searched_vectors(vectors):
+    return vectors[1:] if len(vectors) > 1 else vectors[:1]
+
+
+# Turn raw FAISS results into (document, L2 distance) pairs per query, skipping empty slots
+def documents_for(vectordb, distances, positions):
+    return [
+        [(vectordb.docstore.search(vectordb.index_to_docstore_id[int(position)]), float(distance))
+         for distance, position in zip(row_distances, row_positions) if position != -1]
+        for row_distances, row_positions in zip(distances, positions)
+    ]
+
+
+# Search FAISS once for several query vectors, returning (document, L2 distance) pairs per query.
+# A search_filter (models.SearchFilter) restricts the search to the matching level/school partitions
+def search_batch(vectordb, query_vectors, fetch_k=30, search_filter=None):
+    return documents_for(vectordb, *search_index(vectordb, query_vectors, fetch_k, search_filter))
 
-    # Load the vector database
-    vectordb = FAISS.load_local('faiss_index', huggingface_embeddings, allow_dangerous_deserialization=True)
 
-    # Create a retriever for querying the vector database
-    retriever = vectordb.as_retriever(score_threshold=0.7, search_kwargs={"k": 10, "fetch_k": 30})
+# Embed, check the response cache and retrieve; returns a ready answer (cached or fast path)
+# or everything the LLM step needs. Callers that batch several queries (see api.py) pass the
+# vectors for query_texts(cv_text) and the raw (distances, positions) of searching
+# searched_vectors(vectors) for RETRIEVAL_FETCH_K neighbours.
+def prepare_recommendation(cv_text, llm_service, vectors=None, search_results=None, search_filter=None):
+    # Shared vector database, reloaded only when faiss_index/ changes on disk
+    with span('load_index'):
+        vectordb = llm_service.get_vector_db('faiss_index')
     # similar = vectordb.similarity_search('Chemistry', fetch_k=30, k=15)
 
-    # Retrieve relevant documents based on the CV text
-    retrieved_docs = retriever.invoke(cv_text)
-    # Format the retrieved data for the prompt
-    universities_and_courses = "\n".join(
-        [f"{doc.metadata['school']}: {doc.metadata['course']} ({doc.metadata['level']})" for doc in retrieved_docs]
-    )
+    # The query embedding is shared by the response cache and the FAISS search. A CV listing several
+    # fields is embedded together with its field phrases in one batched forward pass.
+    texts = query_texts(cv_text)
+    fields = texts[1:]
+    if vectors is None:
+        with span('embed'):
+            vectors = (embed_queries(vectordb.embeddings, texts) if fields
+                       else [vectordb.embeddings.embed_query(cv_text)])
+    query_embedding, field_embeddings = vectors[0], vectors[1:]
+    index_version = resource_registry.get_index_version('faiss_index')
+    # Answers for a filtered search are only reused for the same filter
+    filter_text = filter_key(search_filter)
+    cache_scope = f"{index_version}|{filter_text}" if filter_text else index_version
+    if filter_text:
+        annotate(filter=filter_text)
+    with span('cache_lookup'):
+        cached = get_response_cache().get(cv_text, query_embedding, cache_scope)
+    if cached is not None:
+        metrics.inc('response_cache_hits_total', kind=cached['cache'])
+        annotate(cache=cached['cache'])
+        return {"question": cv_text, **cached}, None
+    metrics.inc('response_cache_misses_total')
 
-    # Define the prompt template
-    prompt_text = retrieve_prompt.format(question=cv_text, context=universities_and_courses)
+    # Retrieve relevant documents based on the CV text; the prompt budget decides how many of
+    # the best hits actually go to the LLM
+    field_labels = {}
+    with span('retrieve'):
+        if fields:
+            labeled_hits = retrieve_by_field(vectordb, fields, field_embeddings, score_threshold=SCORE_THRESHOLD,
+                                             search_filter=search_filter, search_results=search_results)
+            hits = [(doc, score) for doc, score, _ in labeled_hits]
+            field_labels = {id(doc): field for doc, _, field in labeled_hits}
+        else:
+            docs_and_distances = documents_for(vectordb, *search_results)[0] if search_results is not None else None
+            hits = retrieve_courses(cv_text, vectordb, k=30, fetch_k=RETRIEVAL_FETCH_K,
+                                    score_threshold=SCORE_THRESHOLD, query_embedding=query_embedding,
+                                    docs_and_distances=docs_and_distances, search_filter=search_filter)
 
-    # Get LLM instance from the service
-    llm_instance = llm_service.get_llm_instance()
-    # Define the prompt for the LLM chain
-    prompt = PromptTemplate(
-        input_variables=["question", "universities_and_courses"],
-        template=retrieve_prompt
-    )
-    # FewShotPromptTemplate()
-    # Create the RetrievalQA chain
-    chain = RetrievalQA.from_chain_type(llm=llm_instance,
-                                        chain_type="stuff",  # map_reduce makes more calls but map_rerank is not bad
-                                        retriever=retriever,
-                                        input_key="question",
-                                        return_source_documents=True,
-                                        chain_type_kwargs={"prompt": prompt})
-    resp = chain.invoke({"question": cv_text, "universities_and_courses": universities_and_courses})
-    print(resp)
-    # Print token count (assuming `tiktoken` usage)
-    tokenizer = tiktoken.get_encoding("p50k_base")
-    tokens = tokenizer.encode(prompt_text)
-    token_count = len(tokens)
-    print(f"Token count: {token_count}")
+    # Short keyword queries are answered straight from the hybrid BM25 + vector ranking
+    if FAST_PATH_ENABLED and is_keyword_query(cv_text):
+        with span('fast_path'):
+            ranked = get_ranker(vectordb, index_version).rank(cv_text, hits, query_embedding,
+                                                              search_filter=search_filter)
+        if ranked:
+            metrics.inc('fast_path_answers_total')
+            annotate(fast_path=True, retrieved=len(ranked))
+            return {
+                "question": cv_text,
+                "result": recommendations_json(ranked),
+                "source_documents": [doc for doc, _ in ranked],
+                "retrieved": [{**doc.metadata, "score": float(score), "field": field_labels.get(id(doc))}
+                              for doc, score in ranked],
+                "fast_path": True,
+            }, None
+
+    # Field hits are already interleaved across fields, so keep that order when packing the budget
+    with span('assemble_prompt'):
+        prompt_text, prompt_stats = assemble_prompt(cv_text, hits, token_budget=PROMPT_TOKEN_BUDGET,
+                                                    presorted=bool(field_labels))
+    hits = prompt_stats.pop('hits')
+    annotate(cache='miss', fields=len(fields), prompt=prompt_stats)
+    return None, {"query_embedding": query_embedding, "cache_scope": cache_scope, "hits": hits,
+                  "field_labels": field_labels, "prompt_text": prompt_text}
+
+
+def finish_recommendation(cv_text, request, result, llm_seconds, message=None):
+    hits = request["hits"]
+    prompt_tokens, completion_tokens = usage_tokens(message, request["prompt_text"], result)
+    token_meter.record(prompt_tokens, completion_tokens)
+    metrics.observe('prompt_tokens', prompt_tokens, buckets=TOKEN_BUCKETS)
+    metrics.observe('completion_tokens', completion_tokens, buckets=TOKEN_BUCKETS)
+    resp = {
+        "question": cv_text,
+        "result": result,
+        "source_documents": [doc for doc, _ in hits],
+        # Retrieved courses, their relevance scores and the CV field that found them, kept for auditing
+        "retrieved": [{**doc.metadata, "score": float(score), "field": request["field_labels"].get(id(doc))}
+                      for doc, score in hits],
+        "tokens": {"prompt": prompt_tokens, "completion": completion_tokens},
+    }
+    # Only complete, valid answers are cached; a truncated or malformed one would otherwise be served to
+    # every near-duplicate query for the cache's whole lifetime
+    parser = RecommendationStreamParser()
+    if parser.feed(result) and parser.finished and not parser.invalid:
+        with span('cache_store'):
+            get_response_cache().put(cv_text, request["query_embedding"], request["cache_scope"],
+                               {"result": resp["result"], "retrieved": resp["retrieved"]})
+    else:
+        metrics.inc('response_cache_rejected_total')
+    annotate(llm_seconds=llm_seconds, tokens=resp["tokens"], retrieved=len(hits))
     return resp
 
 
-# Streamlit app
+# Recommend courses based on CV using vector database
+def recommend_courses_from_vector(cv_text, llm_service, search_filter=None):
+    with trace('recommend'):
+        cached, request = prepare_recommendation(cv_text, llm_service, search_filter=search_filter)
+        if cached is not None:
+            return cached
+
+        # Get LLM instance from the service
+        llm_instance = llm_service.get_llm_instance()
+        start = time.perf_counter()
+        with span('llm'):
+            response = llm_instance.invoke(request["prompt_text"])
+        return finish_recommendation(cv_text, request, response.content, time.perf_counter() - start, response)
+
+
+# Async variant for the HTTP API: CPU work runs in the given executor, the LLM call does not block
+async def arecommend_courses_from_vector(cv_text, llm_service, executor, vectors=None, search_results=None,
+                                         search_filter=None):
+    loop = asyncio.get_running_loop()
+    with trace('recommend'):
+        # Run in a copy of this context so spans from the worker thread join the request's trace
+        cached, request = await loop.run_in_executor(executor, contextvars.copy_context().run, functools.partial(
+            prepare_recommendation, cv_text, llm_service, vectors, search_results, search_filter
+        ))
+        if cached is not None:
+            return cached
+
+        start = time.perf_counter()
+        with span('llm'):
+            response = await llm_service.get_llm_instance().ainvoke(request["prompt_text"])
+        return await loop.run_in_executor(executor, contextvars.copy_context().run, functools.partial(
+            finish_recommendation, cv_text, request, response.content, time.perf_counter() - start, response
+        ))
+
+
+# Yield each recommended school as soon as the LLM has finished generating it
+def stream_recommendations(cv_text, llm_service, search_filter=None):
+    with trace('recommend', streamed=True):
+        cached, request = prepare_recommendation(cv_text, llm_service, search_filter=search_filter)
+        if cached is not None:
+            yield from parse_recommendations(cached["result"])
+            return
+
+        parser = RecommendationStreamParser()
+        start = time.perf_counter()
+        first_school_seconds = None
+        for chunk in llm_service.get_llm_instance().stream(request["prompt_text"]):
+            for recommendation in parser.feed(chunk.content):
+                if first_school_seconds is None:
+                    first_school_seconds = time.perf_counter() - start
+                    metrics.observe('first_school_seconds', first_school_seconds)
+                    annotate(first_school_seconds=first_school_seconds)
+                yield recommendation
+        metrics.observe('stage_seconds', time.perf_counter() - start, stage='llm')
+        if parser.invalid:
+            metrics.inc('parse_failures_total', value=parser.invalid, stage='recommendation')
+            annotate(invalid_entries=parser.invalid)
+        finish_recommendation(cv_text, request, parser.text, time.perf_counter() - start)
+
+
+# Thin-client mode: let the HTTP API (api.py) do the work and only render its answer
+def fetch_recommendations_from_api(cv_text, api_url, search_filter=None):
+    import requests
+    payload = UserInput(cv=cv_text, filter=search_filter).model_dump(mode='json')
+    response = requests.post(f"{api_url.rstrip('/')}/recommend", json=payload, timeout=120)
+    response.raise_for_status()
+    return RecommendationResponse.model_validate(response.json()).recommendations
+
+
+# Universities offered in the filter: from the API in thin-client mode, otherwise from the loaded index
+# store's partition metadata, as the API's /schools does
+def list_schools(api_url=None):
+    if api_url:
+        import requests
+        response = requests.get(f"{api_url.rstrip('/')}/schools", timeout=30)
+        response.raise_for_status()
+        return response.json()["schools"]
+    backend = env_config.get_env_variable('EMBEDDING_BACKEND') or DEFAULT_EMBEDDING_BACKEND
+    vectordb = resource_registry.get_vector_db(resource_registry.get_embeddings(backend), 'faiss_index', backend)
+    store = getattr(vectordb, 'store', None)
+    if store is not None:
+        return store.schools()
+    # A legacy index has no partitions, so read the schools off its documents
+    return sorted({doc.metadata['school'] for doc in vectordb.docstore._dict.values()})
+
+
+def render_recommendation(recommendation):
+    import streamlit as st
+    st.write(f"**University:** {recommendation.school}")
+    st.write("**Courses:**")
+    for course in recommendation.courses:
+        st.write(f"- {course.name} ({course.level.value})")
+
+
+# Streamlit app. Streamlit is only imported here, so the API, benchmarks and index builds never load it
 def start_app():
+    import streamlit as st
+
+    if (env_config.get_env_variable('WARM_UP_RESOURCES') or 'true').lower() != 'false':
+        # Load the model, index and LLM client in the background while the page renders
+        backend = env_config.get_env_variable('EMBEDDING_BACKEND') or DEFAULT_EMBEDDING_BACKEND
+        resource_registry.warm_up(env_config.get_env_variable('GEMINI_API_KEY'), backend=backend)
+
     st.title("University and Course Recommendation")
     st.write("Please enter your CV or experience details to get recommendations for universities and courses.")
 
     cv_input = st.text_area("Enter the field you are interested in")
+    api_url = env_config.get_env_variable('RECOMMENDATION_API_URL')
+    # Leaving a filter empty searches every level or university
+    levels = st.multiselect("Levels", [level.value for level in ProgramEnum])
+
+    # Reruns reuse the list until the local index is rebuilt; the API's list is refreshed every few minutes
+    @st.cache_data(ttl=300, show_spinner=False)
+    def cached_schools(api_url, index_version):
+        return list_schools(api_url)
+
+    index_version = None if api_url else resource_registry.get_index_version('faiss_index')
+    schools = st.multiselect("Universities", cached_schools(api_url, index_version))
 
     if st.button("Get Recommendations"):
 
         try:
             # Validate user input
-            user_input = UserInput(cv=cv_input)
-
-            # Initialize LLM service
-            llm_service = GoogleGenerativeAIService(env_config)
-
-            # Get recommendations
-            recommendations = recommend_courses_from_vector(user_input.cv, llm_service)
-            res = recommendations.get('result')
-            # Parse and display recommendations
-            try:
-                recommendations_json = json.loads(res)
-                for rec in recommendations_json["recommendations"]:
-                    st.write(f"**University:** {rec['school']}")
-                    st.write("**Courses:**")
-                    for course in rec["courses"]:
-                        st.write(f"- {course['name']} ({course['level']})")
-            except json.JSONDecodeError as e:
+            user_input = UserInput(cv=cv_input, filter=SearchFilter(levels=levels, schools=schools))
+
+            rendered = 0
+            with st.spinner("Finding courses..."):
+                if api_url:
+                    recommendations = fetch_recommendations_from_api(user_input.cv, api_url, user_input.filter)
+                else:
+                    # Initialize LLM service and render each school as soon as it is complete in the streamed answer
+                    recommendations = stream_recommendations(user_input.cv, GoogleGenerativeAIService(env_config),
+                                                             user_input.filter)
+                for recommendation in recommendations:
+                    render_recommendation(recommendation)
+                    rendered += 1
+            if not rendered:
                 st.write("No relevant courses found.")
-                print(str(e))
 
         except ValidationError as e:
             st.write(f"Input Error: {e}")
+        except ValueError as e:
+            # e.g. an index built with another embedding backend
+            st.error(f"Could not search the course index: {e}")
 
 
 if __name__ == "__main__":
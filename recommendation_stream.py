@@ -0,0 +1,97 @@
+import json
+
+from pydantic import ValidationError
+
+from models import Recommendation, RecommendedCourse
+
+
+class RecommendationStreamParser:
+    """Incrementally extracts complete objects from the ``recommendations`` array of a streamed answer.
+
+    Text is fed chunk by chunk; each school object is yielded as soon as its closing brace
+    arrives, so truncated or partly malformed output still produces every complete school.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.invalid = 0
+        self._position = None  # Scan position inside the recommendations array
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_start = None
+        self._finished = False
+
+    @property
+    def finished(self):
+        # The closing bracket of the recommendations array arrived, so the answer was not cut short
+        return self._finished
+
+    def _find_array_start(self):
+        key = self.text.find('"recommendations"')
+        if key == -1:
+            return None
+        bracket = self.text.find('[', key)
+        return bracket + 1 if bracket != -1 else None
+
+    def _validate(self, raw):
+        try:
+            data = json.loads(raw)
+            courses = []
+            for course in data.get('courses') or []:
+                # Drop an invalid course rather than the whole school
+                try:
+                    courses.append(RecommendedCourse.model_validate(course))
+                except ValidationError:
+                    self.invalid += 1
+            if not courses:
+                return None
+            return Recommendation(school=data['school'], courses=courses)
+        except (json.JSONDecodeError, KeyError, TypeError, AttributeError, ValidationError):
+            self.invalid += 1
+            return None
+
+    def feed(self, chunk):
+        self.text += chunk
+        if self._finished:
+            return []
+        if self._position is None:
+            self._position = self._find_array_start()
+            if self._position is None:
+                return []
+
+        recommendations = []
+        text = self.text
+        for position in range(self._position, len(text)):
+            char = text[position]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == '{':
+                if self._depth == 0:
+                    self._object_start = position
+                self._depth += 1
+            elif char == '}':
+                self._depth -= 1
+                if self._depth == 0 and self._object_start is not None:
+                    recommendation = self._validate(text[self._object_start:position + 1])
+                    if recommendation is not None:
+                        recommendations.append(recommendation)
+                    self._object_start = None
+            elif char == ']' and self._depth == 0:
+                self._finished = True
+                break
+        self._position = len(text)
+        return recommendations
+
+
+def parse_recommendations(text):
+    """Parse a complete answer, keeping every valid school even if the JSON is truncated."""
+    parser = RecommendationStreamParser()
+    return parser.feed(text)
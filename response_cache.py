@@ -0,0 +1,179 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+
+def normalize_query(text):
+    return " ".join(text.lower().split())
+
+
+def query_hash(text):
+    return hashlib.sha256(normalize_query(text).encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed cache of LLM recommendations.
+
+    Lookups first try an exact match on the normalized query hash, then the most similar
+    previously answered query by cosine similarity of the query embeddings. Entries are
+    scoped to an index version, expire after ``ttl_seconds`` and the least recently used
+    ones are evicted beyond ``max_entries``.
+    """
+
+    def __init__(self, db_path="response_cache.sqlite3", similarity_threshold=0.95, max_entries=1000,
+                 ttl_seconds=7 * 24 * 3600):
+        self.db_path = db_path
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, index_version TEXT NOT NULL, query TEXT NOT NULL, "
+            "embedding BLOB NOT NULL, response TEXT NOT NULL, "
+            "created_at REAL NOT NULL, last_accessed REAL NOT NULL)"
+        )
+        self._conn.commit()
+        # In-memory mirror of the embeddings of one index version for similarity search. Rows
+        # [0, _matrix_size) of _matrix are live; spare rows let stores append without copying
+        self._matrix_version = None
+        self._matrix_keys = []
+        self._matrix_rows = {}
+        self._matrix = None
+        self._matrix_size = 0
+        self.metrics = {'exact_hits': 0, 'semantic_hits': 0, 'misses': 0, 'stores': 0,
+                        'lookup_seconds': 0.0, 'last_similarity': None}
+
+    @staticmethod
+    def _normalize_vector(embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _load_matrix(self, index_version):
+        rows = self._conn.execute(
+            "SELECT key, embedding FROM responses WHERE index_version = ?", (index_version,)
+        ).fetchall()
+        self._matrix_version = index_version
+        self._matrix_keys = [key for key, _ in rows]
+        self._matrix_rows = {key: row for row, key in enumerate(self._matrix_keys)}
+        self._matrix = (np.vstack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+                        if rows else None)
+        self._matrix_size = len(rows)
+
+    def _matrix_put(self, index_version, key, vector):
+        # Versions that are not mirrored are loaded from SQLite on their next lookup
+        if self._matrix_version != index_version:
+            return
+        row = self._matrix_rows.get(key)
+        if row is None:
+            if self._matrix is None:
+                self._matrix = np.empty((16, len(vector)), dtype=np.float32)
+            elif self._matrix_size == len(self._matrix):
+                # Double the capacity, so appends cost amortized O(1) rows copied
+                self._matrix = np.concatenate([self._matrix, np.empty_like(self._matrix)])
+            row = self._matrix_size
+            self._matrix_size += 1
+            self._matrix_keys.append(key)
+            self._matrix_rows[key] = row
+        self._matrix[row] = vector
+
+    def _matrix_remove(self, keys):
+        for key in keys:
+            row = self._matrix_rows.pop(key, None)
+            if row is None:
+                continue
+            # Move the last live row into the gap
+            last = self._matrix_size - 1
+            if row != last:
+                moved = self._matrix_keys[last]
+                self._matrix[row] = self._matrix[last]
+                self._matrix_keys[row] = moved
+                self._matrix_rows[moved] = row
+            self._matrix_keys.pop()
+            self._matrix_size -= 1
+
+    def _expire(self, now):
+        cutoff = now - self.ttl_seconds
+        expired = [key for key, in self._conn.execute("SELECT key FROM responses WHERE created_at < ?", (cutoff,))]
+        overflow = (self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - len(expired)
+                    - self.max_entries)
+        if overflow > 0:
+            expired += [key for key, in self._conn.execute(
+                "SELECT key FROM responses WHERE created_at >= ? ORDER BY last_accessed ASC LIMIT ?",
+                (cutoff, overflow)
+            )]
+        if expired:
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key in expired])
+            self._conn.commit()
+            self._matrix_remove(expired)
+
+    def _touch(self, key, now):
+        row = self._conn.execute(
+            "SELECT response FROM responses WHERE key = ? AND created_at >= ?", (key, now - self.ttl_seconds)
+        ).fetchone()
+        if row is None:
+            return None
+        self._conn.execute("UPDATE responses SET last_accessed = ? WHERE key = ?", (now, key))
+        self._conn.commit()
+        return json.loads(row[0])
+
+    def get(self, query, embedding, index_version):
+        start = time.perf_counter()
+        now = time.time()
+        with self._lock:
+            try:
+                key = f"{index_version}:{query_hash(query)}"
+                response = self._touch(key, now)
+                if response is not None:
+                    self.metrics['exact_hits'] += 1
+                    return {**response, 'cache': 'exact'}
+
+                if self._matrix_version != index_version:
+                    self._load_matrix(index_version)
+                if self._matrix_size:
+                    similarities = self._matrix[:self._matrix_size] @ self._normalize_vector(embedding)
+                    best = int(np.argmax(similarities))
+                    self.metrics['last_similarity'] = float(similarities[best])
+                    if similarities[best] >= self.similarity_threshold:
+                        response = self._touch(self._matrix_keys[best], now)
+                        if response is not None:
+                            self.metrics['semantic_hits'] += 1
+                            return {**response, 'cache': 'semantic'}
+
+                self.metrics['misses'] += 1
+                return None
+            finally:
+                self.metrics['lookup_seconds'] += time.perf_counter() - start
+
+    def put(self, query, embedding, index_version, response):
+        now = time.time()
+        key = f"{index_version}:{query_hash(query)}"
+        vector = self._normalize_vector(embedding)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, index_version, normalize_query(query), vector.tobytes(), json.dumps(response), now, now)
+            )
+            self._conn.commit()
+            self.metrics['stores'] += 1
+            self._matrix_put(index_version, key, vector)
+            self._expire(now)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._matrix_version = None
+
+    def get_metrics(self):
+        with self._lock:
+            lookups = self.metrics['exact_hits'] + self.metrics['semantic_hits'] + self.metrics['misses']
+            hit_rate = (self.metrics['exact_hits'] + self.metrics['semantic_hits']) / lookups if lookups else 0.0
+            return {**self.metrics, 'lookups': lookups, 'hit_rate': hit_rate,
+                    'avg_lookup_seconds': self.metrics['lookup_seconds'] / lookups if lookups else 0.0}
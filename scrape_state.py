@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import random
+import time
+
+
+def _digest(values):
+    # Sorted, so a reordered dropdown does not count as a change
+    return hashlib.sha256(json.dumps(sorted(values), ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def universities_fingerprint(school_names):
+    """Fingerprint of the ``universidade001`` option list."""
+    return _digest(school_names)
+
+
+def courses_hash(courses):
+    """Hash of one university's ``programa001`` options."""
+    return _digest(courses)
+
+
+class ScrapeState:
+    """What the last successful run saw on the GCUB form, kept in a small JSON file.
+
+    Holds the fingerprint of the university list and a hash of each university's course list,
+    so a run can tell which schools were added, removed or changed without touching anything
+    downstream of the scraper.
+    """
+
+    def __init__(self, path="scrape_state.json"):
+        self.path = path
+        self.universities = None
+        self.schools = {}
+        self.updated_at = None
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                state = json.load(f)
+            self.universities = state.get('universities')
+            self.schools = state.get('schools', {})
+            self.updated_at = state.get('updated_at')
+
+    def __bool__(self):
+        return self.universities is not None
+
+    def sample(self, school_names, size, seed=None):
+        """Up to ``size`` universities from ``school_names`` whose course lists are already known."""
+        known = [name for name in school_names if name in self.schools]
+        return random.Random(seed).sample(known, min(size, len(known)))
+
+    def same_universities(self, school_names):
+        return universities_fingerprint(school_names) == self.universities
+
+    def unchanged(self, records):
+        """True when the course list of every record matches the stored hash."""
+        return all(self.schools.get(data['school']) == courses_hash(data['courses']) for data in records)
+
+    def diff(self, school_names, records):
+        """Compare a scrape with the stored state.
+
+        ``school_names`` is the full university list and ``records`` the scraped ``{'school',
+        'courses'}`` entries. A school missing from ``records`` but still listed failed to scrape;
+        it is reported under ``failed`` and never treated as removed.
+        """
+        listed = set(school_names)
+        scraped = {data['school']: data for data in records}
+        added, changed, unchanged = [], [], []
+        for name, data in scraped.items():
+            known = self.schools.get(name)
+            if known is None:
+                added.append(name)
+            elif known != courses_hash(data['courses']):
+                changed.append(name)
+            else:
+                unchanged.append(name)
+        return {
+            'universities_changed': not self.same_universities(school_names),
+            'added': added,
+            'removed': sorted(name for name in self.schools if name not in listed),
+            'changed': changed,
+            'unchanged': len(unchanged),
+            'failed': [name for name in school_names if name not in scraped],
+        }
+
+    def update(self, school_names, records):
+        """Record a scrape once everything downstream has stored it; call ``save`` to persist.
+
+        Listed schools missing from ``records`` failed somewhere and keep their stored hash, as
+        they keep their documents downstream; schools no longer listed are dropped.
+        """
+        listed = set(school_names)
+        self.universities = universities_fingerprint(school_names)
+        self.schools = {name: course_hash for name, course_hash in self.schools.items() if name in listed}
+        self.schools.update((data['school'], courses_hash(data['courses'])) for data in records)
+        self.updated_at = time.time()
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'universities': self.universities, 'schools': self.schools, 'updated_at': self.updated_at},
+                      f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
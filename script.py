@@ -1,157 +1,327 @@
-import os
-import time
-
-from firebase_admin.exceptions import FirebaseError
-from langchain_core.exceptions import OutputParserException
-from langchain_core.output_parsers import PydanticOutputParser
-from langchain_core.prompts import PromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
-
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import Select
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import StaleElementReferenceException, TimeoutException, WebDriverException
-
-from llm_prompts import load_prompt
-from models import School
-from recommend import firebase_service
-
-
-def scrape() -> list:
-    # Initialize WebDriver using Firefox
-    driver = webdriver.Chrome()
-    try:
-        # Navigate to the webpage
-        driver.get("https://www.gcub.org.br/bsp/application-form.php")
-
-        # Click the button to proceed to the next step
-        next_step_button = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.CSS_SELECTOR, "button#passo005"))
-        )
-        next_step_button.click()
-
-        # Initialize list to store scraped data
-        schools_and_courses = list()
-
-        # Wait for the university select element to be available
-        university_select_element = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "select#universidade001"))
-        )
-
-        # Get all university options
-        university_select = Select(university_select_element)
-        university_options = university_select.options
-
-        # Loop through each university option
-        for university_option in university_options[1:]:
-            school_name = university_option.text.strip()
-
-            # Retry loop for selecting university and getting courses
-            for _ in range(10):  # Retry up to 3 times
-                try:
-                    university_select.select_by_visible_text(university_option.text)
-                    time.sleep(1)  # Add a small delay to stabilize the page
-
-                    # Wait for the program select element to be available
-                    program_select_element = WebDriverWait(driver, 10).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, "select#programa001"))
-                    )
-
-                    # Get all program options
-                    program_select = Select(program_select_element)
-                    program_options = program_select.options
-
-                    # Initialize list to store courses
-                    courses = []
-
-                    # Loop through each program option
-                    for program_option in program_options[1:]:
-                        courses.append(program_option.text.strip())
-
-                    if courses:
-                        # Build dictionary for each selection
-                        data = {
-                            'school': school_name,
-                            'courses': courses
-                        }
-
-                        schools_and_courses.append(data)
-                        print(data)
-
-                        break  # Break out of retry loop if successful
-                    print(f"{school_name} couldn't select courses, retrying....")
-
-                except (StaleElementReferenceException, TimeoutException) as e:
-                    print(f"Exception occurred: {str(e)}")
-                    print(f"Retrying selection of {school_name}")
-                    continue
+import argparse
+import json
 
-            else:
-                print(f"Failed to scrape data for {school_name} after retries")
+from configs.env_config import EnvironmentConfig
+from catalog_snapshot import DEFAULT_SNAPSHOT_PATH, export_snapshot
+from firestore_sync import sync_catalog, sync_schools
+from http_scraper import GCUB_FORM_URL, GCUB_PROGRAMS_URL, iter_scrape_http, list_universities_http, scrape_http
+from llm_gateway import LLMGateway, chat_model
+from pipeline import PipelineJournal, run_pipeline
+from scrape_state import ScrapeState
+from telemetry import annotate, metrics, span, trace
+from translation import BatchTranslator
+from translation_memory import TranslationMemory
+
+# Selenium, the Gemini client, Firebase and the fakes are imported where they are used, so a run
+# only loads the stack it needs (e.g. --backend http --fake-llm --fake-firestore loads none of them)
+
+env_config = EnvironmentConfig(".env")
+
+
+def get_firestore_client(fake=False):
+    if fake:
+        from fakes import FakeFirestore
+        return FakeFirestore()
+    from configs.firebase import FirebaseService
+    return FirebaseService(env_config.get_env_variable('CREDENTIALS_JSON_PATH')).get_firestore_client()
+
+
+def create_translation_llm(fake=False):
+    if fake:
+        from fakes import FakeTranslationLLM
+        return FakeTranslationLLM()
+    # Wrapped in an LLMGateway by translation_gateway, which does the retrying
+    return chat_model("gemini-pro", env_config.get_env_variable('GEMINI_API_KEY'))
+
+
+def list_universities(args):
+    if args.backend == 'http':
+        return list_universities_http(args.url)
+    from selenium_scraper import list_universities as list_universities_selenium
+    return list_universities_selenium(args.url)
+
+
+def scrape(args, school_names=None):
+    # school_names limits the run to those universities; None scrapes the whole dropdown
+    if args.backend == 'http':
+        return scrape_http(args.url, args.programs_url, args.workers if args.workers > 1 else 8,
+                           args.retries, args.backoff, school_names)
+    from selenium_scraper import scrape as scrape_selenium
+    return scrape_selenium(args.url, args.workers, args.headless or args.workers > 1, args.retries, args.backoff,
+                           school_names)
 
+
+def translate(data, llm=None, token_budget=2000, concurrency=4, requests_per_minute=60,
+              memory_path="translation_memory.sqlite3"):
+    return translate_with_report(data, llm, token_budget, concurrency, requests_per_minute, memory_path)[0]
+
+
+def translation_gateway(llm, requests_per_minute=60, concurrency=4):
+    # The gateway applies the rate limit, deadlines and 429 backoff, so BatchTranslator does not add its own
+    if isinstance(llm, LLMGateway):
+        return llm
+    return LLMGateway(llm, name='translate', requests_per_minute=requests_per_minute, max_concurrency=concurrency)
+
+
+def translate_with_report(data, llm=None, token_budget=2000, concurrency=4, requests_per_minute=60,
+                          memory_path="translation_memory.sqlite3"):
+    if llm is None:
+        llm = create_translation_llm()
+    gateway = translation_gateway(llm, requests_per_minute, concurrency)
+    memory = TranslationMemory(memory_path) if memory_path else None
+    translator = BatchTranslator(gateway, token_budget=token_budget, concurrency=concurrency,
+                                 requests_per_minute=0, memory=memory)
+    try:
+        output, report = translator.translate(data)
     finally:
-        driver.quit()
-
-    return schools_and_courses
-
-
-def translate(data):
-    # Define the template
-    output_parser = PydanticOutputParser(pydantic_object=School)
-    format_instructions = output_parser.get_format_instructions()
-    template = PromptTemplate(
-        input_variables=["universities_and_courses", "format_instructions"],
-        template=load_prompt
-    )
-
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-pro", google_api_key=os.environ.get('GEMINI_API_KEY')
-    )
-    output = list()
-    for entry in data:
-        prompt_text = template.format(universities_and_courses=entry,
-                                      format_instructions=format_instructions)
-        # if entry.get('school')
-        response = llm.invoke(prompt_text)
-        school = output_parser.parse(response.content)
-        print(school)
-        output.append(school)
-    return output
-
-
-def save_to_firebase(data):
-    db = firebase_service.get_firestore_client()
-    for entry in data:
-        # Create a new document in the 'universities' collection
-        university_ref = db.collection('university').document()
-        university_ref.set({
-            'name': entry.school
-        })
-
-        # Get the university document ID
-        university_id = university_ref.id
-
-        # Loop through courses and add them to the 'courses' collection
-        for course in entry.courses:
-            db.collection('university').document(university_id).collection('courses').add({
-                'name': course.title,
-                'level': course.level.value
-            })
+        if gateway is not llm:
+            gateway.close()
+    print(f"Translated {report['translated']}/{report['total']} schools with {report['llm_calls']} LLM calls "
+          f"in {report['elapsed_seconds']:.1f}s")
+    if memory is not None:
+        print(f"Strings from translation memory: {report['strings_from_memory']}, "
+              f"from LLM: {report['strings_from_llm']}")
+    for failure in report['failed']:
+        print(f"Failed to translate {failure['school']}: {failure['error']}")
+    return output, report
+
+
+def failed_schools(school_names, records, report):
+    # Listed universities that did not make it through this run, whether scraping or translation failed
+    scraped = {data['school'] for data in records}
+    return sorted({name for name in school_names if name not in scraped}
+                  | {failure['school'] for failure in report['failed']})
+
+
+def stored_names(school_names, memory_path="translation_memory.sqlite3"):
+    # Firestore documents are keyed by the translated school name, which the memory knows from earlier runs
+    names = set(school_names)
+    if memory_path and school_names:
+        memory = TranslationMemory(memory_path)
+        names.update(known[0] for known in map(lambda name: memory.get('school', name), school_names) if known)
+    return sorted(names)
+
+
+def save_to_firebase(data, db=None, keep_schools=()):
+    # Set FIRESTORE_EMULATOR_HOST to run against the Firestore emulator instead of production
+    if db is None:
+        db = get_firestore_client()
+    report = sync_catalog(db, data, collection='university', keep_schools=keep_schools)
+    print(f"Firestore sync: {report['inserts']} inserts, {report['updates']} updates, {report['deletes']} deletes, "
+          f"{report['unchanged']} unchanged, {report['kept']} kept for failed schools "
+          f"in {report['batches']} batches, {report['elapsed_seconds']:.1f}s")
+    return report
+
+
+def export_catalog(db, snapshot_path):
+    # Refresh the local snapshot that generate_documents, index building and the app read from
+    if snapshot_path:
+        report = export_snapshot(db, snapshot_path, collection='university')
+        print(f"Catalog snapshot {report['version']}: {report['schools']} schools, {report['courses']} courses "
+              f"in {report['elapsed_seconds']:.2f}s")
+
+
+def run_batch(args):
+    with span('list_universities', backend=args.backend):
+        school_names = list_universities(args)
+    if not school_names:
+        # An empty dropdown means the form changed or failed to load, not that every school left GCUB
+        raise RuntimeError("The university list is empty, not syncing")
+    with span('scrape', backend=args.backend):
+        scraped_data = scrape(args, school_names)
+    with span('translate'):
+        translated_data, report = translate_with_report(scraped_data, create_translation_llm(args.fake_llm),
+                                                        args.token_budget, args.llm_concurrency,
+                                                        args.requests_per_minute, args.translation_memory)
+    # Only schools that left the university list are pruned; failed ones keep their documents
+    keep_schools = stored_names(failed_schools(school_names, scraped_data, report), args.translation_memory)
+    db = get_firestore_client(args.fake_firestore)
+    with span('save_to_firebase'):
+        save_to_firebase(translated_data, db, keep_schools)
+    print("Data saved to Firebase successfully.")
+    with span('export_snapshot'):
+        export_catalog(db, args.snapshot)
+
+
+def detect_changes(args, state):
+    """Scrape only as much as it takes to find what changed since the last run.
+
+    Returns ``(school names, records, diff)``; records and diff are None when the probe found
+    the university list and a sample of course lists unchanged.
+    """
+    with span('list_universities', backend=args.backend):
+        school_names = list_universities(args)
+    if args.probe and state and state.same_universities(school_names):
+        sample = state.sample(school_names, args.probe)
+        with span('probe', backend=args.backend):
+            probed = scrape(args, sample)
+        if len(probed) == len(sample) and state.unchanged(probed):
+            print(f"No changes: the university list and {len(sample)} probed course lists match the last run")
+            return school_names, None, None
+        print("The probe found changes, scraping every university")
+    with span('scrape', backend=args.backend):
+        records = scrape(args, school_names)
+    return school_names, records, state.diff(school_names, records)
+
+
+def report_diff(diff, diff_file=None):
+    print(f"Catalog diff: {len(diff['added'])} added, {len(diff['removed'])} removed, "
+          f"{len(diff['changed'])} changed, {diff['unchanged']} unchanged, {len(diff['failed'])} failed to scrape")
+    for sign, key in (('+', 'added'), ('-', 'removed'), ('~', 'changed'), ('!', 'failed')):
+        for school in diff[key]:
+            print(f"  {sign} {school}")
+    annotate(diff={key: len(value) if isinstance(value, list) else value for key, value in diff.items()})
+    if diff_file:
+        with open(diff_file, 'w', encoding='utf-8') as f:
+            json.dump(diff, f, ensure_ascii=False, indent=2)
+
+
+def run_changed(args):
+    # Only schools whose course list changed since the last successful run go on to translation and Firestore
+    state = ScrapeState(args.scrape_state)
+    school_names, records, diff = detect_changes(args, state)
+    if diff is None:
+        return
+    report_diff(diff, args.diff_file)
+
+    changed = set(diff['added']) | set(diff['changed'])
+    if state and not changed and not diff['removed']:
+        print("Nothing to translate or save")
+        state.update(school_names, records)
+        state.save()
+        return
+
+    llm = create_translation_llm(args.fake_llm)
+    db = get_firestore_client(args.fake_firestore)
+    if not state or diff['removed']:
+        # Pruning needs the whole catalog; the translation memory answers the unchanged schools
+        print("Full sync: first run or schools were removed")
+        sync_records = records
+    else:
+        sync_records = [data for data in records if data['school'] in changed]
+    with span('translate'):
+        translated_data, report = translate_with_report(sync_records, llm, args.token_budget, args.llm_concurrency,
+                                                        args.requests_per_minute, args.translation_memory)
+    with span('save_to_firebase'):
+        if sync_records is records:
+            # Schools that failed to scrape or translate are still listed, so they keep their documents
+            keep_schools = stored_names(failed_schools(school_names, records, report), args.translation_memory)
+            save_to_firebase(translated_data, db, keep_schools)
+        else:
+            sync_report = sync_schools(db, translated_data, 'university')
+            print(f"Firestore sync: {sync_report['inserts']} inserts, {sync_report['updates']} updates, "
+                  f"{sync_report['deletes']} deletes, {sync_report['unchanged']} unchanged")
+    with span('export_snapshot'):
+        export_catalog(db, args.snapshot)
+
+    # Schools that failed are not recorded as up to date (they keep their previous hash, if any), so the
+    # next run picks them up again; schools that left the university list are dropped from the state
+    failed = {failure['school'] for failure in report['failed']}
+    state.update(school_names, [data for data in sync_records if data['school'] not in failed])
+    state.save()
+
+
+def run_streaming(args, db=None):
+    journal = PipelineJournal(args.journal)
+    llm = translation_gateway(create_translation_llm(args.fake_llm), args.requests_per_minute, args.llm_concurrency)
+    translator = BatchTranslator(llm, token_budget=args.token_budget, concurrency=args.llm_concurrency,
+                                 requests_per_minute=0,
+                                 memory=TranslationMemory(args.translation_memory) if args.translation_memory else None)
+    if db is None:
+        db = get_firestore_client(args.fake_firestore)
+
+    def scrape_iter(skip):
+        if args.backend == 'http':
+            return iter_scrape_http(args.url, args.programs_url, args.workers if args.workers > 1 else 8,
+                                    args.retries, args.backoff, skip=skip)
+        from selenium_scraper import iter_scrape
+        return iter_scrape(args.url, args.headless, args.retries, args.backoff, skip=skip)
+
+    report = run_pipeline(scrape_iter, translator.translate, lambda schools: sync_schools(db, schools, 'university'),
+                          journal)
+    for stage in report['stages']:
+        print(f"{stage['stage']}: {stage['items']} items, {stage['failures']} failures, "
+              f"{stage['items_per_second']:.2f} items/s, p50 {stage['p50_seconds']:.2f}s, "
+              f"max {stage['max_seconds']:.2f}s")
+    print(f"Pipeline finished in {report['elapsed_seconds']:.1f}s")
+    for error in report['errors']:
+        print(f"Pipeline error, rerun to resume: {error}")
+    for failure in report['failed']:
+        print(f"Failed to translate {failure['school']}, rerun to retry it: {failure['error']}")
+    if not report['errors']:
+        export_catalog(db, args.snapshot)
+    if not report['errors'] and not report['failed']:
+        # The run is complete, so the next one starts from scratch instead of skipping every school.
+        # Otherwise the failed schools stay pending in the journal and a rerun translates just them
+        journal.complete()
+    return report
+
+
+def describe_failure(e):
+    # Matched by class name so the selenium, langchain and firebase stacks are not imported just to catch their errors
+    names = {cls.__name__ for cls in type(e).__mro__}
+    if 'WebDriverException' in names:
+        return 'Site Down'
+    if 'OutputParserException' in names:
+        return f'OutputParserException: {e}'
+    if 'FirebaseError' in names:
+        return f'FirebaseError: {e}'
+    return f'Unexpected Exception: {e}'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape GCUB courses, translate them and save them to Firebase")
+    parser.add_argument('--backend', choices=['selenium', 'http'], default='selenium',
+                        help="Drive a browser, or call the form's course-list endpoint directly")
+    parser.add_argument('--url', default=GCUB_FORM_URL,
+                        help="Application form URL, e.g. a locally served copy for testing")
+    parser.add_argument('--programs-url', default=GCUB_PROGRAMS_URL, help="Course-list endpoint for the http backend")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of parallel browser sessions, or concurrent requests for the http backend")
+    parser.add_argument('--headless', action='store_true', help="Run the browsers without a window")
+    parser.add_argument('--retries', type=int, default=10, help="Attempts per university")
+    parser.add_argument('--backoff', type=float, default=0.5, help="Initial retry backoff in seconds")
+    parser.add_argument('--token-budget', type=int, default=2000, help="Approximate input tokens per translation call")
+    parser.add_argument('--llm-concurrency', type=int, default=4, help="Concurrent translation calls")
+    parser.add_argument('--requests-per-minute', type=int, default=60, help="Translation call rate limit")
+    parser.add_argument('--translation-memory', default="translation_memory.sqlite3",
+                        help="Translation memory file; pass an empty string to disable it")
+    parser.add_argument('--fake-llm', action='store_true', help="Translate with a local deterministic fake model")
+    parser.add_argument('--stream', action='store_true',
+                        help="Stream each university through scrape, translate and store, with resumable checkpoints")
+    parser.add_argument('--journal', default="pipeline_journal.jsonl", help="Checkpoint journal for --stream")
+    parser.add_argument('--snapshot', default=DEFAULT_SNAPSHOT_PATH,
+                        help="Catalog snapshot to export after saving; pass an empty string to skip")
+    parser.add_argument('--fake-firestore', action='store_true', help="Sync into an in-memory Firestore fake")
+    parser.add_argument('--metrics-file', default="",
+                        help="Write the run's metrics here in Prometheus text format, e.g. for a textfile collector")
+    parser.add_argument('--changed-only', action='store_true',
+                        help="Only translate and save universities whose course list changed since the last run")
+    parser.add_argument('--scrape-state', default="scrape_state.json",
+                        help="Fingerprints of the last successful --changed-only run")
+    parser.add_argument('--probe', type=int, default=0,
+                        help="With --changed-only, first re-scrape this many known universities and stop "
+                             "if they and the university list are unchanged")
+    parser.add_argument('--diff-file', default="", help="With --changed-only, also write the catalog diff here as JSON")
+    args = parser.parse_args()
+    if args.changed_only and args.stream:
+        parser.error("--changed-only runs the batch pipeline; drop --stream")
+    return args
 
 
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        scraped_data = scrape()
-        translated_data = translate(scraped_data)
-        save_to_firebase(translated_data)
-        print("Data saved to Firebase successfully.")
-    except WebDriverException:
-        print('Site Down')
-    except OutputParserException as e:
-        print(f'OutputParserException: {e}')
-    except FirebaseError as e:
-        print(f'FirebaseError: {e}')
+        with trace('ingest', stream=args.stream, backend=args.backend):
+            if args.stream:
+                run_streaming(args)
+            elif args.changed_only:
+                run_changed(args)
+            else:
+                run_batch(args)
     except Exception as e:
-        print(f'Unexpected Exception: {e}')
+        print(describe_failure(e))
+    finally:
+        if args.metrics_file:
+            with open(args.metrics_file, 'w') as f:
+                f.write(metrics.to_prometheus())
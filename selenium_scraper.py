@@ -0,0 +1,160 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import Select
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import (NoSuchElementException, StaleElementReferenceException, TimeoutException,
+                                        WebDriverException)
+
+from http_scraper import GCUB_FORM_URL
+from telemetry import metrics, span
+
+
+def create_driver(headless=False):
+    options = webdriver.ChromeOptions()
+    if headless:
+        options.add_argument("--headless=new")
+        options.add_argument("--disable-gpu")
+    return webdriver.Chrome(options=options)
+
+
+def open_application_form(driver, url=GCUB_FORM_URL):
+    # Navigate to the webpage
+    driver.get(url)
+
+    # Click the button to proceed to the next step
+    next_step_button = WebDriverWait(driver, 10).until(
+        EC.element_to_be_clickable((By.CSS_SELECTOR, "button#passo005"))
+    )
+    next_step_button.click()
+
+    # Wait for the university select element to be available
+    university_select_element = WebDriverWait(driver, 10).until(
+        EC.presence_of_element_located((By.CSS_SELECTOR, "select#universidade001"))
+    )
+    return Select(university_select_element)
+
+
+def _program_options(driver):
+    program_select = Select(driver.find_element(By.CSS_SELECTOR, "select#programa001"))
+    return program_select.options
+
+
+def _program_options_changed(previous_texts, previous_first_option):
+    # Expected condition: the course list was rebuilt after a new university was selected
+    def condition(driver):
+        try:
+            options = _program_options(driver)
+            texts = [option.text.strip() for option in options[1:]]
+        except (StaleElementReferenceException, NoSuchElementException):
+            return False
+        if not texts:
+            return False
+        if texts != previous_texts:
+            return texts
+        # Two schools may offer the same list; a replaced option element still proves a reload
+        try:
+            previous_first_option.is_enabled()
+        except (StaleElementReferenceException, AttributeError):
+            return texts
+        return False
+
+    return condition
+
+
+def _current_program_list(driver):
+    try:
+        options = _program_options(driver)
+        return [option.text.strip() for option in options[1:]], options[0] if options else None
+    except (StaleElementReferenceException, NoSuchElementException):
+        return None, None
+
+
+def scrape_school(driver, university_select, school_name, retries=10, backoff=0.5, timeout=10):
+    # The list on screen before the first attempt belongs to the previous school. Retries keep comparing
+    # against it: a list that arrived after a timeout already counts, where reading it again would wait
+    # for a change that never comes
+    previous_texts, previous_first_option = _current_program_list(driver)
+    for attempt in range(retries):
+        try:
+            if attempt:
+                # Picking the already selected school fires no change event, so go through the placeholder
+                university_select.select_by_index(0)
+            university_select.select_by_visible_text(school_name)
+            courses = WebDriverWait(driver, timeout).until(
+                _program_options_changed(previous_texts, previous_first_option)
+            )
+            return {
+                'school': school_name,
+                'courses': courses
+            }
+
+        except (StaleElementReferenceException, TimeoutException) as e:
+            print(f"Retrying selection of {school_name} after {type(e).__name__}")
+            metrics.inc('scrape_retries_total', backend='selenium')
+            time.sleep(min(backoff * 2 ** attempt, 10))
+
+    print(f"Failed to scrape data for {school_name} after retries")
+    metrics.inc('scrape_failures_total', backend='selenium')
+    return None
+
+
+def iter_scrape(url=GCUB_FORM_URL, headless=False, retries=10, backoff=0.5, school_names=None, skip=()):
+    # Yield each university's courses as soon as they are scraped
+    driver = create_driver(headless)
+    try:
+        university_select = open_application_form(driver, url)
+        if school_names is None:
+            school_names = [option.text.strip() for option in university_select.options[1:]]
+        for school_name in school_names:
+            if school_name in skip:
+                continue
+            with span('scrape_school', backend='selenium'):
+                data = scrape_school(driver, university_select, school_name, retries, backoff)
+            if data:
+                yield data
+    finally:
+        driver.quit()
+
+
+def list_universities(url=GCUB_FORM_URL, headless=True):
+    driver = create_driver(headless)
+    try:
+        university_select = open_application_form(driver, url)
+        return [option.text.strip() for option in university_select.options[1:]]
+    finally:
+        driver.quit()
+
+
+def scrape(url=GCUB_FORM_URL, workers=1, headless=False, retries=10, backoff=0.5, school_names=None) -> list:
+    if workers <= 1:
+        return list(iter_scrape(url, headless, retries, backoff, school_names))
+
+    if school_names is None:
+        school_names = list_universities(url, headless)
+    # Round-robin shards so each worker gets a similar mix of schools
+    shards = [school_names[i::workers] for i in range(workers)]
+
+    def scrape_shard(names):
+        # A crashed browser only loses the rest of its own shard; the schools it did not reach are missing
+        # from the result, which the caller reports as failed
+        records = []
+        try:
+            for data in iter_scrape(url, headless, retries, backoff, names):
+                records.append(data)
+        except WebDriverException as e:
+            print(f"Browser failed after {len(records)} of {len(names)} schools in its shard: {e.msg or e}")
+            metrics.inc('scrape_failures_total', len(names) - len(records), backend='selenium')
+        return records
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(scrape_shard, shard) for shard in shards if shard]
+        for future in futures:
+            results.update((data['school'], data) for data in future.result())
+
+    # Keep the order of the university dropdown regardless of which worker finished first
+    return [results[name] for name in school_names if name in results]
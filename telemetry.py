@@ -0,0 +1,278 @@
+"""Lightweight spans, counters and histograms for the recommendation and ingestion paths.
+
+Configured from the environment or ``.env``:
+
+- ``TELEMETRY=false`` turns recording off; spans then cost one flag check.
+- ``TELEMETRY_LOGS=false`` stops the one-line JSON summary logged per traced request.
+- ``PROFILER=cprofile`` or ``PROFILER=pyinstrument`` profiles traced requests one at a time and
+  keeps the first one slower than ``PROFILE_SLOW_SECONDS`` under ``PROFILE_DIR``. cProfile only
+  sees the thread that started the request; pyinstrument is an optional dependency.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from configs.env_config import EnvironmentConfig
+
+# Through EnvironmentConfig, so .env applies even though most modules import this one first
+env_config = EnvironmentConfig(".env")
+ENABLED = (env_config.get_env_variable('TELEMETRY') or 'true').lower() != 'false'
+JSON_LOGS = (env_config.get_env_variable('TELEMETRY_LOGS') or 'true').lower() != 'false'
+PROFILER = (env_config.get_env_variable('PROFILER') or '').lower() or None
+PROFILE_SLOW_SECONDS = float(env_config.get_env_variable('PROFILE_SLOW_SECONDS') or 5)
+PROFILE_DIR = env_config.get_env_variable('PROFILE_DIR') or "profiles"
+
+METRIC_PREFIX = "gcub_"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One slot per bucket plus the +Inf overflow
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+def _label_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms, keyed by metric name and label set."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        if not ENABLED:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        if not ENABLED:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def to_prometheus(self):
+        """Render every metric in the Prometheus text exposition format."""
+        lines, typed = [], set()
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                name = METRIC_PREFIX + name
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE {name} counter")
+                lines.append(f"{name}{_label_text(labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                name = METRIC_PREFIX + name
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE {name} histogram")
+                cumulative = 0
+                for bound, count in zip(list(histogram.buckets) + ['+Inf'], histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_label_text(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_sum{_label_text(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{_label_text(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                             for (name, labels), value in sorted(self.counters.items())],
+                'histograms': [{'name': name, 'labels': dict(labels), 'count': histogram.count,
+                                'sum': histogram.sum, 'mean': histogram.sum / histogram.count}
+                               for (name, labels), histogram in sorted(self.histograms.items())],
+            }
+
+
+metrics = MetricsRegistry()
+
+
+def log_event(event, **fields):
+    if JSON_LOGS:
+        print(json.dumps({'ts': round(time.time(), 3), 'event': event, **fields}, ensure_ascii=False, default=str),
+              flush=True)
+
+
+class Trace:
+    """Spans and fields of one request, logged as a single JSON line when it ends."""
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+        self.spans = []
+
+    def annotate(self, **fields):
+        self.fields.update(fields)
+
+
+_current_trace = contextvars.ContextVar('trace', default=None)
+
+
+def annotate(**fields):
+    current = _current_trace.get()
+    if current is not None:
+        current.annotate(**fields)
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def annotate(self, **fields):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    __slots__ = ('name', 'labels', 'start')
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        metrics.observe('stage_seconds', seconds, stage=self.name, **self.labels)
+        if exc_type is not None:
+            metrics.inc('stage_errors_total', stage=self.name, **self.labels)
+        current = _current_trace.get()
+        if current is not None:
+            current.spans.append((self.name, seconds))
+        return False
+
+
+def span(name, **labels):
+    """Time a stage into the ``stage_seconds`` histogram and the current trace."""
+    if 'stage' in labels:
+        # ``stage`` is the span name itself; a label with that key would clash with it in every metric
+        raise ValueError("'stage' is reserved for the span name, use another label key")
+    return Span(name, labels) if ENABLED else _NOOP
+
+
+_profile_lock = threading.Lock()
+_profile_captured = False
+
+
+def _start_profiler():
+    if not PROFILER or _profile_captured or not _profile_lock.acquire(blocking=False):
+        return None
+    if PROFILER == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            _profile_lock.release()
+            raise ImportError("PROFILER=pyinstrument needs `pip install pyinstrument`")
+        profiler = Profiler()
+        profiler.start()
+    else:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    return profiler
+
+
+def _stop_profiler(profiler, name, seconds):
+    global _profile_captured
+    try:
+        if PROFILER == 'pyinstrument':
+            profiler.stop()
+        else:
+            profiler.disable()
+        if seconds < PROFILE_SLOW_SECONDS:
+            return
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        extension = 'html' if PROFILER == 'pyinstrument' else 'prof'
+        path = os.path.join(PROFILE_DIR, f"{name}-{int(time.time())}.{extension}")
+        if PROFILER == 'pyinstrument':
+            with open(path, 'w') as f:
+                f.write(profiler.output_html())
+        else:
+            profiler.dump_stats(path)
+        _profile_captured = True
+        log_event('profile_captured', operation=name, seconds=seconds, path=path)
+    finally:
+        _profile_lock.release()
+
+
+class trace:
+    """Context manager around one request or run: collects its spans and logs them as JSON.
+
+    Spans opened in other threads join the trace when the work runs in a copy of the caller's
+    context (``contextvars.copy_context().run``).
+    """
+
+    def __init__(self, name, **fields):
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        if not ENABLED:
+            return _NOOP
+        self.trace = Trace(self.name, self.fields)
+        self.token = _current_trace.set(self.trace)
+        self.profiler = _start_profiler()
+        self.start = time.perf_counter()
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        if not ENABLED:
+            return False
+        seconds = time.perf_counter() - self.start
+        try:
+            _current_trace.reset(self.token)
+        except ValueError:
+            # A generator holding the trace was finalized from another context
+            pass
+        if self.profiler is not None:
+            _stop_profiler(self.profiler, self.name, seconds)
+        metrics.observe('request_seconds', seconds, operation=self.name)
+        if exc_type is not None:
+            metrics.inc('request_errors_total', operation=self.name)
+
+        stages = {}
+        for stage, stage_seconds in self.trace.spans:
+            stages[stage] = stages.get(stage, 0.0) + stage_seconds
+        log_event(self.name, seconds=seconds, stages=stages, error=repr(exc) if exc is not None else None,
+                  **self.trace.fields)
+        return False
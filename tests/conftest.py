@@ -0,0 +1,55 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the top of the repository rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+@pytest.fixture
+def fixture_text():
+    def read(*parts):
+        with open(os.path.join(FIXTURES, *parts), encoding='utf-8') as f:
+            return f.read()
+    return read
+
+
+# A small translated catalog in recommend.generate_documents' {school: [{'name', 'level'}]} shape
+CATALOG = {
+    "Universidade Federal do Rio de Janeiro": [
+        {'name': "Computer Science", 'level': "PhD"},
+        {'name': "Electrical Engineering", 'level': "Master's"},
+        {'name': "Chemistry", 'level': "PhD"},
+    ],
+    "Universidade de São Paulo": [
+        {'name': "Computer Science", 'level': "Master's"},
+        {'name': "Public Health", 'level': "PhD"},
+        {'name': "Economics", 'level': "Master's"},
+    ],
+    "Universidade Federal de Minas Gerais": [
+        {'name': "Chemistry", 'level': "Master's"},
+        {'name': "Agronomy", 'level': "PhD"},
+        {'name': "Veterinary Medicine", 'level': "PhD"},
+    ],
+}
+
+
+@pytest.fixture
+def hash_index(tmp_path, monkeypatch):
+    """Build CATALOG into faiss_index/ under a scratch working directory with the offline backends.
+
+    Returns the recommend module. Hash vectors of a query and a course sharing a word or two are
+    only loosely aligned, so every hit with a positive relevance score is kept.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('EMBEDDING_BACKEND', 'hash')
+    monkeypatch.setenv('TOKENIZER', 'approx')
+    monkeypatch.setenv('RESPONSE_CACHE_PATH', str(tmp_path / "response_cache.sqlite3"))
+    import recommend
+    monkeypatch.setattr(recommend, 'SCORE_THRESHOLD', 0.0)
+    documents, texts = recommend.generate_documents(CATALOG)
+    recommend.create_vector_db(documents, texts)
+    return recommend
@@ -0,0 +1,102 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+import api
+from configs.google_generative_ai import GoogleGenerativeAIService
+from fakes import FakeChatModel
+from index_store import search_index
+from models import SearchFilter
+
+MULTI_FIELD_CV = "Computer Science, Chemistry"
+SINGLE_FIELD_CV = "Computer Science research"
+
+
+def count_calls(monkeypatch, module, name):
+    calls = []
+    original = getattr(module, name)
+
+    def wrapper(*args, **kwargs):
+        calls.append(args)
+        return original(*args, **kwargs)
+    monkeypatch.setattr(module, name, wrapper)
+    return calls
+
+
+def test_batcher_embeds_once_and_searches_once_per_filter(hash_index, monkeypatch):
+    recommend = hash_index
+    # Short queries would otherwise be answered by the keyword fast path
+    monkeypatch.setattr(recommend, 'FAST_PATH_ENABLED', False)
+    embed_calls = count_calls(monkeypatch, api, 'embed_queries')
+    search_calls = count_calls(monkeypatch, api, 'search_index')
+    service = GoogleGenerativeAIService(recommend.env_config, llm_instance=FakeChatModel())
+    requests = [(MULTI_FIELD_CV, None), (SINGLE_FIELD_CV, None),
+                (MULTI_FIELD_CV, SearchFilter(levels=["PhD"]))]
+
+    async def submit_all():
+        batcher = api.EmbeddingBatcher(service, executor, max_wait_ms=200)
+        task = asyncio.create_task(batcher.run())
+        try:
+            return batcher, await asyncio.gather(*(batcher.submit(recommend.query_texts(cv), search_filter)
+                                                   for cv, search_filter in requests))
+        finally:
+            task.cancel()
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        batcher, results = asyncio.run(submit_all())
+
+    assert batcher.batches == 1 and batcher.queries == 3
+    assert len(embed_calls) == 1
+    # One search for the two unfiltered requests and one for the PhD-only request
+    assert len(search_calls) == 2
+
+    vectordb = service.get_vector_db('faiss_index')
+    for (cv, search_filter), (vectors, (distances, positions)) in zip(requests, results):
+        texts = recommend.query_texts(cv)
+        assert len(vectors) == len(texts)
+        # Multi-field CVs are searched by their field phrases, so the batch covers what retrieval needs
+        searched = recommend.searched_vectors(vectors)
+        assert len(distances) == len(positions) == (len(texts) - 1 if len(texts) > 1 else 1)
+        expected_distances, expected_positions = search_index(vectordb, searched, recommend.RETRIEVAL_FETCH_K,
+                                                              search_filter)
+        np.testing.assert_array_equal(positions, expected_positions)
+        np.testing.assert_allclose(distances, expected_distances, rtol=1e-5)
+
+        # Retrieval from the batched results matches retrieval that searches by itself
+        _, batched = recommend.prepare_recommendation(cv, service, vectors, (distances, positions), search_filter)
+        _, alone = recommend.prepare_recommendation(cv, service, search_filter=search_filter)
+        assert [doc.metadata for doc, _ in batched['hits']] == [doc.metadata for doc, _ in alone['hits']]
+        assert batched['hits']
+    assert len(recommend.query_texts(MULTI_FIELD_CV)) > 2
+
+
+def test_recommend_round_trip(hash_index, monkeypatch):
+    monkeypatch.setattr(hash_index, 'FAST_PATH_ENABLED', False)
+    monkeypatch.setenv('USE_FAKE_LLM', 'true')
+    monkeypatch.setenv('FAKE_LLM_LATENCY', '0')
+    monkeypatch.setenv('LLM_REQUESTS_PER_MINUTE', '0')
+
+    with TestClient(api.app) as client:
+        response = client.post('/recommend', json={'cv': SINGLE_FIELD_CV})
+        assert response.status_code == 200
+        body = response.json()
+        assert {hit['level'] for hit in body['retrieved']} == {"PhD", "Master's"}
+        assert body['cache'] is None and not body['fast_path']
+        # The fake LLM recommends exactly the courses that were put in the prompt
+        recommended = {(school['school'], course['name'], course['level'])
+                       for school in body['recommendations'] for course in school['courses']}
+        assert recommended == {(hit['school'], hit['course'], hit['level']) for hit in body['retrieved']}
+
+        filtered = client.post('/recommend', json={'cv': SINGLE_FIELD_CV, 'filter': {'levels': ["Master's"]}})
+        assert filtered.status_code == 200
+        assert {hit['level'] for hit in filtered.json()['retrieved']} == {"Master's"}
+
+        # The same CV again is answered from the response cache
+        again = client.post('/recommend', json={'cv': SINGLE_FIELD_CV}).json()
+        assert again['cache'] == 'exact'
+        assert again['recommendations'] == body['recommendations']
+
+        metrics = client.get('/metrics').json()
+        assert metrics['embedding_queries'] == 3
@@ -0,0 +1,85 @@
+import os
+import sqlite3
+
+import pytest
+
+from catalog_snapshot import export_snapshot, load_catalog, snapshot_version
+from fakes import FakeFirestore
+from firestore_sync import sync_catalog
+from models import CourseType, ProgramEnum, School
+
+
+def school(name, *courses):
+    return School(school=name, courses=[CourseType(title=title, level=level) for title, level in courses])
+
+
+CATALOG = [
+    school("University of São Paulo", ("Master's in Physics", ProgramEnum.mtech), ("PhD in Physics", ProgramEnum.phd)),
+    school("Federal University of Minas Gerais", ("Master's in Law", ProgramEnum.mtech)),
+    school("University of Brasília"),
+]
+
+
+def firestore(catalog):
+    db = FakeFirestore()
+    sync_catalog(db, catalog)
+    return db
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    return str(tmp_path / "catalog_snapshot.sqlite3")
+
+
+def test_export_and_load_round_trip(snapshot_path):
+    report = export_snapshot(firestore(CATALOG), snapshot_path)
+
+    assert (report['schools'], report['courses']) == (3, 3)
+    assert load_catalog(snapshot_path) == {
+        "Federal University of Minas Gerais": [{'name': "Master's in Law", 'level': "Master's"}],
+        "University of Brasília": [],
+        "University of São Paulo": [{'name': "Master's in Physics", 'level': "Master's"},
+                                    {'name': "PhD in Physics", 'level': "PhD"}],
+    }
+    assert snapshot_version(snapshot_path) == report['version']
+
+
+def test_version_depends_on_content_not_order(snapshot_path, tmp_path):
+    version = export_snapshot(firestore(CATALOG), snapshot_path)['version']
+    assert export_snapshot(firestore(CATALOG[::-1]), str(tmp_path / "reordered.sqlite3"))['version'] == version
+
+    changed = CATALOG[:2] + [school("University of Brasília", ("PhD in Law", ProgramEnum.phd))]
+    assert export_snapshot(firestore(changed), snapshot_path)['version'] != version
+
+
+def test_export_replaces_the_snapshot_atomically(snapshot_path):
+    export_snapshot(firestore(CATALOG), snapshot_path)
+    # A reader that opened the old snapshot keeps reading it while a new one is exported
+    reader = sqlite3.connect(f"file:{snapshot_path}?mode=ro", uri=True)
+    try:
+        # Left behind by an export that crashed
+        with open(f"{snapshot_path}.tmp", 'wb') as f:
+            f.write(b"partial")
+        export_snapshot(firestore(CATALOG[:1]), snapshot_path)
+
+        assert reader.execute("SELECT COUNT(*) FROM schools").fetchone()[0] == 3
+    finally:
+        reader.close()
+    assert list(load_catalog(snapshot_path)) == ["University of São Paulo"]
+    assert not os.path.exists(f"{snapshot_path}.tmp")
+
+
+def test_load_catalog_is_cached_until_the_file_changes(snapshot_path):
+    export_snapshot(firestore(CATALOG), snapshot_path)
+    catalog = load_catalog(snapshot_path)
+    assert load_catalog(snapshot_path) is catalog
+
+    # Same content, new modification time: reloaded
+    stat = os.stat(snapshot_path)
+    os.utime(snapshot_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    reloaded = load_catalog(snapshot_path)
+    assert reloaded is not catalog and reloaded == catalog
+
+    # A new export changes the size as well
+    export_snapshot(firestore(CATALOG[:1]), snapshot_path)
+    assert list(load_catalog(snapshot_path)) == ["University of São Paulo"]
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from field_retrieval import _mmr_order, retrieve_by_field, split_fields
+from hash_embeddings import HashEmbeddings
+from index_store import build_store, load_vector_db
+
+
+@pytest.mark.parametrize('cv_text, fields', [
+    ("cyber security, AI, and cloud computing", ["cyber security", "AI", "cloud computing"]),
+    ("I have experience in Chemistry and Physics", ["Chemistry", "Physics"]),
+    ("Química ou Física e Biologia", ["Química", "Física", "Biologia"]),
+    ("Data science; statistics / machine learning", ["Data science", "statistics", "machine learning"]),
+    # Conjunctions inside hyphenated words do not split them
+    ("e-commerce e marketing digital", ["e-commerce", "marketing digital"]),
+    ("research-and-development or logistics", ["research-and-development", "logistics"]),
+    ("Rock-n-roll e ou-tro", ["Rock-n-roll", "ou-tro"]),
+])
+def test_split_fields(cv_text, fields):
+    assert split_fields(cv_text) == fields
+
+
+def test_split_fields_drops_long_phrases_and_duplicates():
+    cv_text = ("Chemistry, chemistry, Physics. I spent most of my career building large distributed "
+               "systems for banks")
+    assert split_fields(cv_text) == ["Chemistry", "Physics"]
+    assert split_fields("a, b, c, d", max_fields=2) == ["a", "b"]
+
+
+def test_mmr_prefers_a_diverse_candidate_over_a_near_duplicate():
+    query = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+    candidates = np.array([[0.9, 0.43, 0.0], [0.89, 0.45, 0.0], [0.7, 0.0, 0.71]], dtype=np.float32)
+    # By similarity alone the near-duplicate comes second
+    assert _mmr_order(query, candidates, lambda_mult=1.0) == [0, 1, 2]
+    assert _mmr_order(query, candidates, lambda_mult=0.5) == [0, 2, 1]
+
+
+@pytest.fixture
+def vectordb(tmp_path):
+    embeddings = HashEmbeddings(dim=128)
+    courses = ["Chemistry Organic", "Chemistry Analytical", "Chemistry Inorganic",
+               "Physics Quantum", "Physics Nuclear", "Physics Optical"]
+    metadatas = [{'school': "Universidade de São Paulo", 'course': course, 'level': "PhD"} for course in courses]
+    build_store(str(tmp_path), courses, metadatas, embeddings.embed_documents(courses))
+    return load_vector_db(str(tmp_path), embeddings)
+
+
+def test_fields_take_turns_within_their_quotas(vectordb):
+    fields = ["Chemistry", "Physics"]
+    field_embeddings = vectordb.embeddings.embed_documents(fields)
+    hits = retrieve_by_field(vectordb, fields, field_embeddings, per_field_k=2, total_k=3, score_threshold=-1)
+    assert [field for _, _, field in hits] == ["Chemistry", "Physics", "Chemistry"]
+    assert all(field in doc.page_content for doc, _, field in hits)
+
+    # Each field stops at its quota; every course is returned once
+    hits = retrieve_by_field(vectordb, fields, field_embeddings, per_field_k=2, total_k=10, score_threshold=-1)
+    assert [field for _, _, field in hits] == ["Chemistry", "Physics", "Chemistry", "Physics"]
+    assert len({doc.page_content for doc, _, _ in hits}) == 4
+
+
+def test_precomputed_search_results_match_a_fresh_search(vectordb):
+    from index_store import search_index
+
+    fields = ["Chemistry", "Physics"]
+    field_embeddings = vectordb.embeddings.embed_documents(fields)
+    search_results = search_index(vectordb, np.array(field_embeddings, dtype=np.float32), 30)
+    fresh = retrieve_by_field(vectordb, fields, field_embeddings, score_threshold=-1)
+    batched = retrieve_by_field(vectordb, fields, field_embeddings, score_threshold=-1,
+                                search_results=search_results)
+    assert [(doc.page_content, field) for doc, _, field in batched] == \
+        [(doc.page_content, field) for doc, _, field in fresh]
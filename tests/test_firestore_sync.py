@@ -0,0 +1,77 @@
+from fakes import FakeFirestore
+from firestore_sync import course_doc_id, desired_state, plan_operations, read_state, school_doc_id, sync_catalog
+from models import CourseType, ProgramEnum, School
+
+
+def school(name, *courses):
+    return School(school=name, courses=[CourseType(title=title, level=level) for title, level in courses])
+
+
+CATALOG = [
+    school("University of São Paulo", ("Master's in Physics", ProgramEnum.mtech), ("PhD in Physics", ProgramEnum.phd)),
+    school("Federal University of Minas Gerais", ("Master's in Law", ProgramEnum.mtech)),
+]
+
+
+def test_document_ids_ignore_spacing_and_case():
+    assert school_doc_id("University of  São Paulo") == school_doc_id("university of são paulo")
+    assert (course_doc_id("USP", "PhD in Physics", 'PhD')
+            != course_doc_id("USP", "PhD in Physics", "Master's"))
+
+
+def test_first_sync_inserts_everything_and_a_rerun_writes_nothing():
+    db = FakeFirestore()
+
+    first = sync_catalog(db, CATALOG)
+    writes = db.writes
+    second = sync_catalog(db, CATALOG)
+
+    assert (first['inserts'], first['updates'], first['deletes']) == (2 + 3, 0, 0)
+    assert (second['inserts'], second['updates'], second['deletes'], second['unchanged']) == (0, 0, 0, 5)
+    assert db.writes == writes
+    assert read_state(db) == desired_state(CATALOG)
+
+
+def test_changed_courses_are_updated_and_stale_ones_deleted():
+    db = FakeFirestore()
+    sync_catalog(db, CATALOG)
+
+    # Same normalized title, so the document is rewritten in place
+    catalog = [school("University of São Paulo", ("PhD in physics", ProgramEnum.phd)), CATALOG[1]]
+
+    report = sync_catalog(db, catalog)
+
+    assert (report['inserts'], report['updates'], report['deletes'], report['unchanged']) == (0, 1, 1, 3)
+    assert read_state(db) == desired_state(catalog)
+
+
+def test_schools_that_failed_this_run_are_not_deleted():
+    db = FakeFirestore()
+    sync_catalog(db, CATALOG)
+
+    report = sync_catalog(db, CATALOG[1:], keep_schools=["University of São Paulo"])
+
+    assert report['deletes'] == 0
+    assert report['kept'] == 1 + 2
+    assert read_state(db) == desired_state(CATALOG)
+
+
+def test_schools_that_left_the_catalog_are_pruned():
+    db = FakeFirestore()
+    sync_catalog(db, CATALOG)
+
+    report = sync_catalog(db, CATALOG[1:])
+
+    assert (report['deletes'], report['kept']) == (1 + 2, 0)
+    assert read_state(db) == desired_state(CATALOG[1:])
+
+
+def test_plan_operations_only_keeps_the_listed_school_ids():
+    db = FakeFirestore()
+    existing = desired_state(CATALOG)
+    keep = {school_doc_id("Federal University of Minas Gerais")}
+
+    operations, counts = plan_operations(db, existing, ({}, {}), keep=keep)
+
+    assert counts == {'inserts': 0, 'updates': 0, 'deletes': 1 + 2, 'unchanged': 0, 'kept': 1 + 1}
+    assert {operation for operation, _, _ in operations} == {'delete'}
@@ -0,0 +1,90 @@
+import pytest
+
+from fakes import FakeGCUBServer
+from http_scraper import iter_scrape_http, list_universities_http, parse_options, parse_programs, scrape_http
+
+PROGRAMS = {
+    '112': ['Mestrado em Ciência da Computação', 'Doutorado em Ciência da Computação'],
+    '87': ['Mestrado em Direito'],
+    '203': ['Doutorado em Física', 'Mestrado em Física'],
+    '45': ['Mestrado em Design & Arte'],
+}
+
+
+@pytest.fixture
+def gcub_server(fixture_text):
+    server = FakeGCUBServer(fixture_text('gcub', 'application_form.html'), PROGRAMS).start()
+    yield server
+    server.stop()
+
+
+def test_parse_options_reads_the_university_dropdown(fixture_text):
+    universities = parse_options(fixture_text('gcub', 'application_form.html'), 'universidade001')
+
+    assert universities == [
+        ('112', 'Universidade Federal de Minas Gerais (UFMG)'),
+        ('87', 'Universidade de São Paulo (USP)'),
+        ('203', 'Universidade Estadual de Campinas (UNICAMP)'),
+        ('45', 'Pontifícia Universidade Católica do Rio de Janeiro (PUC-Rio)'),
+    ]
+
+
+def test_parse_options_without_the_select_returns_nothing(fixture_text):
+    assert parse_options(fixture_text('gcub', 'application_form.html'), 'missing001') == []
+
+
+def test_parse_programs_reads_a_captured_response(fixture_text):
+    courses = parse_programs(fixture_text('gcub', 'programs_112.html'), 'text/html; charset=UTF-8')
+
+    assert courses == [
+        'Mestrado em Ciência da Computação',
+        'Doutorado em Ciência da Computação',
+        'Mestrado em Engenharia Elétrica',
+        'Doutorado em Estudos Linguísticos',
+    ]
+
+
+def test_parse_programs_accepts_json():
+    body = '[{"nome": "Mestrado em Direito"}, "Doutorado em Física"]'
+
+    assert parse_programs(body, 'application/json') == ['Mestrado em Direito', 'Doutorado em Física']
+
+
+def test_scrape_http_keeps_the_dropdown_order(gcub_server):
+    records = scrape_http(gcub_server.form_url, gcub_server.programs_url, concurrency=4)
+
+    assert [record['school'] for record in records] == [
+        'Universidade Federal de Minas Gerais (UFMG)',
+        'Universidade de São Paulo (USP)',
+        'Universidade Estadual de Campinas (UNICAMP)',
+        'Pontifícia Universidade Católica do Rio de Janeiro (PUC-Rio)',
+    ]
+    assert records[3]['courses'] == ['Mestrado em Design & Arte']
+
+
+def test_scrape_http_leaves_out_schools_that_keep_failing(fixture_text):
+    server = FakeGCUBServer(fixture_text('gcub', 'application_form.html'), PROGRAMS, failing={'87'}).start()
+    try:
+        records = scrape_http(server.form_url, server.programs_url, retries=2, backoff=0)
+    finally:
+        server.stop()
+
+    assert 'Universidade de São Paulo (USP)' not in [record['school'] for record in records]
+    assert len(records) == 3
+    # Every failing attempt is retried
+    assert server.requests == 3 + 2
+
+
+def test_iter_scrape_http_filters_and_skips(gcub_server):
+    records = list(iter_scrape_http(
+        gcub_server.form_url, gcub_server.programs_url,
+        school_names=['Universidade de São Paulo (USP)', 'Universidade Estadual de Campinas (UNICAMP)'],
+        skip={'Universidade de São Paulo (USP)'},
+    ))
+
+    assert records == [{'school': 'Universidade Estadual de Campinas (UNICAMP)',
+                         'courses': ['Doutorado em Física', 'Mestrado em Física']}]
+
+
+def test_list_universities_http(gcub_server):
+    assert len(list_universities_http(gcub_server.form_url)) == 4
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from hash_embeddings import HashEmbeddings
+from hybrid_search import BM25Index, HybridRanker, fold_accents, is_keyword_query, tokenize
+from index_store import build_store, load_vector_db
+from models import SearchFilter
+
+COURSES = [
+    ("Universidade Federal do Rio de Janeiro", "Computer Science", "PhD"),
+    ("Universidade Federal do Rio de Janeiro", "Computer Engineering", "Master's"),
+    ("Universidade de São Paulo", "Computer Science (PPGCC)", "Master's"),
+    ("Universidade de São Paulo", "Ciências Farmacêuticas", "PhD"),
+    ("Universidade Federal de Minas Gerais", "Data Science", "PhD"),
+    ("Universidade Federal de Minas Gerais", "Chemistry", "Master's"),
+]
+
+
+@pytest.fixture
+def vectordb(tmp_path):
+    embeddings = HashEmbeddings(dim=64)
+    metadatas = [{'school': school, 'course': course, 'level': level} for school, course, level in COURSES]
+    texts = [f"{school} {course} {level}" for school, course, level in COURSES]
+    build_store(str(tmp_path), texts, metadatas, embeddings.embed_documents(texts))
+    return load_vector_db(str(tmp_path), embeddings)
+
+
+def test_fold_accents():
+    assert fold_accents("Ciências Farmacêuticas, Educação") == "Ciencias Farmaceuticas, Educacao"
+
+
+def test_tokenize_drops_stopwords_and_folds_plurals():
+    assert tokenize("Eu quero o curso de Ciências da Computação") == ['quero', 'ciencia', 'computacao']
+    assert tokenize("I want to study the Sciences of Materials") == ['science', 'material']
+    # Short words and double-s endings keep their s
+    assert tokenize("Gas Business Physics") == ['gas', 'business', 'physic']
+
+
+def test_is_keyword_query():
+    assert is_keyword_query("Chemistry")
+    assert is_keyword_query("machine learning.")
+    assert is_keyword_query("PPGCC")
+    assert not is_keyword_query("")
+    assert not is_keyword_query("I have worked as a data analyst for five years")
+    assert not is_keyword_query("Chemistry. Physics")
+
+
+def test_bm25_ranks_matching_documents_by_term_rarity():
+    index = BM25Index(["computer science", "computer engineering", "political science", "chemistry"])
+    scores = index.scores("Computer Science")
+    assert set(scores) == {0, 1, 2}
+    assert scores[0] > scores[1] and scores[0] > scores[2]
+    assert not index.scores("zoology")
+    # Accents and case do not matter
+    assert BM25Index(["Ciências Farmacêuticas"]).scores("ciencias farmaceuticas")
+
+
+def test_course_code_query_ranks_its_course_first(vectordb):
+    ranker = HybridRanker(vectordb)
+    # Semantic neighbours of "computer science" as the vector search would return them, without the coded course
+    vector_hits = [(Document(page_content=f"{school} {course} {level}",
+                             metadata={'school': school, 'course': course, 'level': level}), score)
+                   for (school, course, level), score in zip([COURSES[0], COURSES[1], COURSES[4]], (0.8, 0.7, 0.6))]
+    query = "PPGCC"
+    query_embedding = vectordb.embeddings.embed_query(query)
+
+    ranked = ranker.rank(query, vector_hits, query_embedding, k=3)
+    assert ranked[0][0].metadata['course'] == "Computer Science (PPGCC)"
+    # The other slots still come from the vector hits
+    assert [doc.metadata['course'] for doc, _ in ranked[1:]] == ["Computer Science", "Computer Engineering"]
+    assert ranked[0][1] > ranked[1][1]
+
+
+def test_keyword_query_without_lexical_match_is_not_answered(vectordb):
+    ranker = HybridRanker(vectordb)
+    hits = [(vectordb.docstore.search("0"), 0.9)]
+    assert ranker.rank("zoology", hits, np.zeros(64, dtype=np.float32)) == []
+
+
+def test_lexical_matches_respect_the_filter(vectordb):
+    ranker = HybridRanker(vectordb)
+    ranked = ranker.rank("Computer Science", [], search_filter=SearchFilter(levels=["PhD"]))
+    assert ranked and {doc.metadata['level'] for doc, _ in ranked} == {"PhD"}
@@ -0,0 +1,201 @@
+import json
+import os
+import time
+
+import faiss
+import numpy as np
+import pytest
+
+import index_store
+from hash_embeddings import HashEmbeddings
+from index_store import (VERSIONS_DIR, IndexStore, MmapFlatIndex, _prune_versions, build_store, filter_matches,
+                         load_vector_db, migrate_legacy, read_manifest, search_index)
+from models import SearchFilter
+from vector_index import INDEX_META_FILE
+
+SCHOOLS = ["Universidade Federal do Rio de Janeiro", "Universidade de São Paulo", "Universidade de Brasília"]
+LEVELS = ["PhD", "Master's"]
+
+
+def catalog(count=60, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    metadatas = [{'school': SCHOOLS[row % 3], 'course': f"Course {row}", 'level': LEVELS[row % 2]}
+                 for row in range(count)]
+    texts = [f"{metadata['school']} {metadata['course']} {metadata['level']}" for metadata in metadatas]
+    return texts, metadatas, rng.standard_normal((count, dim)).astype(np.float32)
+
+
+def build(path, seed=0, **kwargs):
+    # Versions sort by their creation millisecond
+    time.sleep(0.002)
+    return build_store(str(path), *catalog(seed=seed), **kwargs)
+
+
+def versions(path):
+    return sorted(os.listdir(os.path.join(path, VERSIONS_DIR)))
+
+
+def test_rebuild_swaps_the_manifest_to_a_new_version(tmp_path):
+    first = build(tmp_path)
+    assert read_manifest(tmp_path)['version'] == first['version']
+    second = build(tmp_path, seed=1)
+    assert second['version'] > first['version']
+    assert read_manifest(tmp_path)['version'] == second['version']
+    # The previous version stays for readers that read the old manifest just before the swap
+    assert versions(tmp_path) == [first['version'], second['version']]
+    # No temporary manifest or version folders are left behind
+    assert sorted(os.listdir(tmp_path)) == ['manifest.json', VERSIONS_DIR]
+
+    store = IndexStore(str(tmp_path))
+    _, metadatas, vectors = catalog(seed=1)
+    assert store.path.endswith(second['version'])
+    assert len(store) == len(metadatas)
+    # Rows are stored in (level, school) partition order
+    for row in range(len(store)):
+        original = metadatas.index(store.metadata(row))
+        np.testing.assert_array_equal(store.vectors[row], vectors[original])
+
+
+def test_prune_versions_keeps_the_newest_and_the_current(tmp_path):
+    manifests = [build(tmp_path, seed=seed) for seed in range(4)]
+    assert versions(tmp_path) == [manifest['version'] for manifest in manifests[-2:]]
+
+    # The current version survives even when it is not among the newest
+    older, newest = versions(tmp_path)
+    _prune_versions(str(tmp_path), 1, older)
+    assert versions(tmp_path) == [older, newest]
+    # Hidden folders are writers' unfinished versions
+    os.makedirs(os.path.join(tmp_path, VERSIONS_DIR, ".12345.tmp"))
+    _prune_versions(str(tmp_path), 1, newest)
+    assert versions(tmp_path) == [".12345.tmp", newest]
+
+
+def test_reader_keeps_working_after_two_rebuilds(tmp_path):
+    build(tmp_path)
+    reader = load_vector_db(str(tmp_path), HashEmbeddings(dim=16))
+    version = reader.store.manifest['version']
+    queries = catalog()[2][:5]
+    before = reader.index.search(queries, 5)
+    documents = [reader.docstore.search(str(row)).metadata for row in range(len(reader.store))]
+
+    build(tmp_path, seed=1)
+    build(tmp_path, seed=2)
+    # Version N has been pruned from disk, but its memory maps still serve the old reader
+    assert version not in versions(tmp_path)
+    after = reader.index.search(queries, 5)
+    np.testing.assert_array_equal(before[1], after[1])
+    assert [reader.docstore.search(str(row)).metadata for row in range(len(reader.store))] == documents
+    # A new reader sees the latest version
+    assert load_vector_db(str(tmp_path), HashEmbeddings(dim=16)).store.manifest['version'] == versions(tmp_path)[-1]
+
+
+@pytest.mark.parametrize('block_size', [65536, 7])
+def test_mmap_flat_index_matches_faiss(block_size):
+    rng = np.random.default_rng(3)
+    vectors = rng.standard_normal((200, 24)).astype(np.float32)
+    queries = rng.standard_normal((9, 24)).astype(np.float32)
+    reference = faiss.IndexFlatL2(24)
+    reference.add(vectors)
+
+    index = MmapFlatIndex(vectors, np.einsum('ij,ij->i', vectors, vectors), block_size=block_size)
+    distances, labels = index.search(queries, 10)
+    expected_distances, expected_labels = reference.search(queries, 10)
+    np.testing.assert_array_equal(labels, expected_labels)
+    np.testing.assert_allclose(distances, expected_distances, rtol=1e-4, atol=1e-4)
+
+    # Restricted to row ranges, it matches a brute-force scan of those rows
+    ranges = [(10, 20), (150, 153)]
+    rows = np.concatenate([np.arange(start, end) for start, end in ranges])
+    distances, labels = index.search(queries, 20, ranges)
+    brute = ((queries[:, None, :] - vectors[None, rows, :]) ** 2).sum(axis=2)
+    np.testing.assert_array_equal(labels[:, :len(rows)], rows[np.argsort(brute, axis=1, kind='stable')])
+    # Fewer rows than k are padded like FAISS
+    assert (labels[:, len(rows):] == -1).all()
+
+
+def test_migrate_legacy_converts_a_langchain_index(tmp_path):
+    from langchain_community.vectorstores import FAISS
+
+    embeddings = HashEmbeddings(dim=32)
+    texts, metadatas, _ = catalog()
+    legacy = FAISS.from_texts(texts, embeddings, metadatas=metadatas)
+    legacy.save_local(str(tmp_path))
+    with open(os.path.join(tmp_path, INDEX_META_FILE), 'w') as f:
+        json.dump({'index_type': 'flat', 'embedding_backend': 'hash'}, f)
+
+    manifest = migrate_legacy(str(tmp_path))
+    assert manifest['count'] == len(texts) and manifest['embedding_backend'] == 'hash'
+    migrated = load_vector_db(str(tmp_path), embeddings)
+    assert sorted(migrated.docstore.search(str(row)).page_content for row in range(len(texts))) == sorted(texts)
+
+    # Every document keeps its distance to a query; hash vectors tie a lot, so compare whole result sets
+    query = embeddings.embed_query("Universidade de São Paulo Course 7 PhD")
+
+    def distances(vectordb):
+        return sorted((round(float(score), 4), doc.metadata['course'])
+                      for doc, score in vectordb.similarity_search_with_score_by_vector(query, k=len(texts)))
+    assert distances(migrated) == distances(legacy)
+
+
+def brute_force(vectors, metadatas, queries, k, search_filter):
+    rows = np.array([row for row, metadata in enumerate(metadatas) if filter_matches(search_filter, metadata)])
+    distances = ((queries[:, None, :] - vectors[None, rows, :]) ** 2).sum(axis=2)
+    return rows[np.argsort(distances, axis=1, kind='stable')[:, :k]]
+
+
+FILTERS = [SearchFilter(levels=["PhD"]), SearchFilter(schools=[SCHOOLS[1]]),
+           SearchFilter(levels=["Master's"], schools=[SCHOOLS[0], SCHOOLS[2]])]
+
+
+def assert_filtered(vectordb, metadatas, labels, search_filter):
+    found = [[vectordb.docstore.search(str(label)).metadata for label in row if label != -1] for row in labels]
+    assert all(filter_matches(search_filter, metadata) for row in found for metadata in row)
+    return found
+
+
+@pytest.mark.parametrize('search_filter', FILTERS)
+def test_small_filtered_searches_scan_exactly(tmp_path, search_filter):
+    texts, metadatas, vectors = catalog()
+    build_store(str(tmp_path), texts, metadatas, vectors)
+    vectordb = load_vector_db(str(tmp_path), HashEmbeddings(dim=16))
+    queries = np.random.default_rng(5).standard_normal((4, 16)).astype(np.float32)
+
+    _, labels = search_index(vectordb, queries, 5, search_filter)
+    found = assert_filtered(vectordb, metadatas, labels, search_filter)
+    expected = brute_force(vectors, metadatas, queries, 5, search_filter)
+    assert found == [[metadatas[row] for row in row_ids] for row_ids in expected]
+
+
+@pytest.mark.parametrize('search_filter', FILTERS)
+def test_large_filtered_searches_use_an_id_selector(tmp_path, monkeypatch, search_filter):
+    texts, metadatas, vectors = catalog()
+    build_store(str(tmp_path), texts, metadatas, vectors, index_type='hnsw')
+    vectordb = load_vector_db(str(tmp_path), HashEmbeddings(dim=16))
+    assert not isinstance(vectordb.index, MmapFlatIndex)
+    # Every selection counts as large, so the HNSW index is searched with IDSelectorRange/IDSelectorBatch
+    monkeypatch.setattr(index_store, 'EXACT_FILTER_ROWS', 0)
+    monkeypatch.setattr(MmapFlatIndex, 'search', None)
+    queries = np.random.default_rng(5).standard_normal((4, 16)).astype(np.float32)
+
+    # With k above the selection size the approximate search must return exactly the selected rows
+    _, labels = search_index(vectordb, queries, len(texts), search_filter)
+    found = assert_filtered(vectordb, metadatas, labels, search_filter)
+    expected = brute_force(vectors, metadatas, queries, len(texts), search_filter)
+    for row, row_ids in zip(found, expected):
+        assert sorted(metadata['course'] for metadata in row) == sorted(metadatas[i]['course'] for i in row_ids)
+
+
+@pytest.mark.parametrize('search_filter', FILTERS)
+def test_legacy_filtered_searches_select_ids_from_the_docstore(search_filter):
+    from langchain_community.vectorstores import FAISS
+
+    texts, metadatas, vectors = catalog()
+    legacy = FAISS.from_embeddings(list(zip(texts, vectors.tolist())), HashEmbeddings(dim=16), metadatas=metadatas)
+    assert getattr(legacy, 'store', None) is None
+    queries = np.random.default_rng(5).standard_normal((4, 16)).astype(np.float32)
+
+    _, labels = search_index(legacy, queries, 5, search_filter)
+    found = [[legacy.docstore.search(legacy.index_to_docstore_id[int(label)]).metadata for label in row]
+             for row in labels]
+    expected = brute_force(vectors, metadatas, queries, 5, search_filter)
+    assert found == [[metadatas[row] for row in row_ids] for row_ids in expected]
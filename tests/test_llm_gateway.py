@@ -0,0 +1,139 @@
+import time
+
+import pytest
+
+from fakes import FakeChatModel
+from llm_gateway import (TIMEOUT, CircuitBreaker, CircuitOpenError, DeadlineExceeded, LLMGateway, TokenBucket,
+                         chat_model)
+
+
+class RateLimited(Exception):
+    code = 429
+
+
+class FlakyChatModel(FakeChatModel):
+    # FakeChatModel that raises ``error`` while it is set
+    def __init__(self):
+        super().__init__(answer='{"recommendations": []}')
+        self.error = None
+
+    def invoke(self, prompt_text):
+        if self.error is not None:
+            self.calls += 1
+            raise self.error
+        return super().invoke(prompt_text)
+
+
+@pytest.fixture
+def model():
+    return FlakyChatModel()
+
+
+@pytest.fixture
+def gateway(model):
+    gateway = LLMGateway(model, name='test', requests_per_minute=0, retries=0, backoff=0,
+                         breaker_failures=2, breaker_reset_seconds=0.2)
+    yield gateway
+    gateway.close()
+
+
+def open_circuit(gateway, model):
+    model.error = RuntimeError("boom")
+    for attempt in range(2):
+        with pytest.raises(RuntimeError):
+            gateway.invoke(f"failing {attempt}")
+    assert gateway.breaker.state == 'open'
+
+
+def start_trial(gateway, model):
+    open_circuit(gateway, model)
+    model.error = None
+    time.sleep(0.25)
+
+
+def test_breaker_allows_one_trial_after_the_reset():
+    breaker = CircuitBreaker('test', failure_threshold=1, reset_seconds=0.2)
+    breaker.record(False)
+    assert breaker.allow() is None
+
+    time.sleep(0.25)
+
+    assert breaker.allow() == 'trial'
+    assert breaker.allow() is None
+    breaker.record(True)
+    assert breaker.allow() == 'closed'
+
+
+def test_open_circuit_rejects_calls_without_reaching_the_model(gateway, model):
+    open_circuit(gateway, model)
+    calls = model.calls
+
+    with pytest.raises(CircuitOpenError):
+        gateway.invoke("rejected")
+
+    assert model.calls == calls
+
+
+def test_rate_limits_do_not_open_the_circuit(gateway, model):
+    model.error = RateLimited()
+    for attempt in range(3):
+        with pytest.raises(RateLimited):
+            gateway.invoke(f"limited {attempt}")
+
+    assert gateway.breaker.state == 'closed'
+
+
+def test_a_rate_limited_trial_does_not_wedge_the_breaker(gateway, model):
+    start_trial(gateway, model)
+    model.error = RateLimited()
+    with pytest.raises(RateLimited):
+        gateway.invoke("trial")
+
+    model.error = None
+    gateway.invoke("next trial")
+
+    assert gateway.breaker.state == 'closed'
+
+
+def test_a_trial_that_misses_its_deadline_in_the_queue_is_released(gateway, model):
+    start_trial(gateway, model)
+    gateway.requests = TokenBucket(1)
+    gateway.requests.drain()
+    with pytest.raises(DeadlineExceeded):
+        gateway.invoke("queued trial", timeout=0.5)
+    assert model.calls == 2
+
+    gateway.requests = None
+    gateway.invoke("next trial")
+
+    assert gateway.breaker.state == 'closed'
+
+
+def test_a_trial_stream_closed_early_is_released(gateway, model):
+    start_trial(gateway, model)
+    stream = gateway.stream("trial stream")
+    next(stream)
+    stream.close()
+
+    gateway.invoke("next trial")
+
+    assert gateway.breaker.state == 'closed'
+
+
+def test_calls_past_their_deadline_are_counted_until_they_finish():
+    gateway = LLMGateway(FakeChatModel(latency=0.3), name='slow', requests_per_minute=0, timeout=0.05, retries=0)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            gateway.invoke("slow")
+        # The model request still holds a call thread
+        assert gateway.get_metrics()['abandoned_calls'] == 1
+        time.sleep(0.4)
+        assert gateway.get_metrics()['abandoned_calls'] == 0
+    finally:
+        gateway.close()
+
+
+def test_gemini_clients_leave_retries_to_the_gateway():
+    client = chat_model("gemini-pro", "test-key")
+    assert client.max_retries == 0
+    assert client.timeout == TIMEOUT
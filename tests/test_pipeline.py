@@ -0,0 +1,72 @@
+import json
+
+from models import CourseType, ProgramEnum, School
+from pipeline import PipelineJournal, run_pipeline
+
+RECORDS = [{'school': f"Universidade {index}", 'courses': [f"Mestrado em Área {index}"]} for index in range(6)]
+
+
+def translate(records):
+    schools = [School(school=data['school'].replace("Universidade", "University"),
+                      courses=[CourseType(title=course, level=ProgramEnum.mtech) for course in data['courses']])
+               for data in records]
+    return schools, {'failed': []}
+
+
+def test_journal_replays_every_stage(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = PipelineJournal(path)
+    journal.record('scraped', RECORDS[0]['school'], RECORDS[0])
+    journal.record('scraped', RECORDS[1]['school'], RECORDS[1])
+    journal.record('translated', RECORDS[1]['school'], translate(RECORDS[1:2])[0][0].model_dump(mode='json'))
+    journal.record('scraped', RECORDS[2]['school'], RECORDS[2])
+    journal.record('persisted', RECORDS[2]['school'])
+    journal.record('failed', RECORDS[3]['school'], {'error': "timeout"})
+
+    reopened = PipelineJournal(path)
+
+    assert reopened.pending_translation() == [RECORDS[0]]
+    assert reopened.pending_persistence() == [(RECORDS[1]['school'], translate(RECORDS[1:2])[0][0])]
+    assert reopened.persisted == {RECORDS[2]['school']}
+    assert RECORDS[3]['school'] not in reopened.scraped
+
+
+def test_complete_moves_the_journal_aside(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    journal = PipelineJournal(str(path))
+    journal.record('scraped', RECORDS[0]['school'], RECORDS[0])
+
+    journal.complete()
+
+    assert not path.exists()
+    assert json.loads((tmp_path / 'journal.jsonl.last').read_text(encoding='utf-8'))['school'] == RECORDS[0]['school']
+    assert journal.pending_translation() == []
+    assert PipelineJournal(str(path)).scraped == {}
+
+
+def test_a_rerun_resumes_each_school_where_it_stopped(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = PipelineJournal(path)
+    # The previous run scraped four schools, translated two and persisted one before it stopped
+    for data in RECORDS[:4]:
+        journal.record('scraped', data['school'], data)
+    for data, school in zip(RECORDS[:2], translate(RECORDS[:2])[0]):
+        journal.record('translated', data['school'], school.model_dump(mode='json'))
+    journal.record('persisted', RECORDS[0]['school'])
+
+    scraped, translated, persisted = [], [], []
+
+    def scrape_iter(skip):
+        scraped.extend(data['school'] for data in RECORDS if data['school'] not in skip)
+        return (data for data in RECORDS if data['school'] not in skip)
+
+    def counting_translate(records):
+        translated.extend(data['school'] for data in records)
+        return translate(records)
+
+    run_pipeline(scrape_iter, counting_translate, persisted.extend, PipelineJournal(path), batch_size=2)
+
+    assert scraped == [data['school'] for data in RECORDS[4:]]
+    assert sorted(translated) == sorted(data['school'] for data in RECORDS[2:])
+    assert sorted(school.school for school in persisted) == sorted(
+        data['school'].replace("Universidade", "University") for data in RECORDS[1:])
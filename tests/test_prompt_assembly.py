@@ -0,0 +1,85 @@
+import pytest
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage
+
+from prompt_assembly import TokenMeter, assemble_prompt, count_tokens, token_meter, usage_tokens
+
+
+@pytest.fixture(autouse=True)
+def approx_tokenizer(monkeypatch):
+    # tiktoken downloads its BPE file, so count with the offline approximation
+    monkeypatch.setenv('TOKENIZER', 'approx')
+
+
+def hits(count=40):
+    # Every course costs about the same, so the budget rather than the cost decides what is dropped
+    return [(Document(page_content=f"School {number % 7} Course {number:03d} PhD",
+                      metadata={'school': f"School {number % 7}", 'course': f"Course {number:03d}",
+                                'level': "PhD"}), 1 - number / 100)
+            for number in range(count)]
+
+
+def base_tokens(question):
+    prompt_text, _ = assemble_prompt(question, [], token_budget=10 ** 6, max_examples=1)
+    return count_tokens(prompt_text)
+
+
+@pytest.mark.parametrize('extra', [0, 25, 80, 200, 10 ** 6])
+def test_prompt_stays_within_the_budget(extra):
+    question = "I have a background in chemistry and materials science."
+    budget = base_tokens(question) + extra
+    prompt_text, stats = assemble_prompt(question, hits(), token_budget=budget)
+    assert count_tokens(prompt_text) == stats['prompt_tokens'] <= budget
+    assert stats['courses_included'] + stats['courses_dropped'] == 40
+    if extra == 10 ** 6:
+        assert stats['courses_dropped'] == 0
+    # The minimum few-shot example is kept even when nothing else fits
+    assert stats['examples'] >= 1
+
+
+def test_least_relevant_courses_are_dropped_first():
+    question = "Chemistry"
+    shuffled = hits()[::3] + hits()[1::3] + hits()[2::3]
+    _, stats = assemble_prompt(question, shuffled, token_budget=base_tokens(question) + 120, max_examples=1)
+    included = stats['hits']
+    assert 0 < len(included) < 40
+    # The included courses are exactly the most relevant ones, best first
+    assert included == sorted(hits(), key=lambda hit: hit[1], reverse=True)[:len(included)]
+
+
+def test_presorted_hits_keep_their_order():
+    question = "Chemistry"
+    reordered = hits(10)[::-1]
+    _, stats = assemble_prompt(question, reordered, token_budget=10 ** 6, presorted=True)
+    assert stats['hits'] == reordered
+
+
+def test_token_meter_counts_prompt_and_completion_tokens():
+    meter = TokenMeter()
+    meter.record(100, 20)
+    meter.record(50, 10)
+    assert meter.get_metrics() == {'calls': 2, 'prompt_tokens': 150, 'completion_tokens': 30,
+                                   'avg_prompt_tokens': 75.0, 'avg_completion_tokens': 15.0}
+    assert TokenMeter().get_metrics()['avg_prompt_tokens'] == 0.0
+
+
+def test_usage_tokens_prefers_the_providers_counts():
+    message = AIMessage(content="{}", usage_metadata={'input_tokens': 321, 'output_tokens': 12, 'total_tokens': 333})
+    assert usage_tokens(message, "prompt", "{}") == (321, 12)
+    assert usage_tokens(AIMessage(content="{}"), "a prompt text", "{}") == (count_tokens("a prompt text"),
+                                                                           count_tokens("{}"))
+
+
+def test_recommendations_record_their_tokens(hash_index, monkeypatch):
+    from configs.google_generative_ai import GoogleGenerativeAIService
+    from fakes import FakeChatModel
+
+    monkeypatch.setattr(hash_index, 'FAST_PATH_ENABLED', False)
+    before = token_meter.get_metrics()
+    service = GoogleGenerativeAIService(hash_index.env_config, llm_instance=FakeChatModel())
+    resp = hash_index.recommend_courses_from_vector("Computer Science research", service)
+    after = token_meter.get_metrics()
+    assert after['calls'] == before['calls'] + 1
+    assert after['prompt_tokens'] - before['prompt_tokens'] == resp['tokens']['prompt'] > 0
+    assert after['completion_tokens'] - before['completion_tokens'] == resp['tokens']['completion'] \
+        == count_tokens(resp['result'])
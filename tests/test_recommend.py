@@ -0,0 +1,34 @@
+from conftest import CATALOG
+
+
+def test_list_schools_reads_the_index_store(hash_index):
+    assert hash_index.list_schools() == sorted(CATALOG)
+
+
+def test_rebuild_only_embeds_the_changed_course(hash_index, monkeypatch):
+    from hash_embeddings import HashEmbeddings
+    from index_store import IndexStore
+
+    embedded = []
+    embed_documents = HashEmbeddings.embed_documents
+
+    def counting_embed_documents(self, texts):
+        embedded.extend(texts)
+        return embed_documents(self, texts)
+    monkeypatch.setattr(HashEmbeddings, 'embed_documents', counting_embed_documents)
+    version = IndexStore('faiss_index').manifest['version']
+
+    # Nothing changed: nothing is embedded and the index version stays
+    hash_index.create_vector_db(*hash_index.generate_documents(CATALOG))
+    assert embedded == []
+    assert IndexStore('faiss_index').manifest['version'] == version
+
+    catalog = {school: [dict(course) for course in courses] for school, courses in CATALOG.items()}
+    catalog["Universidade de São Paulo"][1]['name'] = "Epidemiology"
+    hash_index.create_vector_db(*hash_index.generate_documents(catalog))
+    assert embedded == ["Universidade de São Paulo Epidemiology PhD"]
+
+    store = IndexStore('faiss_index')
+    assert store.manifest['version'] != version
+    assert sorted(store.metadata(row)['course'] for row in range(len(store))) == sorted(
+        course['name'] for courses in catalog.values() for course in courses)
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from recommendation_stream import RecommendationStreamParser, parse_recommendations
+
+ANSWER = json.dumps({'recommendations': [
+    {'school': 'Universidade "{Federal}" de São Paulo \\ }', 'courses': [
+        {'name': 'Master\'s in Data {Science}', 'level': "Master's"},
+    ]},
+    {'school': 'University of Campinas', 'courses': [
+        {'name': 'PhD in Physics', 'level': 'PhD'},
+        {'name': 'Master in Chemistry', 'level': "Master's"},
+    ]},
+]}, ensure_ascii=False)
+
+
+def feed_in_chunks(text, size):
+    parser = RecommendationStreamParser()
+    recommendations = []
+    for start in range(0, len(text), size):
+        recommendations.extend(parser.feed(text[start:start + size]))
+    return parser, recommendations
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 16, len(ANSWER)])
+def test_chunk_boundaries_do_not_change_the_result(size):
+    parser, recommendations = feed_in_chunks(ANSWER, size)
+
+    assert [recommendation.school for recommendation in recommendations] == [
+        'Universidade "{Federal}" de São Paulo \\ }', 'University of Campinas']
+    assert recommendations[0].courses[0].name == "Master's in Data {Science}"
+    assert [course.level.value for course in recommendations[1].courses] == ['PhD', "Master's"]
+    assert parser.finished
+    assert parser.invalid == 0
+
+
+def test_each_school_is_yielded_as_soon_as_it_closes():
+    parser = RecommendationStreamParser()
+    first_end = ANSWER.index('University of Campinas')
+
+    assert parser.feed('{"recommend') == []
+    assert [recommendation.school for recommendation in parser.feed(ANSWER[len('{"recommend'):first_end])] == [
+        'Universidade "{Federal}" de São Paulo \\ }']
+    assert not parser.finished
+    assert [recommendation.school for recommendation in parser.feed(ANSWER[first_end:])] == ['University of Campinas']
+    assert parser.finished
+
+
+def test_a_truncated_answer_keeps_complete_schools_but_is_not_finished():
+    cut = ANSWER.index('"PhD in Physics"')
+
+    parser, recommendations = feed_in_chunks(ANSWER[:cut], 5)
+
+    assert len(recommendations) == 1
+    assert not parser.finished
+
+
+def test_invalid_courses_and_schools_are_counted():
+    text = json.dumps({'recommendations': [
+        {'school': 'A', 'courses': [{'name': 'PhD in Law', 'level': 'PhD'}, {'name': 'Bad level', 'level': 'BSc'}]},
+        {'school': 'B', 'courses': [{'level': 'PhD'}]},
+        {'courses': [{'name': 'No school', 'level': 'PhD'}]},
+    ]})
+
+    parser, recommendations = feed_in_chunks(text, 4)
+
+    assert [(recommendation.school, len(recommendation.courses)) for recommendation in recommendations] == [('A', 1)]
+    assert parser.invalid == 3
+    assert parser.finished
+
+
+def test_text_after_the_array_is_ignored():
+    parser = RecommendationStreamParser()
+    parser.feed(ANSWER)
+
+    assert parser.feed('{"school": "Late", "courses": []}') == []
+    assert parser.finished
+
+
+def test_parse_recommendations_on_a_complete_answer():
+    assert len(parse_recommendations(ANSWER)) == 2
+    assert parse_recommendations("I could not find any courses.") == []
@@ -0,0 +1,122 @@
+import random
+import types
+
+import numpy as np
+import pytest
+
+import response_cache as response_cache_module
+from response_cache import ResponseCache
+
+DIM = 8
+
+
+def unit(*values):
+    vector = np.zeros(DIM, dtype=np.float32)
+    vector[:len(values)] = values
+    return vector / np.linalg.norm(vector)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Stands in for the time module inside response_cache, so TTL and LRU order do not depend on the wall clock
+    fake = types.SimpleNamespace(now=1_000_000.0, perf_counter=lambda: 0.0)
+    fake.time = lambda: fake.now
+    monkeypatch.setattr(response_cache_module, 'time', fake)
+    return fake
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return ResponseCache(str(tmp_path / 'cache.sqlite3'), similarity_threshold=0.9, max_entries=3, ttl_seconds=100)
+
+
+def test_exact_hits_ignore_case_and_spacing(cache):
+    cache.put("Machine  Learning", unit(1), 'v1', {'result': 'ml'})
+
+    assert cache.get("machine learning ", unit(0, 1), 'v1') == {'result': 'ml', 'cache': 'exact'}
+
+
+def test_semantic_hits_need_the_threshold(cache):
+    cache.put("machine learning", unit(1), 'v1', {'result': 'ml'})
+    cos = 0.9
+    at_threshold = unit(cos, np.sqrt(1 - cos ** 2) - 1e-4)
+    below = unit(0.85, np.sqrt(1 - 0.85 ** 2))
+
+    assert cache.get("statistical learning", at_threshold, 'v1') == {'result': 'ml', 'cache': 'semantic'}
+    assert cache.get("data mining", below, 'v1') is None
+    assert cache.metrics['semantic_hits'] == 1 and cache.metrics['misses'] == 1
+
+
+def test_entries_are_scoped_to_the_index_version(cache):
+    cache.put("chemistry", unit(1), 'v1', {'result': 'old'})
+
+    assert cache.get("chemistry", unit(1), 'v2') is None
+    cache.put("chemistry", unit(1), 'v2', {'result': 'new'})
+    assert cache.get("chemistry", unit(1), 'v1')['result'] == 'old'
+    assert cache.get("chemistry", unit(1), 'v2')['result'] == 'new'
+
+
+def test_entries_expire_after_the_ttl(cache, clock):
+    cache.put("physics", unit(1), 'v1', {'result': 'physics'})
+
+    clock.now += 101
+
+    assert cache.get("physics", unit(1), 'v1') is None
+    # The next store deletes it, from SQLite and from the similarity matrix
+    cache.put("law", unit(0, 1), 'v1', {'result': 'law'})
+    assert cache._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 1
+    assert cache._matrix_keys == [key for key, in cache._conn.execute("SELECT key FROM responses")]
+
+
+def test_the_least_recently_used_entry_is_evicted(cache, clock):
+    for number, query in enumerate(["law", "physics", "chemistry"]):
+        clock.now += 1
+        cache.put(query, unit(*([0] * number + [1])), 'v1', {'result': query})
+    clock.now += 1
+    assert cache.get("law", unit(1), 'v1') is not None
+
+    clock.now += 1
+    cache.put("biology", unit(0, 0, 0, 1), 'v1', {'result': 'biology'})
+
+    assert cache.get("physics", unit(0, 1), 'v1') is None
+    assert [cache.get(query, unit(0, 0, 0, 0, 1), 'v1') is not None
+            for query in ("law", "chemistry", "biology")] == [True, True, True]
+
+
+def test_matrix_mirror_matches_a_fresh_load(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite3'), max_entries=40, ttl_seconds=10 ** 9)
+    rng = random.Random(0)
+    vectors = np.random.default_rng(0).normal(size=(60, DIM)).astype(np.float32)
+    cache.get("warm up", vectors[0], 'v1')
+    for step in range(400):
+        clock.now += 1
+        number = rng.randrange(60)
+        version = 'v1' if rng.random() < 0.8 else 'v2'
+        cache.put(f"query {number}", vectors[number], version, {'result': number})
+        if step % 50 == 0:
+            # Replacing an existing key rewrites its row in place
+            cache.put(f"query {number}", vectors[(number + 1) % 60], version, {'result': number})
+
+    mirrored = dict(zip(cache._matrix_keys, cache._matrix[:cache._matrix_size]))
+    cache._load_matrix('v1')
+    loaded = dict(zip(cache._matrix_keys, cache._matrix[:cache._matrix_size]))
+
+    assert mirrored.keys() == loaded.keys()
+    assert len(cache._matrix_rows) == cache._matrix_size == len(cache._matrix_keys)
+    for key, vector in loaded.items():
+        np.testing.assert_allclose(mirrored[key], vector)
+
+
+def test_the_registry_opens_the_cache_on_first_use(tmp_path, monkeypatch):
+    import recommend
+    from configs.resources import resource_registry
+
+    path = tmp_path / 'lazy.sqlite3'
+    monkeypatch.setenv('RESPONSE_CACHE_PATH', str(path))
+    assert not path.exists()
+
+    cache = recommend.get_response_cache()
+
+    assert path.exists()
+    assert recommend.get_response_cache() is cache
+    resource_registry.invalidate('response_cache')
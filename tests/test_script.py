@@ -0,0 +1,139 @@
+import argparse
+import functools
+import json
+
+import pytest
+from langchain_core.messages import AIMessage
+
+import script
+from fakes import FakeFirestore, FakeGCUBServer, FakeTranslationLLM
+from pipeline import PipelineJournal
+
+PROGRAMS = {
+    '112': ['Mestrado em Ciência da Computação', 'Doutorado em Ciência da Computação'],
+    '87': ['Mestrado em Direito'],
+    '203': ['Doutorado em Física', 'Mestrado em Física'],
+    '45': ['Mestrado em Design & Arte'],
+}
+
+
+@pytest.fixture
+def gcub_server(fixture_text):
+    server = FakeGCUBServer(fixture_text('gcub', 'application_form.html'),
+                            {value: list(courses) for value, courses in PROGRAMS.items()}).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def fakes(monkeypatch):
+    """One fake LLM and Firestore for every run, recording how often a run asks for them."""
+    llm, db, requested = FakeTranslationLLM(), FakeFirestore(), []
+
+    def create_translation_llm(fake=False):
+        requested.append('llm')
+        return llm
+
+    def get_firestore_client(fake=False):
+        requested.append('firestore')
+        return db
+    monkeypatch.setattr(script, 'create_translation_llm', create_translation_llm)
+    monkeypatch.setattr(script, 'get_firestore_client', get_firestore_client)
+    return llm, db, requested
+
+
+def changed_only_args(server, tmp_path, **overrides):
+    return argparse.Namespace(**{
+        'backend': 'http', 'url': server.form_url, 'programs_url': server.programs_url, 'workers': 1,
+        'retries': 1, 'backoff': 0.01, 'token_budget': 2000, 'llm_concurrency': 2, 'requests_per_minute': 0,
+        'translation_memory': str(tmp_path / "translation_memory.sqlite3"), 'fake_llm': True,
+        'fake_firestore': True, 'snapshot': "", 'scrape_state': str(tmp_path / "scrape_state.json"),
+        'probe': 0, 'diff_file': "", **overrides,
+    })
+
+
+def test_an_unchanged_catalog_makes_no_llm_or_firestore_calls(gcub_server, fakes, tmp_path):
+    llm, db, requested = fakes
+    script.run_changed(changed_only_args(gcub_server, tmp_path))
+    assert llm.calls and db.writes
+    calls, reads, writes, commits = llm.calls, db.reads, db.writes, db.commits
+    requested.clear()
+
+    script.run_changed(changed_only_args(gcub_server, tmp_path))
+    assert requested == []
+    assert (llm.calls, db.reads, db.writes, db.commits) == (calls, reads, writes, commits)
+
+
+def test_only_changed_schools_are_translated_and_saved(gcub_server, fakes, tmp_path):
+    llm, db, _ = fakes
+    script.run_changed(changed_only_args(gcub_server, tmp_path))
+    calls, writes = llm.calls, db.writes
+    gcub_server.programs['87'] = ['Mestrado em Direito', 'Doutorado em Direito']
+    diff_file = tmp_path / "diff.json"
+
+    script.run_changed(changed_only_args(gcub_server, tmp_path, diff_file=str(diff_file)))
+    diff = json.loads(diff_file.read_text(encoding='utf-8'))
+    assert diff['changed'] == ["Universidade de São Paulo (USP)"] and not diff['added'] and not diff['removed']
+    assert llm.calls == calls + 1
+    assert db.writes > writes
+
+
+def test_probe_stops_when_the_sample_is_unchanged(gcub_server, fakes, tmp_path):
+    _, _, requested = fakes
+    script.run_changed(changed_only_args(gcub_server, tmp_path))
+    requested.clear()
+    gcub_server.requests = 0
+
+    script.run_changed(changed_only_args(gcub_server, tmp_path, probe=2))
+    # Only the two probed universities are scraped, and nothing downstream runs
+    assert gcub_server.requests == 2
+    assert requested == []
+
+
+def test_probe_that_finds_a_change_scrapes_everything(gcub_server, fakes, tmp_path):
+    llm, _, _ = fakes
+    script.run_changed(changed_only_args(gcub_server, tmp_path))
+    calls = llm.calls
+    for courses in gcub_server.programs.values():
+        courses.append('Doutorado em Química')
+    gcub_server.requests = 0
+
+    script.run_changed(changed_only_args(gcub_server, tmp_path, probe=1))
+    assert gcub_server.requests == 1 + len(PROGRAMS)
+    assert llm.calls > calls
+
+
+class FailingTranslationLLM(FakeTranslationLLM):
+    # Answers one school with a course that was never sent, so only that school fails, until it recovers
+    def __init__(self, school):
+        super().__init__()
+        self.school = school
+
+    def invoke(self, prompt_text):
+        reply = json.loads(super().invoke(prompt_text).content)
+        for item in reply['schools']:
+            if item['school'] == self.school:
+                item['courses'][0]['source'] = "Mestrado em Outra Coisa"
+        return AIMessage(content=json.dumps(reply, ensure_ascii=False))
+
+
+def test_streaming_keeps_failed_schools_pending(gcub_server, monkeypatch, tmp_path):
+    failing_school = "Universidade de São Paulo (USP)"
+    llm, db = FailingTranslationLLM(failing_school), FakeFirestore()
+    monkeypatch.setattr(script, 'create_translation_llm', lambda fake=False: llm)
+    monkeypatch.setattr(script.BatchTranslator, '__init__', functools.partialmethod(
+        script.BatchTranslator.__init__, retries=1, backoff=0))
+    journal = tmp_path / "journal.jsonl"
+    args = changed_only_args(gcub_server, tmp_path, journal=str(journal), headless=True, translation_memory="")
+
+    report = script.run_streaming(args, db)
+    assert [failure['school'] for failure in report['failed']] == [failing_school]
+    # The journal is not completed, so the failed school is still pending
+    assert journal.exists() and not (tmp_path / "journal.jsonl.last").exists()
+    assert [data['school'] for data in PipelineJournal(str(journal)).pending_translation()] == [failing_school]
+
+    llm.school = None
+    gcub_server.requests = 0
+    report = script.run_streaming(args, db)
+    assert report['failed'] == [] and gcub_server.requests == 0
+    assert (tmp_path / "journal.jsonl.last").exists() and not journal.exists()
@@ -0,0 +1,73 @@
+import shutil
+
+import pytest
+from selenium.common.exceptions import WebDriverException
+
+import selenium_scraper
+from fakes import FakeGCUBServer
+
+PROGRAMS = {
+    '112': ['Mestrado em Ciência da Computação', 'Doutorado em Ciência da Computação'],
+    '87': ['Mestrado em Direito'],
+    '203': ['Doutorado em Física', 'Mestrado em Física'],
+    '45': ['Mestrado em Design & Arte'],
+}
+SCHOOLS = [
+    'Universidade Federal de Minas Gerais (UFMG)',
+    'Universidade de São Paulo (USP)',
+    'Universidade Estadual de Campinas (UNICAMP)',
+    'Pontifícia Universidade Católica do Rio de Janeiro (PUC-Rio)',
+]
+
+needs_chrome = pytest.mark.skipif(
+    not any(shutil.which(name) for name in ('google-chrome', 'chromium', 'chromium-browser', 'chrome')),
+    reason="Chrome is not installed"
+)
+
+
+@pytest.fixture
+def form_html(fixture_text):
+    return fixture_text('gcub', 'application_form.html')
+
+
+def test_a_crashed_shard_only_loses_its_own_schools(monkeypatch):
+    def fake_iter_scrape(url, headless, retries, backoff, names):
+        for name in names:
+            if name == SCHOOLS[2]:
+                raise WebDriverException("chrome not reachable")
+            yield {'school': name, 'courses': ['Mestrado']}
+
+    monkeypatch.setattr(selenium_scraper, 'iter_scrape', fake_iter_scrape)
+
+    records = selenium_scraper.scrape('http://unused', workers=2, school_names=SCHOOLS)
+
+    # Shard 0 is UFMG and UNICAMP, shard 1 is USP and PUC-Rio
+    assert [data['school'] for data in records] == [SCHOOLS[0], SCHOOLS[1], SCHOOLS[3]]
+
+
+@needs_chrome
+def test_iter_scrape_reads_the_form(form_html):
+    server = FakeGCUBServer(form_html, PROGRAMS).start()
+    try:
+        records = list(selenium_scraper.iter_scrape(server.form_url, headless=True, retries=3))
+    finally:
+        server.stop()
+
+    assert [data['school'] for data in records] == SCHOOLS
+    assert records[3]['courses'] == ['Mestrado em Design & Arte']
+
+
+@needs_chrome
+def test_a_retry_accepts_a_list_that_arrived_after_the_timeout(form_html):
+    # Every course list takes longer than the wait, so only a retry can pick it up
+    server = FakeGCUBServer(form_html, PROGRAMS, latency=1.0).start()
+    driver = selenium_scraper.create_driver(headless=True)
+    try:
+        university_select = selenium_scraper.open_application_form(driver, server.form_url)
+        data = selenium_scraper.scrape_school(driver, university_select, SCHOOLS[2], retries=4, backoff=0.1,
+                                              timeout=0.5)
+    finally:
+        driver.quit()
+        server.stop()
+
+    assert data == {'school': SCHOOLS[2], 'courses': PROGRAMS['203']}
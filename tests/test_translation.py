@@ -0,0 +1,80 @@
+import json
+
+from langchain_core.messages import AIMessage
+
+from fakes import FakeTranslationLLM
+from translation import BatchTranslator
+from translation_memory import TranslationMemory
+
+DATA = [
+    {'school': "Universidade de São Paulo (USP)",
+     'courses': ["Mestrado em Física", "Doutorado em Física", "Mestrado em Direito"]},
+    {'school': "Universidade Estadual de Campinas (UNICAMP)",
+     'courses': ["Doutorado em Química", "Mestrado em Química"]},
+    {'school': "Universidade Federal de Minas Gerais (UFMG)",
+     'courses': ["mestrado em  física", "Doutorado em Letras"]},
+]
+
+
+class MistitledTranslationLLM(FakeTranslationLLM):
+    # Answers one school with a course whose echoed source is not one of the titles it was sent
+    def __init__(self, school):
+        super().__init__()
+        self.school = school
+
+    def invoke(self, prompt_text):
+        reply = json.loads(super().invoke(prompt_text).content)
+        for item in reply['schools']:
+            if item['school'] == self.school:
+                item['courses'][0]['source'] = "Mestrado em Outra Coisa"
+        return AIMessage(content=json.dumps(reply, ensure_ascii=False))
+
+
+def translator(llm, memory=None):
+    return BatchTranslator(llm, requests_per_minute=0, retries=1, backoff=0, memory=memory)
+
+
+def test_reordered_replies_are_matched_back_to_their_sources():
+    schools, report = translator(FakeTranslationLLM(reverse=True)).translate(DATA)
+
+    assert report['failed'] == []
+    assert [school.school for school in schools] == [entry['school'] for entry in DATA]
+    assert [[course.title for course in school.courses] for school in schools] == [entry['courses'] for entry in DATA]
+    assert [course.level.value for course in schools[1].courses] == ['PhD', "Master's"]
+
+
+def test_a_reply_that_does_not_match_its_sources_is_rejected():
+    llm = MistitledTranslationLLM(DATA[1]['school'])
+
+    schools, report = translator(llm).translate(DATA)
+
+    assert [school.school for school in schools] == [DATA[0]['school'], DATA[2]['school']]
+    assert report['failed'] == [{'school': DATA[1]['school'],
+                                 'error': "Translated courses do not match their source titles"}]
+
+
+def test_memory_only_keeps_aligned_translations(tmp_path):
+    memory = TranslationMemory(str(tmp_path / 'memory.sqlite3'))
+    llm = MistitledTranslationLLM(DATA[1]['school'])
+
+    schools, report = translator(llm, memory).translate(DATA)
+
+    assert len(schools) == 2
+    assert memory.get('school', DATA[1]['school']) is None
+    assert all(memory.get('course', course) is None for course in DATA[1]['courses'])
+    assert memory.get('course', "Doutorado em Letras") is not None
+
+
+def test_memory_sends_each_normalized_title_once(tmp_path):
+    memory = TranslationMemory(str(tmp_path / 'memory.sqlite3'))
+    llm = FakeTranslationLLM(reverse=True)
+
+    schools, report = translator(llm, memory).translate(DATA)
+    calls = llm.calls
+    again, second = translator(llm, memory).translate(DATA)
+
+    # "mestrado em  física" is the same title as "Mestrado em Física" once normalized
+    assert report['strings_from_llm'] == 3 + 6
+    assert [school.school for school in schools] == [entry['school'] for entry in DATA]
+    assert (second['strings_from_llm'], llm.calls) == (0, calls)
+    assert [school.model_dump() for school in again] == [school.model_dump() for school in schools]
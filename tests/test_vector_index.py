@@ -0,0 +1,25 @@
+import numpy as np
+
+from vector_index import IVFPQ_MIN_VECTORS, _ivfpq_factory, build_index
+
+
+def test_small_catalogs_use_a_flat_index():
+    assert _ivfpq_factory(IVFPQ_MIN_VECTORS - 1, 768) is None
+    vectors = np.random.default_rng(0).standard_normal((1000, 16)).astype(np.float32)
+    index, index_type = build_index(vectors, 'ivfpq')
+    assert index_type == 'flat' and index.is_trained
+
+
+def test_ivfpq_is_sized_to_the_data():
+    # 4 * sqrt(n) lists, capped so each has at least 39 training points
+    assert _ivfpq_factory(20000, 768) == "IVF512,PQ32x8"
+    assert _ivfpq_factory(1000000, 384) == "IVF4000,PQ32x8"
+    # Small vectors keep at least 4 dimensions per subquantizer
+    assert _ivfpq_factory(20000, 24) == "IVF512,PQ4x8"
+    assert _ivfpq_factory(20000, 7) == "IVF512,PQ1x8"
+
+
+def test_ivfpq_factory_strings_are_valid():
+    import faiss
+    index = faiss.index_factory(768, _ivfpq_factory(20000, 768), faiss.METRIC_L2)
+    assert index.nlist == 512 and index.pq.M == 32 and index.pq.nbits == 8
@@ -0,0 +1,242 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pydantic import ValidationError
+
+from llm_prompts import load_prompt
+from models import CourseType, School, SchoolBatch, TranslatedSchool
+from telemetry import metrics, span
+from translation_memory import derive_level, normalize_source
+
+
+def estimate_tokens(text):
+    # Rough chars-per-token ratio, good enough to size batches without a tokenizer round-trip
+    return len(text) // 4 + 1
+
+
+class RateLimiter:
+    """Spaces out calls so that at most ``requests_per_minute`` start in any minute."""
+
+    def __init__(self, requests_per_minute=60):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+def make_batches(entries, token_budget=2000, max_batch_size=20):
+    batches, current, current_tokens = [], [], 0
+    for index, entry in entries:
+        tokens = estimate_tokens(json.dumps(entry, ensure_ascii=False))
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_batch_size):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append((index, entry))
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _response_text(response):
+    return response.content if hasattr(response, 'content') else str(response)
+
+
+def _align_courses(sources, courses):
+    """The translated ``courses`` in the order of their ``sources``, or None unless they match one to one."""
+    by_source = {normalize_source(course.source): course for course in courses}
+    if set(by_source) != {normalize_source(source) for source in sources}:
+        return None
+    return [CourseType(title=by_source[normalize_source(source)].title,
+                       level=derive_level(source) or by_source[normalize_source(source)].level)
+            for source in sources]
+
+
+def _extract_json(text):
+    # Models often wrap the JSON in a ```json fence
+    start, end = text.find('{'), text.rfind('}')
+    if start == -1 or end == -1:
+        raise ValueError("No JSON object in response")
+    return json.loads(text[start:end + 1])
+
+
+class BatchTranslator:
+    """Translates scraped schools in token-budgeted batches with concurrent, rate-limited LLM calls.
+
+    ``llm`` is anything with an ``invoke(prompt)`` method returning a message or a string, so a
+    fake model can stand in for Gemini. Schools are sent with an id and the model echoes each
+    course's source title, so replies are matched to their sources by id and title rather than by
+    position. Each returned school is validated against ``models.TranslatedSchool``; a school whose
+    courses do not match its sources one to one fails, and only the schools that failed are retried.
+    """
+
+    def __init__(self, llm, token_budget=2000, max_batch_size=20, concurrency=4, requests_per_minute=60,
+                 retries=3, backoff=1.0, memory=None):
+        self.llm = llm
+        self.memory = memory
+        self.token_budget = token_budget
+        self.max_batch_size = max_batch_size
+        self.concurrency = concurrency
+        self.rate_limiter = RateLimiter(requests_per_minute)
+        self.retries = retries
+        self.backoff = backoff
+        # langchain_core pulls in langsmith and requests, so it loads with the first translator, not with script.py
+        from langchain_core.output_parsers import PydanticOutputParser
+        from langchain_core.prompts import PromptTemplate
+        self.template = PromptTemplate(
+            input_variables=["universities_and_courses", "format_instructions"],
+            template=load_prompt
+        )
+        self.format_instructions = PydanticOutputParser(pydantic_object=SchoolBatch).get_format_instructions()
+
+    def _translate_batch(self, batch):
+        entries = [{'id': index, **entry} for index, entry in batch]
+        prompt_text = self.template.format(
+            universities_and_courses=json.dumps(entries, ensure_ascii=False),
+            format_instructions=self.format_instructions
+        )
+        with span('rate_limit_wait', pipeline='translate'):
+            self.rate_limiter.acquire()
+        try:
+            with span('llm', pipeline='translate'):
+                response = self.llm.invoke(prompt_text)
+            items = _extract_json(_response_text(response)).get('schools', [])
+        except Exception as e:
+            metrics.inc('translation_call_failures_total', error=type(e).__name__)
+            return {}, {index: f"{type(e).__name__}: {e}" for index, _ in batch}
+
+        # Replies are matched to schools by the echoed id, so a reordered answer cannot swap translations;
+        # each school is validated on its own so one bad item fails alone
+        replies = {}
+        for item in items:
+            if isinstance(item, dict):
+                replies.setdefault(str(item.get('id')), item)
+        translated, errors = {}, {}
+        for index, entry in batch:
+            item = replies.get(str(index))
+            if item is None:
+                errors[index] = "Missing from response"
+                continue
+            try:
+                reply = TranslatedSchool.model_validate(item)
+            except ValidationError as e:
+                metrics.inc('parse_failures_total', stage='translation')
+                errors[index] = f"ValidationError: {e.error_count()} errors"
+                continue
+            courses = _align_courses(entry['courses'], reply.courses or [])
+            if courses is None:
+                metrics.inc('translation_misaligned_total')
+                errors[index] = "Translated courses do not match their source titles"
+                continue
+            translated[index] = School(school=reply.school, courses=courses)
+        return translated, errors
+
+    def _split_by_memory(self, data):
+        # Reduce each school to the strings the memory has never seen; a course title shared by
+        # several schools is only sent once, with the first school that lists it. Titles are compared
+        # normalized, as the memory stores them, so spacing or case variants are not sent twice
+        requests, claimed, from_memory, from_llm = [], set(), 0, 0
+        for entry in data:
+            school_known = self.memory.get('school', entry['school']) is not None
+            unknown_courses = []
+            for course in entry['courses']:
+                if self.memory.get('course', course) is not None:
+                    from_memory += 1
+                elif normalize_source(course) not in claimed:
+                    claimed.add(normalize_source(course))
+                    unknown_courses.append(course)
+            from_memory += school_known
+            if unknown_courses or not school_known:
+                from_llm += len(unknown_courses) + (not school_known)
+                requests.append({'school': entry['school'], 'courses': unknown_courses})
+        return requests, from_memory, from_llm
+
+    def _remember(self, entry, school):
+        # Only schools that passed _align_courses get here, so their courses are in the order of entry['courses']
+        if len(school.courses or []) != len(entry['courses']):
+            raise ValueError(f"{entry['school']}: translated courses are not aligned with their sources")
+        self.memory.put('school', entry['school'], school.school)
+        for source, course in zip(entry['courses'], school.courses or []):
+            self.memory.put('course', source, course.title, course.level)
+
+    def _from_memory(self, entry):
+        school = self.memory.get('school', entry['school'])
+        courses = [self.memory.get('course', course) for course in entry['courses']]
+        if school is None or None in courses:
+            return None
+        return School(school=school[0], courses=[
+            CourseType(title=title, level=derive_level(source) or level)
+            for source, (title, level) in zip(entry['courses'], courses)
+        ])
+
+    def translate(self, data):
+        if self.memory is None:
+            return self._translate(data)
+
+        start = time.perf_counter()
+        requests, from_memory, from_llm = self._split_by_memory(data)
+        translated, report = self._translate(requests)
+        for entry, school in zip([requests[index] for index in report['translated_indexes']], translated):
+            self._remember(entry, school)
+        self.memory.commit()
+
+        output, failed = [], list(report['failed'])
+        failed_schools = {failure['school'] for failure in failed}
+        for entry in data:
+            school = self._from_memory(entry)
+            if school is not None:
+                output.append(school)
+            elif entry['school'] not in failed_schools:
+                failed.append({'school': entry['school'], 'error': "Course translation failed in another school"})
+
+        report.update({
+            'total': len(data),
+            'translated': len(output),
+            'failed': failed,
+            'strings_from_memory': from_memory,
+            'strings_from_llm': from_llm,
+            'elapsed_seconds': time.perf_counter() - start,
+        })
+        return output, report
+
+    def _translate(self, data):
+        start = time.perf_counter()
+        pending = list(enumerate(data))
+        translated, errors = {}, {}
+        calls = 0
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for attempt in range(self.retries + 1):
+                if not pending:
+                    break
+                if attempt:
+                    metrics.inc('translation_retries_total', value=len(pending))
+                    time.sleep(min(self.backoff * 2 ** (attempt - 1), 30))
+                # Retries use smaller batches so a single problematic school stops dragging others down
+                batch_size = max(1, self.max_batch_size >> attempt)
+                batches = make_batches(pending, self.token_budget, batch_size)
+                calls += len(batches)
+                errors = {}
+                for batch_translated, batch_errors in executor.map(self._translate_batch, batches):
+                    translated.update(batch_translated)
+                    errors.update(batch_errors)
+                pending = [(index, data[index]) for index in sorted(errors)]
+
+        report = {
+            'total': len(data),
+            'translated': len(translated),
+            'failed': [{'school': data[index].get('school'), 'error': error} for index, error in sorted(errors.items())],
+            'translated_indexes': sorted(translated),
+            'llm_calls': calls,
+            'elapsed_seconds': time.perf_counter() - start,
+        }
+        return [translated[index] for index in sorted(translated)], report
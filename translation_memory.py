@@ -0,0 +1,57 @@
+import sqlite3
+import threading
+
+from models import ProgramEnum
+
+
+def normalize_source(text):
+    return " ".join(text.split()).casefold()
+
+
+def derive_level(course_title):
+    # GCUB lists courses as "Mestrado em ..." / "Doutorado em ...", so the level rarely needs the LLM
+    normalized = normalize_source(course_title)
+    if normalized.startswith('mestrado'):
+        return ProgramEnum.mtech
+    if normalized.startswith('doutorado'):
+        return ProgramEnum.phd
+    return None
+
+
+class TranslationMemory:
+    """Persistent Portuguese → English translations of school names and course titles."""
+
+    def __init__(self, db_path="translation_memory.sqlite3"):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            "kind TEXT NOT NULL, source_key TEXT NOT NULL, source TEXT NOT NULL, "
+            "translation TEXT NOT NULL, level TEXT, PRIMARY KEY (kind, source_key))"
+        )
+        self._conn.commit()
+        self._entries = {
+            (kind, source_key): (translation, ProgramEnum(level) if level else None)
+            for kind, source_key, translation, level in self._conn.execute(
+                "SELECT kind, source_key, translation, level FROM translations"
+            )
+        }
+
+    def get(self, kind, source):
+        return self._entries.get((kind, normalize_source(source)))
+
+    def put(self, kind, source, translation, level=None):
+        source_key = normalize_source(source)
+        with self._lock:
+            self._entries[(kind, source_key)] = (translation, level)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?)",
+                (kind, source_key, source, translation, level.value if level else None)
+            )
+
+    def commit(self):
+        with self._lock:
+            self._conn.commit()
+
+    def __len__(self):
+        return len(self._entries)
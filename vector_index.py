@@ -0,0 +1,93 @@
+import json
+import os
+
+import numpy as np
+
+# Written by index_store for the pickle-free format; INDEX_META_FILE sits next to legacy LangChain indexes
+MANIFEST_FILE = "manifest.json"
+INDEX_META_FILE = "index_meta.json"
+
+# faiss.index_factory descriptions; {nlist}, {m} and {nbits} are sized to the catalog at build time
+INDEX_TYPES = {
+    'flat': "Flat",
+    'hnsw': "HNSW32",
+    'ivfpq': "IVF{nlist},PQ{m}x{nbits}",
+    'sq8': "SQ8",
+    'fp16': "SQfp16",
+}
+# Query-time knobs applied whenever an index is built or loaded
+SEARCH_PARAMETERS = {
+    'hnsw': "efSearch=64",
+    'ivfpq': "nprobe=16",
+}
+
+
+# Below this many vectors a flat scan takes about a millisecond and is exact, so IVF-PQ only loses recall
+IVFPQ_MIN_VECTORS = 10000
+
+
+def _ivfpq_factory(count, dim):
+    if count < IVFPQ_MIN_VECTORS:
+        return None
+    # FAISS k-means wants ~39 training points per centroid: per IVF list, and per PQ code (2**nbits of them)
+    nlist = max(1, min(int(4 * np.sqrt(count)), count // 39))
+    nbits = int(min(8, np.log2(count / 39)))
+    # At least 4 dimensions per subquantizer; more subquantizers mostly add training and scan time
+    m = next((m for m in (32, 16, 8, 4, 2) if dim % m == 0 and dim // m >= 4), 1)
+    return INDEX_TYPES['ivfpq'].format(nlist=nlist, m=m, nbits=nbits)
+
+
+def index_factory_string(index_type, count, dim):
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}, expected one of {sorted(INDEX_TYPES)}")
+    if index_type == 'ivfpq':
+        return _ivfpq_factory(count, dim)
+    return INDEX_TYPES[index_type]
+
+
+def configure_search(index, index_type):
+    if index_type in SEARCH_PARAMETERS:
+        import faiss
+        faiss.ParameterSpace().set_index_parameters(index, SEARCH_PARAMETERS[index_type])
+
+
+def search_parameters(index_type, selector):
+    """Per-search parameters restricting a search to ``selector``, with the same knobs as configure_search."""
+    import faiss
+    knobs = {name: int(value) for name, value in
+             (item.split('=') for item in SEARCH_PARAMETERS.get(index_type, "").split(',') if item)}
+    parameter_class = {'hnsw': faiss.SearchParametersHNSW, 'ivfpq': faiss.SearchParametersIVF}.get(
+        index_type, faiss.SearchParameters)
+    # Per-search parameters replace the index's own settings, so the knobs are repeated here
+    return parameter_class(sel=selector, **knobs)
+
+
+def build_index(vectors, index_type='flat'):
+    """Create and train an empty FAISS index of ``index_type`` for ``vectors``; returns (index, type used)."""
+    import faiss
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count, dim = vectors.shape
+    factory = index_factory_string(index_type, count, dim)
+    if factory is None:
+        print(f"Too few vectors ({count}) for a {index_type} index, using flat")
+        index_type, factory = 'flat', INDEX_TYPES['flat']
+
+    index = faiss.index_factory(dim, factory, faiss.METRIC_L2)
+    if not index.is_trained:
+        index.train(vectors)
+    configure_search(index, index_type)
+    return index, index_type
+
+
+def read_index_meta(file_path):
+    manifest_path = os.path.join(file_path, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            return json.load(f)
+    path = os.path.join(file_path, INDEX_META_FILE)
+    if not os.path.exists(path):
+        # Indexes built before index types existed are plain flat L2 indexes
+        return {'index_type': 'flat'}
+    with open(path) as f:
+        return json.load(f)